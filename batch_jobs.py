@@ -0,0 +1,396 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+from response_cache import ResponseCache
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = os.environ.get("FLOYD_BATCH_COMPLETION_WINDOW", "24h")
+BATCH_POLL_INTERVAL = float(os.environ.get("FLOYD_BATCH_POLL_INTERVAL", "30"))
+# Batch API limit on requests per input file
+BATCH_MAX_REQUESTS = 50000
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Assistants whose output is deterministic enough to serve from the response cache
+CACHEABLE_ASSISTANTS = {"RewriteSecondPerson"}
+
+
+def assistant_settings(assistant: str) -> Dict[str, Any]:
+    """
+    Return the model settings an assistant uses for a single chat completion.
+
+    These come straight from the character modules so bulk output matches
+    what the per-request path would produce. Raises ValueError for
+    assistants that cannot run as a plain chat completion (e.g. Floyd).
+    """
+    if assistant == "RewriteSecondPerson":
+        import rewrite_second_person as module
+        return {
+            'model': module.MODEL,
+            'system_prompt': module.SYSTEM_PROMPT,
+            'temperature': module.TEMPERATURE,
+        }
+    if assistant in ("blather", "ambassador"):
+        if assistant == "blather":
+            from characters import blather as module
+        else:
+            from characters import ambassador as module
+        return {
+            'model': module.MODEL,
+            'system_prompt': module.SYSTEM_PROMPT,
+            'temperature': module.TEMPERATURE,
+            'max_tokens': module.MAX_TOKENS,
+        }
+    raise ValueError(f"Assistant {assistant!r} is not supported in bulk mode")
+
+
+def load_requests(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a JSONL file of {"assistant", "prompt"} requests.
+
+    Each request keeps its `custom_id` (or `request_id`) if present; otherwise
+    it is numbered by line so results can be matched back.
+    """
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault('custom_id', str(record.get('request_id') or f"line-{line_number}"))
+            requests.append(record)
+    return requests
+
+
+def build_batch_lines(requests: List[Dict[str, Any]]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+    """
+    Turn requests into Batch API input lines grouped by model.
+
+    A batch file may only target one model, so Blather and Ambassador
+    (gpt-4) and RewriteSecondPerson (gpt-4o) end up in separate jobs.
+
+    Returns:
+        ({model: [batch line, ...]}, {custom_id: error} for rejected requests)
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    rejected: Dict[str, str] = {}
+    for request in requests:
+        custom_id = request['custom_id']
+        try:
+            if not request.get('prompt'):
+                raise ValueError("Prompt is required")
+            settings = assistant_settings(request.get('assistant'))
+        except ValueError as e:
+            rejected[custom_id] = str(e)
+            continue
+        body = {
+            'model': settings['model'],
+            'messages': [
+                {'role': 'system', 'content': settings['system_prompt']},
+                {'role': 'user', 'content': request['prompt']},
+            ],
+            'temperature': settings['temperature'],
+        }
+        if 'max_tokens' in settings:
+            body['max_tokens'] = settings['max_tokens']
+        groups.setdefault(settings['model'], []).append({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': body,
+        })
+    return groups, rejected
+
+
+def _chunks(items: List[Any], size: int):
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _batch_content(line: Dict[str, Any]) -> Optional[str]:
+    """Extract the assistant message from one Batch API output line."""
+    response = line.get('response') or {}
+    if response.get('status_code') != 200:
+        return None
+    choices = (response.get('body') or {}).get('choices') or []
+    if not choices:
+        return None
+    return choices[0].get('message', {}).get('content')
+
+
+class BatchRunner:
+    """Submits bulk requests as Batch API jobs and collects their results."""
+
+    def __init__(self, client, poll_interval: float = BATCH_POLL_INTERVAL,
+                 max_requests: int = BATCH_MAX_REQUESTS):
+        """
+        Args:
+            client: An OpenAI client, or LocalBatchBackend for offline runs
+            poll_interval: Seconds between job status checks
+            max_requests: Most requests written to one batch input file
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_requests = max_requests
+
+    def submit(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Upload the requests and start one batch job per model and chunk.
+
+        Returns:
+            A state dict with the `batch_ids` and `rejected` requests, suitable
+            for saving and passing to `collect` later
+        """
+        groups, rejected = build_batch_lines(requests)
+        batch_ids = []
+        for model, lines in groups.items():
+            for index, chunk in enumerate(_chunks(lines, self.max_requests)):
+                payload = "".join(json.dumps(line) + "\n" for line in chunk).encode("utf-8")
+                upload = self.client.files.create(
+                    file=(f"floyd-{model}-{index}.jsonl", payload),
+                    purpose="batch"
+                )
+                batch = self.client.batches.create(
+                    input_file_id=upload.id,
+                    endpoint=BATCH_ENDPOINT,
+                    completion_window=BATCH_COMPLETION_WINDOW,
+                    metadata={'source': 'floyd-batch-jobs', 'model': model}
+                )
+                print(f"Submitted batch {batch.id} with {len(chunk)} {model} requests")
+                batch_ids.append(batch.id)
+        return {'batch_ids': batch_ids, 'rejected': rejected}
+
+    def wait(self, batch_ids: List[str]) -> Dict[str, Any]:
+        """Poll until every job reaches a terminal status. Returns {batch_id: batch}."""
+        done: Dict[str, Any] = {}
+        while True:
+            for batch_id in batch_ids:
+                if batch_id in done:
+                    continue
+                batch = self.client.batches.retrieve(batch_id)
+                counts = getattr(batch, 'request_counts', None)
+                if counts is not None:
+                    print(f"Batch {batch_id}: {batch.status} "
+                          f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+                if batch.status in TERMINAL_BATCH_STATUSES:
+                    done[batch_id] = batch
+            if len(done) == len(batch_ids):
+                return done
+            time.sleep(self.poll_interval)
+
+    def _read_file(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not file_id:
+            return []
+        text = self.client.files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def collect(self, state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Wait for the jobs in `state` and download their output and error files.
+
+        Returns:
+            {custom_id: {'content': ...} or {'error': ...}}
+        """
+        results: Dict[str, Dict[str, Any]] = {
+            custom_id: {'error': error} for custom_id, error in state.get('rejected', {}).items()
+        }
+        for batch_id, batch in self.wait(state['batch_ids']).items():
+            if batch.status != "completed":
+                print(f"Batch {batch_id} ended with status {batch.status}")
+            for line in self._read_file(getattr(batch, 'output_file_id', None)):
+                content = _batch_content(line)
+                if content is None:
+                    results[line['custom_id']] = {'error': json.dumps(line.get('response'))}
+                else:
+                    results[line['custom_id']] = {'content': content}
+            for line in self._read_file(getattr(batch, 'error_file_id', None)):
+                error = line.get('error') or (line.get('response') or {}).get('body')
+                results.setdefault(line['custom_id'], {'error': json.dumps(error)})
+        return results
+
+    def run(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Submit, wait and merge in one call."""
+        return merge_results(requests, self.collect(self.submit(requests)))
+
+
+def merge_results(requests: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Attach each result to its request, in input order."""
+    merged = []
+    for request in requests:
+        result = results.get(request['custom_id'], {'error': 'No result returned'})
+        merged.append(dict(request, **result))
+    return merged
+
+
+def seed_response_caches(merged: List[Dict[str, Any]], db_path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Write successful results for cacheable assistants into the response cache.
+
+    Uses the same model, system prompt and temperature as the live cache key,
+    so seeded entries are served by `main.CachedAssistant`.
+    """
+    seeded = {}
+    for assistant in CACHEABLE_ASSISTANTS:
+        pairs = [(item['prompt'], item['content'].strip()) for item in merged
+                 if item.get('assistant') == assistant and item.get('content') is not None]
+        if not pairs:
+            continue
+        settings = assistant_settings(assistant)
+        model = settings.pop('model')
+        system_prompt = settings.pop('system_prompt')
+        kwargs = {'db_path': db_path} if db_path else {}
+        seeded[assistant] = ResponseCache(model, system_prompt, settings, **kwargs).seed(pairs)
+    return seeded
+
+
+class LocalBatchBackend:
+    """
+    In-process stand-in for the Files and Batches endpoints.
+
+    Each uploaded line is answered by `respond(body) -> str` and the job
+    reports `in_progress` for `polls_until_done` status checks before
+    completing, so the whole submit/wait/collect cycle runs offline.
+    """
+
+    def __init__(self, respond: Callable[[Dict[str, Any]], str], polls_until_done: int = 0):
+        self.respond = respond
+        self.polls_until_done = polls_until_done
+        self._files: Dict[str, str] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose: str):
+        _, payload = file
+        file_id = f"file-local-{next(self._ids)}"
+        self._files[file_id] = payload.decode("utf-8")
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def _file_content(self, file_id: str):
+        return SimpleNamespace(text=self._files[file_id])
+
+    def _answer(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            content = self.respond(line['body'])
+        except Exception as e:
+            return {'custom_id': line['custom_id'], 'response': None,
+                    'error': {'message': str(e)}}
+        return {
+            'custom_id': line['custom_id'],
+            'response': {
+                'status_code': 200,
+                'body': {'choices': [{'message': {'role': 'assistant', 'content': content}}]},
+            },
+            'error': None,
+        }
+
+    def _create_batch(self, input_file_id: str, endpoint: str, completion_window: str, metadata=None):
+        batch_id = f"batch-local-{next(self._ids)}"
+        self._batches[batch_id] = {'input_file_id': input_file_id, 'polls': 0}
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    def _retrieve_batch(self, batch_id: str):
+        job = self._batches[batch_id]
+        lines = [json.loads(line) for line in self._files[job['input_file_id']].splitlines() if line]
+        job['polls'] += 1
+        counts = SimpleNamespace(total=len(lines), completed=0, failed=0)
+        if job['polls'] <= self.polls_until_done:
+            return SimpleNamespace(id=batch_id, status="in_progress", request_counts=counts,
+                                   output_file_id=None, error_file_id=None)
+
+        if 'output_file_id' not in job:
+            answers = [self._answer(line) for line in lines]
+            ok = [a for a in answers if a['response']]
+            failed = [a for a in answers if not a['response']]
+            job['output_file_id'] = self._store("".join(json.dumps(a) + "\n" for a in ok))
+            job['error_file_id'] = self._store("".join(json.dumps(a) + "\n" for a in failed)) if failed else None
+            job['completed'], job['failed'] = len(ok), len(failed)
+        counts.completed, counts.failed = job['completed'], job['failed']
+        return SimpleNamespace(id=batch_id, status="completed", request_counts=counts,
+                               output_file_id=job['output_file_id'], error_file_id=job['error_file_id'])
+
+    def _store(self, text: str) -> str:
+        file_id = f"file-local-{next(self._ids)}"
+        self._files[file_id] = text
+        return file_id
+
+
+def _chat_responder(client) -> Callable[[Dict[str, Any]], str]:
+    """Answer batch lines with regular chat completions (used by --local)."""
+    def respond(body: Dict[str, Any]) -> str:
+        return client.chat.completions.create(**body).choices[0].message.content or ""
+    return respond
+
+
+def _write_jsonl(path: str, records: List[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate RewriteSecondPerson, Blather and Ambassador output in bulk via the Batch API."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    submit_cmd = sub.add_parser("submit", help="Upload requests and start batch jobs")
+    submit_cmd.add_argument("input", help="JSONL file with assistant/prompt records")
+    submit_cmd.add_argument("--state", required=True, help="Where to save the job IDs")
+
+    collect_cmd = sub.add_parser("collect", help="Wait for submitted jobs and merge their results")
+    collect_cmd.add_argument("input", help="The JSONL file that was submitted")
+    collect_cmd.add_argument("--state", required=True)
+    collect_cmd.add_argument("-o", "--output", required=True)
+    collect_cmd.add_argument("--seed-cache", action="store_true", help="Seed the response cache")
+
+    run_cmd = sub.add_parser("run", help="Submit, wait and merge in one go")
+    run_cmd.add_argument("input")
+    run_cmd.add_argument("-o", "--output", required=True)
+    run_cmd.add_argument("--seed-cache", action="store_true", help="Seed the response cache")
+    run_cmd.add_argument("--local", action="store_true",
+                         help="Use the in-process batch stand-in, answering with chat completions")
+
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    from client_registry import get_openai_client
+    client = get_openai_client()
+    if getattr(args, "local", False):
+        client = LocalBatchBackend(_chat_responder(client))
+    runner = BatchRunner(client, poll_interval=args.poll_interval)
+    requests = load_requests(args.input)
+
+    if args.command == "submit":
+        state = runner.submit(requests)
+        with open(args.state, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        print(f"Saved {len(state['batch_ids'])} batch IDs to {args.state}")
+        return
+
+    if args.command == "collect":
+        with open(args.state, encoding="utf-8") as f:
+            state = json.load(f)
+        merged = merge_results(requests, runner.collect(state))
+    else:
+        merged = runner.run(requests)
+
+    _write_jsonl(args.output, merged)
+    failed = sum(1 for item in merged if 'error' in item)
+    print(f"Wrote {len(merged)} results to {args.output} ({failed} failed)")
+    if args.seed_cache:
+        print(json.dumps({'seeded': seed_response_caches(merged)}))
+
+
+if __name__ == "__main__":
+    main()
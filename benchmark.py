@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import fake_openai
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Routes whose assistant IDs Floyd reads from OPENAI_<ROUTE>_ASSISTANT_ID
+ROUTES = ["router", "floyd_basic_response", "DoSomething", "PickUp", "GoSomewhere", "AskQuestion",
+          "GiveInstruction", "SocialEmotional", "MetaCommand", "Nonsense", "RewriteSecondPerson"]
+
+# Fake server behaviour used unless --config is given: a router that picks a route from the
+# prompt's wording, structured Floyd replies, and chat models sized like the real characters
+BENCHMARK_CONFIG: Dict[str, Any] = {
+    'default': {'latency_ms': 20, 'run_ms': 300, 'reply': '{"message": "Floyd does it with great enthusiasm."}'},
+    'assistants': {
+        'asst_router': {
+            'run_ms': 250,
+            'reply': 'DoSomething',
+            'replies': [
+                {'match': r'\b(go|walk|run|north|south|east|west)\b', 'reply': 'GoSomewhere'},
+                {'match': r'\b(pick|take|grab|get)\b', 'reply': 'PickUp'},
+                {'match': r'\?$', 'reply': 'AskQuestion'},
+            ],
+        },
+        'asst_gosomewhere': {
+            'reply': '{"message": "Floyd bounds off to the north, humming a little tune.", "direction": "north"}',
+        },
+        'asst_pickup': {
+            'reply': '{"message": "Floyd picks it up and shows it to you proudly.", "item": "sword"}',
+        },
+    },
+    'models': {
+        'gpt-4': {
+            'run_ms': 400,
+            'reply': ('Blather bellows, "Ensign Seventh Class! This is outrageous. Report to the brig at once. '
+                      'Scrub every deck twice. And do not dawdle! The Feinstein depends on it."'),
+        },
+        'gpt-4o': {'run_ms': 250, 'reply': 'Floyd, go slowly and be careful.'},
+    },
+}
+
+
+def assistant_id(route: str) -> str:
+    return f"asst_{route.lower()}"
+
+
+def configure_environment(base_url: str, cache: bool = False) -> None:
+    """
+    Point the OpenAI SDK and every assistant ID at the fake server.
+
+    Must run before `main` is imported, since configuration is read at
+    import time. Unless `cache` is set, the response, route and semantic
+    caches are turned off so every turn reaches the API. Values already in
+    the environment win.
+    """
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+    for route in ROUTES:
+        os.environ.setdefault(f"OPENAI_{route.upper()}_ASSISTANT_ID", assistant_id(route))
+    # One EMF line per turn would drown the report
+    os.environ.setdefault('FLOYD_METRICS', '0')
+    if not cache:
+        os.environ.setdefault('FLOYD_RESPONSE_CACHE', '0')
+        os.environ.setdefault('FLOYD_ROUTE_CACHE_SIZE', '0')
+        os.environ.setdefault('FLOYD_SEMANTIC_THRESHOLDS', '')
+
+
+def load_workload(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Read request events from event*.json-style files.
+
+    A file holds one event or a list of events. Events without an
+    `assistant` (like rewrite_event.json, written for the rewrite Lambda)
+    go to the RewriteSecondPerson assistant.
+    """
+    events = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for event in data if isinstance(data, list) else [data]:
+            events.append({'assistant': 'RewriteSecondPerson', **event})
+    return events
+
+
+def default_workload() -> List[str]:
+    return sorted(glob.glob(os.path.join(REPO_DIR, "event*.json"))) + [os.path.join(REPO_DIR, "rewrite_event.json")]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(int(pct * len(ordered)), len(ordered) - 1)], 1)
+
+
+def summarise(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles, errors and throughput of turns given as {"latency_ms", "status"} dicts."""
+    latencies = [r['latency_ms'] for r in results]
+    errors = sum(1 for r in results if r['status'] >= 400)
+    return {
+        'turns': len(results),
+        'errors': errors,
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'mean_ms': round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class BenchmarkRunner:
+    """
+    Drives workload events through a Lambda handler, one assistant type at a time.
+
+    Each assistant type runs as its own phase so that the fake server's
+    request count for the phase, divided by its turns, is that type's API
+    round trips per turn.
+    """
+
+    def __init__(self, handler, server_stats, reset_server_stats, concurrency: int = 1):
+        self.handler = handler
+        self.server_stats = server_stats
+        self.reset_server_stats = reset_server_stats
+        self.concurrency = max(concurrency, 1)
+
+    def _turn(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            status = self.handler(dict(event), None).get('statusCode', 200)
+        except Exception as e:
+            print(f"Benchmark turn failed: {e}")
+            status = 500
+        return {'latency_ms': (time.perf_counter() - started) * 1000, 'status': status}
+
+    def _run(self, events: List[Dict[str, Any]], turns: int) -> List[Dict[str, Any]]:
+        schedule = [events[i % len(events)] for i in range(turns)]
+        if self.concurrency == 1:
+            return [self._turn(event) for event in schedule]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(self._turn, schedule))
+
+    def run_phase(self, events: List[Dict[str, Any]], turns: int, warmup: int = 1) -> Dict[str, Any]:
+        """Run `turns` turns cycling through `events` and summarise them; warm-up turns are not counted."""
+        if warmup:
+            self._run(events, warmup)
+        self.reset_server_stats()
+        started = time.perf_counter()
+        results = self._run(events, turns)
+        elapsed = time.perf_counter() - started
+        requests = self.server_stats()['requests']
+        summary = summarise(results, elapsed)
+        summary['round_trips_per_turn'] = round(requests / turns, 2) if turns else 0.0
+        return summary
+
+    def run(self, events: List[Dict[str, Any]], turns: int, warmup: int = 1) -> Dict[str, Dict[str, Any]]:
+        """Benchmark each assistant type in the workload; returns a report keyed by type."""
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_type.setdefault(event['assistant'], []).append(event)
+        return {name: self.run_phase(group, turns, warmup) for name, group in by_type.items()}
+
+
+def format_report(report: Dict[str, Dict[str, Any]]) -> List[str]:
+    lines = [f"{'assistant':<20} {'turns':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+             f"{'trips/turn':>10} {'turns/s':>8}"]
+    for name, r in report.items():
+        lines.append(f"{name:<20} {r['turns']:>6} {r['errors']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                     f"{r['p99_ms']:>9.1f} {r['round_trips_per_turn']:>10.2f} {r['throughput_rps']:>8.2f}")
+    return lines
+
+
+def _remote_stats(base_url: str):
+    """Stats callbacks for a fake server running in another process."""
+    import urllib.request
+
+    url = base_url.rsplit("/v1", 1)[0] + "/_fake/stats"
+    baseline = {'requests': 0}
+
+    def stats():
+        with urllib.request.urlopen(url, timeout=5) as response:
+            current = json.loads(response.read())
+        return {'requests': current['requests'] - baseline['requests']}
+
+    def reset():
+        baseline['requests'] = 0
+        baseline['requests'] = stats()['requests']
+
+    return stats, reset
+
+
+def run_benchmark(paths: List[str], turns: int = 20, concurrency: int = 1, warmup: int = 1,
+                  config: Optional[Dict[str, Any]] = None, server_url: Optional[str] = None,
+                  cache: bool = False, verbose: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmark `main.lambda_handler` against a fake OpenAI server.
+
+    Starts an in-process fake server with `config` (BENCHMARK_CONFIG by
+    default) unless `server_url` points at one already running.
+    """
+    server = None
+    if server_url:
+        stats, reset = _remote_stats(server_url)
+    else:
+        server, server_url = fake_openai.start(0, BENCHMARK_CONFIG if config is None else config)
+        stats, reset = server.state.stats, server.state.reset_stats
+    configure_environment(server_url, cache)
+    events = load_workload(paths)
+    try:
+        # The handler logs every turn; keep the report readable
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+            import main
+            runner = BenchmarkRunner(main.lambda_handler, stats, reset, concurrency)
+            return runner.run(events, turns, warmup)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark lambda_handler end to end against a fake OpenAI API.")
+    parser.add_argument("workload", nargs="*", help="event*.json-style files (default: the repo's event files)")
+    parser.add_argument("--turns", type=int, default=20, help="Measured turns per assistant type")
+    parser.add_argument("--concurrency", type=int, default=1, help="Turns in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured turns per assistant type")
+    parser.add_argument("--config", help="Fake server config JSON (see fake_openai.FakeOpenAIState)")
+    parser.add_argument("--server", help="Base URL of an already running fake server, e.g. http://127.0.0.1:8765/v1")
+    parser.add_argument("--cache", action="store_true", help="Leave the response and routing caches on")
+    parser.add_argument("--verbose", action="store_true", help="Show the handler's own logging")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON report")
+    args = parser.parse_args(argv)
+
+    config = fake_openai.load_config(args.config) if args.config else None
+    report = run_benchmark(args.workload or default_workload(), args.turns, args.concurrency, args.warmup,
+                           config, args.server, args.cache, args.verbose)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("\n".join(format_report(report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import atexit
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+import metrics
+
+# Share of requests to record, 0.0-1.0; 0 turns capture off
+CAPTURE_SAMPLE_RATE = float(os.environ.get("FLOYD_CAPTURE_SAMPLE_RATE", "0"))
+# Lambda can only write under /tmp; ship the file elsewhere to build a corpus
+CAPTURE_FILE = os.environ.get("FLOYD_CAPTURE_FILE", "/tmp/requests.jsonl")
+# Set FLOYD_CAPTURE_REDACT=0 to keep prompts and session IDs verbatim
+CAPTURE_REDACT = os.environ.get("FLOYD_CAPTURE_REDACT", "1").lower() not in {"0", "false", "no"}
+CAPTURE_BATCH_SIZE = int(os.environ.get("FLOYD_CAPTURE_BATCH_SIZE", "50"))
+CAPTURE_FLUSH_INTERVAL = float(os.environ.get("FLOYD_CAPTURE_FLUSH_INTERVAL", "5"))
+CAPTURE_MAX_BUFFERED = int(os.environ.get("FLOYD_CAPTURE_MAX_BUFFERED", "1000"))
+
+# Checked in order, so IP addresses and card numbers are not mistaken for phone numbers
+PII_PATTERNS = [
+    ('EMAIL', re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ('IP', re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")),
+    ('CARD', re.compile(r"\b\d(?:[ -]?\d){12,18}\b")),
+    ('SSN', re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ('PHONE', re.compile(r"(?<![\w.])\+?\d[\d (). -]{7,}\d\b")),
+]
+
+
+def redact(text: str) -> str:
+    """Replace e-mail addresses, phone, card and social security numbers and IPs with placeholders."""
+    for label, pattern in PII_PATTERNS:
+        text = pattern.sub(f"[{label}]", text)
+    return text
+
+
+def _redact_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: _redact_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_value(v) for v in value]
+    return value
+
+
+def build_record(request: metrics.RequestMetrics, redact_pii: bool = CAPTURE_REDACT) -> Optional[Dict[str, Any]]:
+    """
+    Turn a finished request's metrics into a capture record.
+
+    Records carry `assistant` and `prompt` like a request event, so a
+    capture file can be replayed directly. Requests that never got as far
+    as a prompt are not recorded.
+    """
+    prompt = request.details.get('prompt')
+    if not prompt:
+        return None
+    timings, counts = request.snapshot()
+    session_id = request.properties.get('SessionId')
+    parameters = request.details.get('parameters')
+    if redact_pii:
+        prompt = redact(prompt)
+        parameters = _redact_value(parameters)
+        if session_id:
+            # Still groups a session's turns, without keeping the ID itself
+            session_id = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+    route = request.dimensions.get('Route')
+    return {
+        'ts': round(time.time(), 3),
+        'assistant': request.dimensions.get('AssistantType'),
+        'prompt': prompt,
+        'session_id': session_id,
+        'stream': request.details.get('stream', False),
+        'route': route if route != 'none' else None,
+        'route_source': request.properties.get('RouteSource'),
+        'parameters': parameters,
+        'status_code': request.properties.get('StatusCode', 200),
+        'timings_ms': {name: round(ms, 2) for name, ms in timings.items()},
+        'tokens': counts.get('Tokens'),
+        'api_round_trips': counts.get('ApiRoundTrips'),
+    }
+
+
+class CaptureBuffer:
+    """
+    Holds capture records in memory and appends them to a JSONL file in batches.
+
+    `add` never touches the file: a background thread writes whatever is
+    waiting once `batch_size` records have piled up or every
+    `flush_interval` seconds. If the writer falls behind, records beyond
+    `max_buffered` are dropped and counted rather than slowing requests.
+    On Lambda the thread is frozen between invocations and carries on
+    when the next one thaws the process.
+    """
+
+    def __init__(self, path: str = CAPTURE_FILE, batch_size: int = CAPTURE_BATCH_SIZE,
+                 flush_interval: float = CAPTURE_FLUSH_INTERVAL, max_buffered: int = CAPTURE_MAX_BUFFERED):
+        self.path = path
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.max_buffered = max(max_buffered, 1)
+        self._records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def add(self, record: Dict[str, Any]) -> bool:
+        """Queue a record for writing; returns False if it was dropped because the buffer is full."""
+        with self._lock:
+            if len(self._records) >= self.max_buffered:
+                self.dropped += 1
+                return False
+            self._records.append(record)
+            self.captured += 1
+            full = len(self._records) >= self.batch_size
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+        return True
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every waiting record now; returns how many were written."""
+        with self._lock:
+            records, self._records = self._records, []
+        if not records:
+            return 0
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._write_lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as e:
+                print(f"Could not write {len(records)} capture records: {e}")
+                with self._lock:
+                    self.write_errors += 1
+                return 0
+        with self._lock:
+            self.written += len(records)
+            self.batches += 1
+        return len(records)
+
+    def close(self) -> None:
+        """Stop the writer thread and write what is left."""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'captured': self.captured,
+                'dropped': self.dropped,
+                'written': self.written,
+                'batches': self.batches,
+                'buffered': len(self._records),
+                'write_errors': self.write_errors,
+            }
+
+
+_buffer: Optional[CaptureBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer() -> CaptureBuffer:
+    """Return the process-wide capture buffer, creating it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = CaptureBuffer()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def capture_request(request: metrics.RequestMetrics) -> None:
+    """Metrics listener: record a sample of finished requests."""
+    if random.random() >= CAPTURE_SAMPLE_RATE:
+        return
+    record = build_record(request)
+    if record is not None:
+        get_buffer().add(record)
+
+
+def start_from_env() -> bool:
+    """Start capturing requests when FLOYD_CAPTURE_SAMPLE_RATE is above zero."""
+    if CAPTURE_SAMPLE_RATE <= 0:
+        return False
+    metrics.add_listener(capture_request)
+    return True
+
+
+def capture_stats() -> Optional[Dict[str, Any]]:
+    """Buffer statistics, or None if nothing has been captured in this process."""
+    return _buffer.to_dict() if _buffer is not None else None
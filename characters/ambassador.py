@@ -1,8 +1,11 @@
 import json
-from typing import Optional
+from typing import Optional, List, Dict, Iterator
 
-from openai import OpenAI
-from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+import metrics
+import tracing
+from client_registry import get_openai_client, get_async_openai_client
+from output_policy import OutputPolicy, enforce, trim
+from streaming import iter_chat_deltas
 
 
 SYSTEM_PROMPT = """
@@ -44,33 +47,85 @@ Avoid repeating the same attribution verb. Do not overuse "muses."
 """
 
 
+MODEL = "gpt-4"
+MAX_TOKENS = 800
+TEMPERATURE = 0.7
+# The prompt sets no length limit, so replies are only checked for attribution, never cut
+OUTPUT_POLICY = OutputPolicy(attribution=r"\bAmbassador\b")
+
+
 class Ambassador:
     """Ambassador character who provides diplomatic and thoughtful responses."""
 
     def __init__(self, api_key: Optional[str] = None):
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
 
-    def respond(self, prompt: str) -> str:
-        """Return Ambassador's diplomatic response to the prompt."""
-        messages = [
+    # Clients come from the registry on first use so importing this module stays cheap
+    @property
+    def client(self):
+        return get_openai_client(self.api_key)
+
+    @property
+    def async_client(self):
+        return get_async_openai_client(self.api_key)
+
+    @staticmethod
+    def _messages(prompt: str, history: Optional[List[Dict[str, str]]] = None):
+        from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+        return [
             ChatCompletionSystemMessageParam(
                 role="system",
                 content=SYSTEM_PROMPT
             ),
+            *(history or ()),
             ChatCompletionUserMessageParam(
                 role="user",
                 content=prompt
             )
         ]
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=800,
-            temperature=0.7
-        )
+    def respond(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Return Ambassador's diplomatic response to the prompt."""
+        with metrics.stage("Completion"), tracing.span("Ambassador.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT) as span:
+            response = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE
+            )
+            tracing.record_usage(span, response)
+            metrics.count_usage(response)
+
+        return trim(response.choices[0].message.content or "", OUTPUT_POLICY)
+
+    def respond_stream(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        """Yield Ambassador's response text as it is generated."""
+        with metrics.stage("Completion"), tracing.span("Ambassador.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT):
+            stream = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE,
+                stream=True
+            )
+            yield from enforce(iter_chat_deltas(stream), OUTPUT_POLICY)
+
+    async def respond_async(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Async version of `respond`."""
+        with metrics.stage("Completion"), tracing.span("Ambassador.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT) as span:
+            response = await self.async_client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE
+            )
+            tracing.record_usage(span, response)
+            metrics.count_usage(response)
 
-        return response.choices[0].message.content or ""
+        return trim(response.choices[0].message.content or "", OUTPUT_POLICY)
 
 
 def lambda_handler(event, context):
@@ -1,8 +1,11 @@
 import json
-from typing import Optional
+from typing import Optional, List, Dict, Iterator
 
-from openai import OpenAI
-from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+import metrics
+import tracing
+from client_registry import get_openai_client, get_async_openai_client
+from output_policy import OutputPolicy, enforce, trim
+from streaming import iter_chat_deltas
 
 
 SYSTEM_PROMPT = """
@@ -45,32 +48,84 @@ Your response must include attribution (e.g., "Blather says," "Blather snaps," "
 """
 
 
+MODEL = "gpt-4"
+MAX_TOKENS = 1000
+TEMPERATURE = 0.8
+# Matches "Limit output to four sentences" in the prompt; streams stop once it is met
+OUTPUT_POLICY = OutputPolicy(max_sentences=4, attribution=r"\bBlather\b")
+
+
 class Blather:
 
     def __init__(self, api_key: Optional[str] = None):
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
 
-    def blather(self, prompt: str) -> str:
-        """Return Blather's verbose response to the prompt."""
-        messages = [
+    # Clients come from the registry on first use so importing this module stays cheap
+    @property
+    def client(self):
+        return get_openai_client(self.api_key)
+
+    @property
+    def async_client(self):
+        return get_async_openai_client(self.api_key)
+
+    @staticmethod
+    def _messages(prompt: str, history: Optional[List[Dict[str, str]]] = None):
+        from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+        return [
             ChatCompletionSystemMessageParam(
                 role="system",
                 content=SYSTEM_PROMPT
             ),
+            *(history or ()),
             ChatCompletionUserMessageParam(
                 role="user",
                 content=prompt
             )
         ]
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=1000,
-            temperature=0.8
-        )
+    def blather(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Return Blather's verbose response to the prompt."""
+        with metrics.stage("Completion"), tracing.span("Blather.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT) as span:
+            response = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE
+            )
+            tracing.record_usage(span, response)
+            metrics.count_usage(response)
+
+        return trim(response.choices[0].message.content or "", OUTPUT_POLICY)
+
+    def blather_stream(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        """Yield Blather's response text as it is generated."""
+        with metrics.stage("Completion"), tracing.span("Blather.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT):
+            stream = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE,
+                stream=True
+            )
+            yield from enforce(iter_chat_deltas(stream), OUTPUT_POLICY)
+
+    async def blather_async(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Async version of `blather`."""
+        with metrics.stage("Completion"), tracing.span("Blather.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT) as span:
+            response = await self.async_client.chat.completions.create(
+                model=MODEL,
+                messages=self._messages(prompt, history),
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE
+            )
+            tracing.record_usage(span, response)
+            metrics.count_usage(response)
 
-        return response.choices[0].message.content or ""
+        return trim(response.choices[0].message.content or "", OUTPUT_POLICY)
 
 
 def lambda_handler(event, context):
@@ -1,31 +1,153 @@
+import json
 import os
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, Any
 
-from openAIAssistantClient import OpenAIAssistantClient
+import tracing
+from openAIAssistantClient import OpenAIAssistantClient, AsyncOpenAIAssistantClient
+from intent_classifier import get_intent_classifier, routing_stats
+from routing_cache import route_cache
+from semantic_cache import get_semantic_cache
 
-class Floyd(OpenAIAssistantClient):
+# When set, every LLM routing decision is appended here as training data for the classifier
+ROUTER_DECISION_LOG = os.environ.get("FLOYD_ROUTER_DECISION_LOG")
+
+
+def build_assistant_map() -> Dict[str, Optional[str]]:
+    """Map each route name to its assistant ID from the environment."""
+    return {
+        "basic_response": os.environ.get("OPENAI_FLOYD_BASIC_RESPONSE_ASSISTANT_ID"),
+        "router": os.environ.get("OPENAI_ROUTER_ASSISTANT_ID"),
+        "DoSomething": os.environ.get("OPENAI_DOSOMETHING_ASSISTANT_ID"),
+        "PickUp": os.environ.get("OPENAI_PICKUP_ASSISTANT_ID"),
+        "GoSomewhere": os.environ.get("OPENAI_GOSOMEWHERE_ASSISTANT_ID"),
+        "AskQuestion": os.environ.get("OPENAI_ASKQUESTION_ASSISTANT_ID"),
+        "GiveInstruction": os.environ.get("OPENAI_GIVEINSTRUCTION_ASSISTANT_ID"),
+        "SocialEmotional": os.environ.get("OPENAI_SOCIALEMOTIONAL_ASSISTANT_ID"),
+        "MetaCommand": os.environ.get("OPENAI_METACOMMAND_ASSISTANT_ID"),
+        "Nonsense": os.environ.get("OPENAI_NONSENSE_ASSISTANT_ID"),
+        "RewriteSecondPerson": os.environ.get("OPENAI_REWRITESECONDPERSON_ASSISTANT_ID"),
+    }
+
+
+class FloydRouting:
+    """Routing logic shared by the sync and async Floyd routers."""
+
+    assistant_map: Dict[str, Optional[str]]
+    # Router runs are reported as RouterRunStream, RouterPolls, ... next to the routed run's stages
+    metric_prefix = "Router"
+
+    def _decide_locally(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Try to route without an Assistants run.
+
+        A previously routed prompt (after normalisation) or a near-duplicate of
+        one is answered from the routing caches, and a confident prediction
+        from the local intent classifier is used directly. Returns None when
+        the LLM router has to decide.
+        """
+        cached = route_cache.get(prompt, self.assistant_map)
+        if cached is not None:
+            routing_stats.record('cache')
+            return {'route': cached, 'round_trips': 0, 'source': 'cache'}
+
+        semantic = get_semantic_cache('route')
+        if semantic is not None:
+            similar = semantic.get(prompt)
+            if similar and self.assistant_map.get(similar):
+                routing_stats.record('semantic_cache')
+                route_cache.put(prompt, similar, self.assistant_map)
+                return {'route': similar, 'round_trips': 0, 'source': 'semantic_cache'}
+
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            route = classifier.classify(prompt)
+            if route and self.assistant_map.get(route):
+                routing_stats.record('classifier')
+                return {'route': route, 'round_trips': 0, 'source': 'classifier'}
+
+        return None
+
+    def decide_locally(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Route from the caches or the classifier alone, without an Assistants run.
+
+        Returns None when only the LLM router can decide; pass `local=False`
+        to `decide` then, so the local checks are not repeated.
+        """
+        with tracing.span(f'{type(self).__name__}.route') as span:
+            decision = self._decide_locally(prompt)
+            if decision is not None:
+                self._trace_decision(span, decision)
+            return decision
+
+    def _router_decision(self, prompt: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Record an LLM router answer in the caches and decision log."""
+        routing_stats.record('router')
+        route = response.get('content')
+        self._log_decision(prompt, route)
+        if route and self.assistant_map.get(route):
+            route_cache.put(prompt, route, self.assistant_map)
+            semantic = get_semantic_cache('route')
+            if semantic is not None:
+                semantic.put(prompt, route)
+        return {
+            'route': route,
+            'round_trips': response.get('round_trips', 0),
+            'source': 'router',
+        }
+
+    @staticmethod
+    def _log_decision(prompt: str, route: Optional[str]) -> None:
+        if not ROUTER_DECISION_LOG or not route:
+            return
+        try:
+            with open(ROUTER_DECISION_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'prompt': prompt, 'route': route}) + '\n')
+        except OSError as e:
+            print(f"Could not log router decision: {e}")
+
+    def resolve(self, route: str) -> str:
+        """Return the assistant ID for a route, or raise ValueError if unknown."""
+        assistant_id = self.assistant_map.get(route)
+        if not assistant_id:
+            print(f"Unknown route returned: {route}")
+            raise ValueError(f"Unknown route: {route}")
+        return assistant_id
+
+    @staticmethod
+    def _trace_decision(span, decision: Dict[str, Any]) -> None:
+        span.set_attributes({
+            'floyd.route': decision['route'],
+            'floyd.route_source': decision['source'],
+            'floyd.api_round_trips': decision['round_trips'],
+        })
+
+
+class Floyd(FloydRouting, OpenAIAssistantClient):
     """Floyd class that determines which assistant to use based on a prompt."""
 
     def __init__(self, assistant_id: str, api_key: Optional[str] = None):
         super().__init__(assistant_id, api_key)
-        self.assistant_map = {
-            "basic_response": os.environ.get("OPENAI_FLOYD_BASIC_RESPONSE_ASSISTANT_ID"),
-            "router": os.environ.get("OPENAI_ROUTER_ASSISTANT_ID"),
-            "DoSomething": os.environ.get("OPENAI_DOSOMETHING_ASSISTANT_ID"),
-            "PickUp": os.environ.get("OPENAI_PICKUP_ASSISTANT_ID"),
-            "GoSomewhere": os.environ.get("OPENAI_GOSOMEWHERE_ASSISTANT_ID"),
-            "AskQuestion": os.environ.get("OPENAI_ASKQUESTION_ASSISTANT_ID"),
-            "GiveInstruction": os.environ.get("OPENAI_GIVEINSTRUCTION_ASSISTANT_ID"),
-            "SocialEmotional": os.environ.get("OPENAI_SOCIALEMOTIONAL_ASSISTANT_ID"),
-            "MetaCommand": os.environ.get("OPENAI_METACOMMAND_ASSISTANT_ID"),
-            "Nonsense": os.environ.get("OPENAI_NONSENSE_ASSISTANT_ID"),
-            "RewriteSecondPerson": os.environ.get("OPENAI_REWRITESECONDPERSON_ASSISTANT_ID"),
-        }
+        self.assistant_map = build_assistant_map()
+
+    def decide(self, prompt: str, local: bool = True) -> Dict[str, Any]:
+        """
+        Classify the prompt, using the router assistant only when needed.
+
+        Returns a dict with the chosen `route`, the number of API
+        `round_trips` the decision cost and the `source` that made it.
+        With `local=False` the caches and classifier are skipped.
+        """
+        with tracing.span('Floyd.route') as span:
+            decision = self._decide_locally(prompt) if local else None
+            if decision is None:
+                decision = self._router_decision(prompt, self.run_once(prompt, stream=True))
+            self._trace_decision(span, decision)
+            return decision
 
     def route(self, prompt: str) -> str:
         """Return the routing classification for the given prompt."""
-        response = self.chat(prompt)
-        return response.get('content')
+        return self.decide(prompt)['route']
 
     def route_and_get_assistant_id(self, prompt: str) -> Tuple[str, str]:
         """Route the prompt and return the route and corresponding assistant ID."""
@@ -33,8 +155,25 @@ class Floyd(OpenAIAssistantClient):
         print(f"Routing with assistant id: {self.assistant_id}")
         route = self.route(prompt)
         print("Router selected route:", route)
-        assistant_id = self.assistant_map.get(route)
-        if not assistant_id:
-            print(f"Unknown route returned: {route}")
-            raise ValueError(f"Unknown route: {route}")
-        return route, assistant_id
+        return route, self.resolve(route)
+
+
+class AsyncFloyd(FloydRouting, AsyncOpenAIAssistantClient):
+    """Async counterpart of Floyd."""
+
+    def __init__(self, assistant_id: str, api_key: Optional[str] = None):
+        super().__init__(assistant_id, api_key)
+        self.assistant_map = build_assistant_map()
+
+    async def decide(self, prompt: str, local: bool = True) -> Dict[str, Any]:
+        """Async version of Floyd.decide."""
+        with tracing.span('AsyncFloyd.route') as span:
+            decision = self._decide_locally(prompt) if local else None
+            if decision is None:
+                decision = self._router_decision(prompt, await self.run_once(prompt, stream=True))
+            self._trace_decision(span, decision)
+            return decision
+
+    async def route(self, prompt: str) -> str:
+        """Return the routing classification for the given prompt."""
+        return (await self.decide(prompt))['route']
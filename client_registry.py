@@ -0,0 +1,230 @@
+import asyncio
+import os
+import threading
+from typing import Optional, Dict, Any, Callable, Hashable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("OPENAI_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_TIMEOUT = float(os.environ.get("OPENAI_HTTP_TIMEOUT", "60"))
+HTTP2_ENABLED = os.environ.get("OPENAI_HTTP2", "").lower() in {"1", "true", "yes"}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConnectionStats:
+    """Counts API requests and how many of them had to open a new connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback; fires once per freshly opened TCP connection."""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    async def async_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """The same callback for httpx.AsyncClient, whose httpcore backend awaits it."""
+        self.trace(event_name, info)
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.requests
+            new_connections = self.new_connections
+        reused = max(requests - new_connections, 0)
+        return {
+            'requests': requests,
+            'new_connections': new_connections,
+            'reused_connections': reused,
+            'reuse_ratio': round(reused / requests, 3) if requests else 0.0,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of OpenAI clients and assistant objects.
+
+    Lambda keeps the Python process alive between warm invocations, so anything
+    held here survives across requests: one tuned HTTP transport (keep-alive,
+    connection limits, optional HTTP/2), one OpenAI client per API key on top of
+    it, and any assistant object registered through `get_or_create`.
+
+    The async side mirrors this with one `httpx.AsyncClient`. Async pools are
+    tied to the event loop that opened them, so the registry also owns the
+    loop that async entry points run on; reusing it keeps connections warm.
+    The loop runs on a thread of its own and `run` hands coroutines to it, so
+    any number of request threads can share it at once.
+
+    `openai` and `httpx` are imported on first use, so a cold start that
+    never calls the API (a cache hit, a rules-only rewrite) never loads them.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._http_client: Optional["httpx.Client"] = None
+        self._async_http_client: Optional["httpx.AsyncClient"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._openai_clients: Dict[Optional[str], "OpenAI"] = {}
+        self._async_openai_clients: Dict[Optional[str], "AsyncOpenAI"] = {}
+        self._objects: Dict[Hashable, Any] = {}
+        self.stats = ConnectionStats()
+
+    def _on_request(self, request: "httpx.Request") -> None:
+        self.stats.record_request()
+        request.extensions["trace"] = self.stats.trace
+
+    async def _on_async_request(self, request: "httpx.Request") -> None:
+        self.stats.record_request()
+        request.extensions["trace"] = self.stats.async_trace
+
+    @staticmethod
+    def _transport_settings() -> Dict[str, Any]:
+        import httpx
+        http2 = HTTP2_ENABLED and _http2_available()
+        if HTTP2_ENABLED and not http2:
+            print("OPENAI_HTTP2 requested but h2 is not installed; using HTTP/1.1")
+        return {
+            'http2': http2,
+            'timeout': httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+            'limits': httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        }
+
+    def http_client(self) -> "httpx.Client":
+        """Return the shared HTTP transport, creating it on first use."""
+        import httpx
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    event_hooks={'request': [self._on_request]},
+                    **self._transport_settings()
+                )
+            return self._http_client
+
+    def async_http_client(self) -> "httpx.AsyncClient":
+        """Return the shared async HTTP transport, creating it on first use."""
+        import httpx
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(
+                    event_hooks={'request': [self._on_async_request]},
+                    **self._transport_settings()
+                )
+            return self._async_http_client
+
+    def event_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the process-wide event loop used by async entry points, starting its thread on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="registry-event-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coroutine) -> Any:
+        """Run a coroutine on the shared event loop and wait for its result; safe from any thread but the loop's."""
+        loop = self.event_loop()
+        if threading.current_thread() is self._loop_thread:
+            coroutine.close()
+            raise RuntimeError("registry.run called from the registry's own event loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def openai_client(self, api_key: Optional[str] = None) -> "OpenAI":
+        """Return the shared OpenAI client for the given API key."""
+        with self._lock:
+            client = self._openai_clients.get(api_key)
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(api_key=api_key, http_client=self.http_client())
+                self._openai_clients[api_key] = client
+            return client
+
+    def async_openai_client(self, api_key: Optional[str] = None) -> "AsyncOpenAI":
+        """Return the shared AsyncOpenAI client for the given API key."""
+        with self._lock:
+            client = self._async_openai_clients.get(api_key)
+            if client is None:
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(api_key=api_key, http_client=self.async_http_client())
+                self._async_openai_clients[api_key] = client
+            return client
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the object registered under `key`, building it with `factory` once."""
+        with self._lock:
+            if key not in self._objects:
+                self._objects[key] = factory()
+            return self._objects[key]
+
+    def connection_stats(self) -> Dict[str, Any]:
+        return self.stats.to_dict()
+
+    def reset(self) -> None:
+        """
+        Close and drop every cached client and object, and stop the event loop.
+
+        Used by tests and after config changes.
+        """
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            if self._loop is not None and not self._loop.is_closed():
+                if self._async_http_client is not None:
+                    self.run(self._async_http_client.aclose())
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+            self._async_http_client = None
+            self._openai_clients.clear()
+            self._async_openai_clients.clear()
+            self._objects.clear()
+            self.stats.reset()
+
+
+registry = ClientRegistry()
+
+
+def get_openai_client(api_key: Optional[str] = None) -> "OpenAI":
+    """Shortcut for `registry.openai_client`."""
+    return registry.openai_client(api_key)
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> "AsyncOpenAI":
+    """Shortcut for `registry.async_openai_client`."""
+    return registry.async_openai_client(api_key)
@@ -0,0 +1,193 @@
+import argparse
+import builtins
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Set FLOYD_COLD_START_REPORT=1 to log an import profile after the first invocation
+COLD_START_REPORT = os.environ.get("FLOYD_COLD_START_REPORT", "").lower() in {"1", "true", "yes"}
+COLD_START_TOP = int(os.environ.get("FLOYD_COLD_START_TOP", "15"))
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of this process in KiB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class ImportProfiler:
+    """
+    Records how long each first-time import takes and how much it grows peak RSS.
+
+    Works by wrapping `builtins.__import__`, so it sees every `import`
+    statement made while installed, including the nested imports of
+    third-party packages. `cumulative_ms` includes nested imports;
+    `self_ms` is what is left after subtracting them. Modules that are
+    already loaded pass straight through untimed.
+    """
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._original = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.started: Optional[float] = None
+        self.start_rss_kb: Optional[int] = None
+
+    def install(self) -> "ImportProfiler":
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+            self.started = time.perf_counter()
+            self.start_rss_kb = peak_rss_kb()
+        return self
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _stack(self) -> List[float]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        if level:
+            try:
+                name_key = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                name_key = name
+        else:
+            name_key = name
+        if name_key in sys.modules or not name_key:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = self._stack()
+        stack.append(0.0)
+        rss_before = peak_rss_kb()
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            rss_after = peak_rss_kb()
+            with self._lock:
+                self.records.setdefault(name_key, {
+                    'module': name_key,
+                    'cumulative_ms': round(elapsed * 1000, 2),
+                    'self_ms': round(max(elapsed - nested, 0.0) * 1000, 2),
+                    'peak_rss_delta_kb': (rss_after - rss_before) if rss_before is not None else None,
+                    'depth': len(stack),
+                })
+
+    def report(self, top: int = COLD_START_TOP) -> Dict[str, Any]:
+        """Summary with the slowest imports first."""
+        with self._lock:
+            records = list(self.records.values())
+        top_level = [r for r in records if r['depth'] == 0]
+        ranked = sorted(records, key=lambda r: r['cumulative_ms'], reverse=True)
+        rss = peak_rss_kb()
+        return {
+            'imports': len(records),
+            'import_ms': round(sum(r['cumulative_ms'] for r in top_level), 2),
+            'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 2) if self.started else 0.0,
+            'peak_rss_kb': rss,
+            'peak_rss_growth_kb': (rss - self.start_rss_kb) if rss is not None and self.start_rss_kb else None,
+            'modules': ranked[:top] if top else ranked,
+        }
+
+
+_profiler: Optional[ImportProfiler] = None
+_reported = False
+
+
+def start_from_env() -> Optional[ImportProfiler]:
+    """Install the process-wide profiler when FLOYD_COLD_START_REPORT is set."""
+    global _profiler
+    if COLD_START_REPORT and _profiler is None:
+        _profiler = ImportProfiler().install()
+    return _profiler
+
+
+def report_once() -> Optional[Dict[str, Any]]:
+    """
+    Log the cold-start profile after the first invocation, then stop profiling.
+
+    Covers module load plus everything imported lazily while serving the
+    first request. Returns the report, or None if profiling is off or the
+    report was already logged.
+    """
+    global _reported
+    if _profiler is None or _reported:
+        return None
+    _reported = True
+    _profiler.uninstall()
+    report = _profiler.report()
+    print("Cold start report:", json.dumps(report))
+    return report
+
+
+def _profile_child(modules: List[str], top: int) -> None:
+    profiler = ImportProfiler().install()
+    for module in modules:
+        # Plain import statement so the profiler sees the top-level module too
+        exec(f"import {module}", {})
+    profiler.uninstall()
+    print(json.dumps(profiler.report(top)))
+
+
+def profile_in_subprocess(modules: List[str], top: int = COLD_START_TOP,
+                          env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Import `modules` in a fresh interpreter, so nothing is cached, and return its report."""
+    code = (
+        "import sys; sys.path.insert(0, {root!r}); import cold_start; "
+        "cold_start._profile_child({modules!r}, {top!r})"
+    ).format(root=os.path.dirname(os.path.abspath(__file__)), modules=modules, top=top)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env=dict(os.environ, **(env or {})), check=True)
+    # Modules may print on import; the report is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and peak RSS per module.")
+    parser.add_argument("modules", nargs="*", default=["main"], help="Modules to import (default: main)")
+    parser.add_argument("--top", type=int, default=COLD_START_TOP, help="Slowest modules to list (0 for all)")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON report")
+    args = parser.parse_args(argv)
+
+    report = profile_in_subprocess(args.modules, args.top)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"{report['imports']} modules imported in {report['import_ms']:.1f} ms, "
+          f"peak RSS {report['peak_rss_kb']} KiB (+{report['peak_rss_growth_kb']} KiB)")
+    print(f"{'cumulative ms':>14} {'self ms':>9} {'peak RSS +KiB':>14}  module")
+    for record in report['modules']:
+        print(f"{record['cumulative_ms']:>14.1f} {record['self_ms']:>9.1f} "
+              f"{record['peak_rss_delta_kb'] if record['peak_rss_delta_kb'] is not None else '-':>14}  "
+              f"{'  ' * record['depth']}{record['module']}")
+
+
+if __name__ == "__main__":
+    main()
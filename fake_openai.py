@@ -0,0 +1,529 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any, List, Tuple
+
+FAKE_OPENAI_PORT = int(os.environ.get("FAKE_OPENAI_PORT", "8765"))
+
+# Behaviour of an assistant or model unless the config overrides it
+DEFAULT_BEHAVIOUR: Dict[str, Any] = {
+    'latency_ms': 20,           # added to every API request, like network and front-end time
+    'run_ms': 200,              # time from run creation to the first reply token
+    'chunk_chars': 8,           # streamed replies are sent in chunks of this many characters
+    'chunk_interval_ms': 10,    # time between streamed chunks
+    'reply': "Floyd shrugs.",
+    'replies': [],              # [{"match": regex, "reply": text}], tried against the last user message
+}
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _usage(prompt: str, reply: str) -> Dict[str, int]:
+    # Roughly four characters per token is close enough for a stand-in
+    prompt_tokens = len(prompt) // 4 + 1
+    completion_tokens = len(reply) // 4 + 1
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+    }
+
+
+def _chunks(text: str, size: int) -> List[str]:
+    size = max(size, 1)
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _text(content: Any) -> str:
+    """Message content as plain text, whether given as a string or content parts."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get('text', '') for part in content if isinstance(part, dict))
+    return ""
+
+
+class FakeOpenAIState:
+    """
+    Threads, messages and runs held by the fake server, plus its configuration.
+
+    The config is a dict (or JSON file) of the form::
+
+        {
+          "default": {"latency_ms": 20, "run_ms": 200, ...},
+          "assistants": {"asst_router": {"replies": [{"match": "north", "reply": "GoSomewhere"}]}},
+          "models": {"gpt-4": {"run_ms": 400, "reply": "Blather harrumphs."}},
+          "failures": [{"path": "POST /v1/threads/runs", "status": 500, "times": 1}]
+        }
+
+    Assistant and model entries override `default` (see DEFAULT_BEHAVIOUR).
+    Each failure fires on requests whose "METHOD /path" matches the `path`
+    regex (any request if omitted) and, if given, whose `assistant_id` or
+    `model` matches. It either answers with an HTTP error `status` or lets
+    the run end with `run_status` (e.g. "failed", "expired"); `delay_ms`
+    adds latency to the request either way. It fires `times` times (once
+    by default), or on a random share `rate` of matching requests.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.default = {**DEFAULT_BEHAVIOUR, **config.get('default', {})}
+        self.assistants: Dict[str, Dict[str, Any]] = config.get('assistants', {})
+        self.models: Dict[str, Dict[str, Any]] = config.get('models', {})
+        self.failures: List[Dict[str, Any]] = [dict(f) for f in config.get('failures', [])]
+        self.threads: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.requests_by_endpoint: Dict[str, int] = {}
+        self.failures_injected = 0
+
+    def behaviour(self, assistant_id: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        overrides = self.assistants.get(assistant_id, {}) if assistant_id else self.models.get(model, {})
+        return {**self.default, **overrides}
+
+    @staticmethod
+    def reply_for(behaviour: Dict[str, Any], prompt: str) -> str:
+        for rule in behaviour['replies']:
+            if re.search(rule['match'], prompt, re.IGNORECASE):
+                return rule['reply']
+        return behaviour['reply']
+
+    @staticmethod
+    def duration_ms(behaviour: Dict[str, Any], reply: str) -> float:
+        """How long generating `reply` takes: time to first token plus the streamed chunks."""
+        chunks = len(_chunks(reply, behaviour['chunk_chars']))
+        return behaviour['run_ms'] + chunks * behaviour['chunk_interval_ms']
+
+    def record_request(self, endpoint: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self.requests_by_endpoint[endpoint] = self.requests_by_endpoint.get(endpoint, 0) + 1
+
+    def take_failure(self, request_line: str, assistant_id: Optional[str] = None,
+                     model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the scripted failure for this request, if one fires."""
+        with self._lock:
+            for failure in self.failures:
+                if failure.get('path') and not re.search(failure['path'], request_line):
+                    continue
+                if failure.get('assistant_id') and failure['assistant_id'] != assistant_id:
+                    continue
+                if failure.get('model') and failure['model'] != model:
+                    continue
+                if 'rate' in failure:
+                    if random.random() >= failure['rate']:
+                        continue
+                elif failure.get('times', 1) <= 0:
+                    continue
+                else:
+                    failure['times'] = failure.get('times', 1) - 1
+                self.failures_injected += 1
+                return failure
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'requests_by_endpoint': dict(self.requests_by_endpoint),
+                'failures_injected': self.failures_injected,
+                'threads': len(self.threads),
+                'runs': len(self.runs),
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.requests_by_endpoint.clear()
+            self.failures_injected = 0
+
+    # Threads, messages and runs
+
+    def create_thread(self, messages: Optional[List[Dict[str, Any]]] = None) -> str:
+        thread_id = _new_id("thread")
+        with self._lock:
+            self.threads[thread_id] = []
+        for message in messages or ():
+            self.add_message(thread_id, message.get('role', 'user'), _text(message.get('content')))
+        return thread_id
+
+    def add_message(self, thread_id: str, role: str, content: str,
+                    run_id: Optional[str] = None, assistant_id: Optional[str] = None) -> Dict[str, Any]:
+        message = {
+            'id': _new_id("msg"),
+            'object': 'thread.message',
+            'created_at': int(time.time()),
+            'thread_id': thread_id,
+            'role': role,
+            'content': [{'type': 'text', 'text': {'value': content, 'annotations': []}}],
+            'assistant_id': assistant_id,
+            'run_id': run_id,
+            'attachments': [],
+            'metadata': {},
+        }
+        with self._lock:
+            self.threads[thread_id].append(message)
+        return message
+
+    def create_run(self, thread_id: str, assistant_id: str, failure: Optional[Dict[str, Any]] = None,
+                   instructions: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            messages = list(self.threads[thread_id])
+        prompt = next(("".join(c['text']['value'] for c in m['content'])
+                       for m in reversed(messages) if m['role'] == 'user'), "")
+        behaviour = self.behaviour(assistant_id)
+        reply = self.reply_for(behaviour, prompt)
+        run = {
+            'id': _new_id("run"),
+            'thread_id': thread_id,
+            'assistant_id': assistant_id,
+            'instructions': instructions,
+            'created': time.monotonic(),
+            'created_at': int(time.time()),
+            'duration_ms': self.duration_ms(behaviour, reply),
+            'final_status': (failure or {}).get('run_status', 'completed'),
+            'status': 'queued',
+            'prompt': prompt,
+            'reply': reply,
+            'behaviour': behaviour,
+            'message_added': False,
+        }
+        with self._lock:
+            self.runs[run['id']] = run
+        return run
+
+    def refresh_run(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Advance a run's status by the time elapsed; a completed run posts its reply once."""
+        if run['status'] in ('cancelled', 'completed', 'failed', 'expired', 'incomplete'):
+            return run
+        if (time.monotonic() - run['created']) * 1000 < run['duration_ms']:
+            run['status'] = 'in_progress'
+            return run
+        self.finish_run(run)
+        return run
+
+    def finish_run(self, run: Dict[str, Any]) -> None:
+        with self._lock:
+            if run['message_added']:
+                return
+            run['message_added'] = True
+        run['status'] = run['final_status']
+        if run['status'] == 'completed':
+            self.add_message(run['thread_id'], 'assistant', run['reply'], run['id'], run['assistant_id'])
+
+    @staticmethod
+    def run_json(run: Dict[str, Any]) -> Dict[str, Any]:
+        done = run['status'] == 'completed'
+        return {
+            'id': run['id'],
+            'object': 'thread.run',
+            'created_at': run['created_at'],
+            'thread_id': run['thread_id'],
+            'assistant_id': run['assistant_id'],
+            'status': run['status'],
+            'instructions': run['instructions'] or "",
+            'model': 'fake',
+            'tools': [],
+            'metadata': {},
+            'parallel_tool_calls': True,
+            'last_error': None if run['status'] != 'failed' else {'code': 'server_error', 'message': 'Injected failure'},
+            'usage': _usage(run['prompt'], run['reply']) if done else None,
+        }
+
+
+def serve(port: int = FAKE_OPENAI_PORT, config: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1"):
+    """
+    Create a local OpenAI-compatible server for benchmarks and tests.
+
+    Covers the parts of the API this project uses: threads, messages, runs
+    (polled and streamed, including create-and-run and cancel) and chat
+    completions (plain and streamed). Point the SDK at it with
+    OPENAI_BASE_URL=http://host:port/v1. The server's `state` attribute
+    holds the FakeOpenAIState with its request counts. Call
+    `serve_forever()` on the result to run it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = FakeOpenAIState(config)
+
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+        def log_message(self, format, *args):
+            pass
+
+        def _dispatch(self, method: str) -> None:
+            path = self.path.split("?", 1)[0].rstrip("/")
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            except ValueError:
+                self._error(400, "Invalid JSON body")
+                return
+            if path == "/_fake/stats":
+                self._json(200, state.stats())
+                return
+
+            for pattern, handler in ROUTES:
+                match = re.fullmatch(pattern, f"{method} {path}")
+                if match:
+                    endpoint = pattern.replace("([^/]+)", "{id}")
+                    state.record_request(endpoint)
+                    try:
+                        handler(self, body, *match.groups())
+                    except KeyError as e:
+                        self._error(404, f"No such object: {e}")
+                    except (BrokenPipeError, ConnectionResetError):
+                        # Clients close a run's stream once it completes, and on cancellation
+                        self.close_connection = True
+                    return
+            self._error(404, f"Unknown endpoint {method} {path}")
+
+        # Responses
+
+        def _json(self, status: int, payload: Dict[str, Any]) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, message: str) -> None:
+            self._json(status, {'error': {'message': message, 'type': 'fake_error', 'code': status}})
+
+        def _start_sse(self) -> None:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+        def _sse(self, data: Any, event: Optional[str] = None) -> None:
+            text = data if isinstance(data, str) else json.dumps(data)
+            frame = (f"event: {event}\n" if event else "") + f"data: {text}\n\n"
+            encoded = frame.encode("utf-8")
+            self.wfile.write(f"{len(encoded):x}\r\n".encode("ascii") + encoded + b"\r\n")
+            self.wfile.flush()
+
+        def _end_sse(self) -> None:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _begin(self, behaviour: Dict[str, Any], assistant_id: Optional[str] = None,
+                   model: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+            """Apply request latency and any scripted failure; False if an error was sent."""
+            failure = state.take_failure(f"{self.command} {self.path.split('?', 1)[0]}", assistant_id, model)
+            time.sleep((behaviour['latency_ms'] + (failure or {}).get('delay_ms', 0)) / 1000)
+            if failure and failure.get('status'):
+                self._error(failure['status'], "Injected failure")
+                return False, failure
+            return True, failure
+
+        # Threads and messages
+
+        def create_thread(self, body):
+            ok, _ = self._begin(state.default)
+            if ok:
+                thread_id = state.create_thread(body.get('messages'))
+                self._json(200, {'id': thread_id, 'object': 'thread', 'created_at': int(time.time()), 'metadata': {}})
+
+        def delete_thread(self, body, thread_id):
+            ok, _ = self._begin(state.default)
+            if ok:
+                state.threads.pop(thread_id, None)
+                self._json(200, {'id': thread_id, 'object': 'thread.deleted', 'deleted': True})
+
+        def create_message(self, body, thread_id):
+            ok, _ = self._begin(state.default)
+            if ok:
+                if thread_id not in state.threads:
+                    raise KeyError(thread_id)
+                self._json(200, state.add_message(thread_id, body.get('role', 'user'), _text(body.get('content'))))
+
+        def list_messages(self, body, thread_id):
+            ok, _ = self._begin(state.default)
+            if not ok:
+                return
+            query = dict(p.split("=", 1) for p in self.path.partition("?")[2].split("&") if "=" in p)
+            messages = [m for m in state.threads[thread_id]
+                        if 'run_id' not in query or m['run_id'] == query['run_id']]
+            if query.get('order', 'desc') == 'desc':
+                messages.reverse()
+            self._json(200, {
+                'object': 'list',
+                'data': messages,
+                'first_id': messages[0]['id'] if messages else None,
+                'last_id': messages[-1]['id'] if messages else None,
+                'has_more': False,
+            })
+
+        # Runs
+
+        def create_run(self, body, thread_id):
+            if thread_id not in state.threads:
+                raise KeyError(thread_id)
+            self._run(body, thread_id)
+
+        def create_thread_and_run(self, body):
+            self._run(body, None)
+
+        def _run(self, body, thread_id):
+            assistant_id = body.get('assistant_id')
+            ok, failure = self._begin(state.behaviour(assistant_id), assistant_id)
+            if not ok:
+                return
+            if thread_id is None:
+                thread_id = state.create_thread((body.get('thread') or {}).get('messages'))
+            run = state.create_run(thread_id, assistant_id, failure, body.get('instructions'))
+            if body.get('stream'):
+                self._stream_run(run)
+            else:
+                self._json(200, state.run_json(run))
+
+        def _stream_run(self, run):
+            behaviour = run['behaviour']
+            self._start_sse()
+            self._sse(state.run_json(run), "thread.run.created")
+            run['status'] = 'in_progress'
+            self._sse(state.run_json(run), "thread.run.in_progress")
+            time.sleep(behaviour['run_ms'] / 1000)
+            if run['final_status'] == 'completed':
+                message_id = _new_id("msg")
+                for chunk in _chunks(run['reply'], behaviour['chunk_chars']):
+                    self._sse({
+                        'id': message_id,
+                        'object': 'thread.message.delta',
+                        'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': chunk, 'annotations': []}}]},
+                    }, "thread.message.delta")
+                    time.sleep(behaviour['chunk_interval_ms'] / 1000)
+            state.finish_run(run)
+            self._sse(state.run_json(run), f"thread.run.{run['status']}")
+            self._sse("[DONE]", "done")
+            self._end_sse()
+
+        def retrieve_run(self, body, thread_id, run_id):
+            run = state.runs[run_id]
+            ok, _ = self._begin(run['behaviour'], run['assistant_id'])
+            if ok:
+                self._json(200, state.run_json(state.refresh_run(run)))
+
+        def cancel_run(self, body, thread_id, run_id):
+            run = state.runs[run_id]
+            ok, _ = self._begin(run['behaviour'], run['assistant_id'])
+            if ok:
+                if state.refresh_run(run)['status'] == 'in_progress':
+                    run['status'] = 'cancelled'
+                self._json(200, state.run_json(run))
+
+        # Chat completions
+
+        def chat_completion(self, body):
+            model = body.get('model')
+            behaviour = state.behaviour(model=model)
+            ok, failure = self._begin(behaviour, model=model)
+            if not ok:
+                return
+            prompt = next((_text(m.get('content')) for m in reversed(body.get('messages') or [])
+                           if m.get('role') == 'user'), "")
+            reply = state.reply_for(behaviour, prompt)
+            completion_id = _new_id("chatcmpl")
+            if not body.get('stream'):
+                time.sleep(FakeOpenAIState.duration_ms(behaviour, reply) / 1000)
+                self._json(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply},
+                                 'finish_reason': 'stop'}],
+                    'usage': _usage(prompt, reply),
+                })
+                return
+
+            self._start_sse()
+            time.sleep(behaviour['run_ms'] / 1000)
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+            for text in _chunks(reply, behaviour['chunk_chars']):
+                self._sse({**chunk, 'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}]})
+                time.sleep(behaviour['chunk_interval_ms'] / 1000)
+            self._sse({**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+            self._sse("[DONE]")
+            self._end_sse()
+
+    ROUTES = [
+        (r"POST /v1/threads", FakeOpenAIHandler.create_thread),
+        (r"POST /v1/threads/runs", FakeOpenAIHandler.create_thread_and_run),
+        (r"DELETE /v1/threads/([^/]+)", FakeOpenAIHandler.delete_thread),
+        (r"POST /v1/threads/([^/]+)/messages", FakeOpenAIHandler.create_message),
+        (r"GET /v1/threads/([^/]+)/messages", FakeOpenAIHandler.list_messages),
+        (r"POST /v1/threads/([^/]+)/runs", FakeOpenAIHandler.create_run),
+        (r"GET /v1/threads/([^/]+)/runs/([^/]+)", FakeOpenAIHandler.retrieve_run),
+        (r"POST /v1/threads/([^/]+)/runs/([^/]+)/cancel", FakeOpenAIHandler.cancel_run),
+        (r"POST /v1/chat/completions", FakeOpenAIHandler.chat_completion),
+    ]
+
+    class FakeOpenAIServer(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # Clients drop idle keep-alive connections when they exit
+            if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+                super().handle_error(request, client_address)
+
+    server = FakeOpenAIServer((host, port), FakeOpenAIHandler)
+    server.state = state
+    return server
+
+
+def start(port: int = 0, config: Optional[Dict[str, Any]] = None) -> Tuple[Any, str]:
+    """Run a fake server on a background thread; returns (server, base URL)."""
+    server = serve(port, config)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    host, bound_port = server.server_address[:2]
+    return server, f"http://{host}:{bound_port}/v1"
+
+
+def load_config(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in server.")
+    parser.add_argument("--port", type=int, default=FAKE_OPENAI_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--config", help="JSON file with assistant/model behaviour and scripted failures")
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, load_config(args.config), args.host)
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, List
+
+import main
+import tracing
+from streaming import SSE_HEADERS, wants_stream
+
+# Lambda Web Adapter forwards to this port; it also streams chunked responses through
+HTTP_PORT = int(os.environ.get("PORT", "8080"))
+
+
+class AssistantRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the Lambda event format over plain HTTP.
+
+    POST the same JSON body API Gateway would send. Streamed requests get
+    server-sent events written as HTTP chunks the moment each token arrives;
+    everything else is answered by `main.lambda_handler` as usual. Each
+    request runs on its own thread; batches from all of them share the
+    registry's event loop thread.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, {'status': 'ok', 'version': main.DEPLOYMENT_VERSION})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        event = {'body': body, 'headers': dict(self.headers.items())}
+
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            data = None
+        if wants_stream(event, data):
+            self._stream(event)
+            return
+
+        response = main.lambda_handler(event, None)
+        self.send_response(response.get('statusCode', 200))
+        headers = {'Content-Type': 'application/json', **(response.get('headers') or {})}
+        payload = response.get('body', "").encode("utf-8")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, event):
+        with tracing.start_trace('http_stream', event) as root:
+            self.send_response(200)
+            for name, value in SSE_HEADERS.items():
+                self.send_header(name, value)
+            if root.recording:
+                self.send_header('traceparent', root.traceparent())
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            events = main.get_service().stream_request(event)
+            try:
+                for sse in events:
+                    data = sse.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away; closing the generator closes the model stream too
+                root.set_error("Client disconnected")
+                print("Client disconnected during stream")
+            finally:
+                events.close()
+                main._log_stats()
+
+    def _send_json(self, status: int, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port: int = HTTP_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Create the server; call `serve_forever()` on the result to run it."""
+    return ThreadingHTTPServer((host, port), AssistantRequestHandler)
+
+
+def run(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve Floyd over HTTP with streamed replies.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=HTTP_PORT)
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.host)
+    print(f"Floyd HTTP server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,228 @@
+import json
+import re
+from typing import Optional, Dict, Any, Tuple
+
+# Parser states while walking the top-level JSON object
+_START, _KEY, _KEY_STRING, _COLON, _VALUE, _MESSAGE, _RAW_VALUE, _AFTER_VALUE, _DONE, _INVALID = range(10)
+
+_WHITESPACE = " \t\r\n"
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+
+class IncrementalResponseParser:
+    """
+    Parses an assistant reply chunk by chunk as it streams in.
+
+    Structured replies look like `{"message": "...", "direction": "north"}`.
+    `feed` returns the part of the `message` text that became available with
+    each chunk, already unescaped, so it can be shown while the rest of the
+    reply is still being generated. Other fields are added to `parameters`
+    as soon as their value is complete. Replies that do not start with `{`
+    are plain text and are passed through unchanged, as `ResponseParser.parse`
+    does for complete strings.
+
+    `close` returns the final (message, parameters). For a complete reply
+    this is exactly what `ResponseParser.parse` returns. If the reply stops
+    being valid JSON after the message started (cut off by the token limit,
+    or followed by stray text), the message streamed so far is kept rather
+    than falling back to the raw content the reader has partly seen.
+    """
+
+    def __init__(self):
+        self.content = ""
+        self.mode: Optional[str] = None  # 'json' or 'text' once known
+        self.parameters: Dict[str, Any] = {}
+        self.message = ""
+        self.message_started = False
+        self._state = _START
+        self._pos = 0
+        self._key: Optional[str] = None
+        self._start = 0
+        self._emit_from = 0
+        self._last_unicode_escape = -1
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, chunk: str) -> str:
+        """Add the next chunk of the reply; return the newly available message text."""
+        if not chunk:
+            return ""
+        if self.mode == 'text':
+            self.content += chunk
+            self.message += chunk
+            return chunk
+
+        self.content += chunk
+        emitted = []
+        while self._pos < len(self.content) and self._state not in (_DONE, _INVALID):
+            if not self._step(emitted):
+                break
+        if self.mode == 'text':
+            # Anything buffered while looking for the first character is part of the text
+            self.message = self.content
+            return self.content
+        text = "".join(emitted)
+        self.message += text
+        return text
+
+    def close(self) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """Finish parsing and return (message, parameters)."""
+        if self.mode != 'json':
+            return self.content, None
+        try:
+            data = json.loads(self.content.strip())
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict) and 'message' in data:
+            message = data.pop('message')
+            return message, data if data else None
+        if data is None and self.message_started:
+            # Cut off or malformed after the message began; keep what was streamed
+            return self.message, dict(self.parameters) or None
+        return self.content, None
+
+    def _skip_whitespace(self) -> bool:
+        """Advance past whitespace; False if the buffer ran out."""
+        while self._pos < len(self.content) and self.content[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self.content)
+
+    def _step(self, emitted) -> bool:
+        """Make progress in the current state; False when more input is needed."""
+        state = self._state
+        if state in (_START, _KEY, _COLON, _VALUE, _AFTER_VALUE) and not self._skip_whitespace():
+            return False
+        char = self.content[self._pos] if self._pos < len(self.content) else ""
+
+        if state == _START:
+            if char == "{":
+                self.mode = 'json'
+                self._pos += 1
+                self._state = _KEY
+            else:
+                self.mode = 'text'
+                self._state = _DONE
+        elif state == _KEY:
+            if char == '"':
+                self._pos += 1
+                self._start = self._pos
+                self._state = _KEY_STRING
+            elif char == "}":
+                self._pos += 1
+                self._state = _DONE
+            else:
+                self._state = _INVALID
+        elif state == _KEY_STRING:
+            end = self._scan_string()
+            if end is None:
+                return False
+            self._key = json.loads(self.content[self._start - 1:end + 1])
+            self._pos = end + 1
+            self._state = _COLON
+        elif state == _COLON:
+            if char != ":":
+                self._state = _INVALID
+            else:
+                self._pos += 1
+                self._state = _VALUE
+        elif state == _VALUE:
+            if self._key == 'message' and char == '"':
+                self._pos += 1
+                self._emit_from = self._pos
+                self.message_started = True
+                self._state = _MESSAGE
+            else:
+                self._start = self._pos
+                self._depth = 0
+                self._in_string = False
+                self._state = _RAW_VALUE
+        elif state == _MESSAGE:
+            end = self._scan_string()
+            safe = self._pos if end is None else end
+            if end is None and self._last_unicode_escape == safe - 6 \
+                    and _HIGH_SURROGATE.fullmatch(self.content, safe - 6, safe):
+                # Hold back half of a surrogate pair until its other half arrives
+                safe -= 6
+            if safe > self._emit_from:
+                emitted.append(json.loads('"' + self.content[self._emit_from:safe] + '"'))
+                self._emit_from = safe
+            if end is None:
+                return False
+            self._pos = end + 1
+            self._state = _AFTER_VALUE
+        elif state == _RAW_VALUE:
+            return self._scan_raw_value()
+        elif state == _AFTER_VALUE:
+            self._pos += 1
+            if char == ",":
+                self._state = _KEY
+            elif char == "}":
+                self._state = _DONE
+            else:
+                self._state = _INVALID
+        return True
+
+    def _scan_string(self) -> Optional[int]:
+        """
+        Advance through a JSON string body; return the index of its closing quote.
+
+        Returns None if the string continues past the buffer. `_pos` then
+        stops at the start of any escape sequence that is not complete yet,
+        so everything before it can be decoded safely.
+        """
+        text = self.content
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if char == "\\":
+                if i + 1 >= len(text):
+                    break
+                if text[i + 1] == "u":
+                    if i + 6 > len(text):
+                        break
+                    self._last_unicode_escape = i
+                    i += 6
+                else:
+                    i += 2
+                continue
+            if char == '"':
+                self._pos = i
+                return i
+            i += 1
+        self._pos = i
+        return None
+
+    def _scan_raw_value(self) -> bool:
+        """Advance through a non-message value; store it once it is complete."""
+        text = self.content
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if self._in_string:
+                if char == "\\":
+                    if i + 1 >= len(text):
+                        break
+                    i += 2
+                    continue
+                if char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "]}" and self._depth > 0:
+                self._depth -= 1
+            elif char in ",}" and self._depth == 0:
+                try:
+                    value = json.loads(text[self._start:i])
+                except json.JSONDecodeError:
+                    self._state = _INVALID
+                    return True
+                if self._key != 'message':
+                    self.parameters[self._key] = value
+                self._pos = i + 1
+                self._state = _KEY if char == "," else _DONE
+                return True
+            i += 1
+        self._pos = i
+        return False
@@ -0,0 +1,299 @@
+"""
+Local intent classifier that answers Floyd routing decisions without an Assistants run.
+
+The model is multinomial logistic regression over signed, hashed word and
+character n-gram features. It is trained from logged router decisions (JSONL
+records with a `prompt` and the `route` the LLM router chose) and stored as an
+uncompressed `.npz` archive, which NumPy loads in well under a millisecond.
+
+Usage:
+    python intent_classifier.py train decisions.jsonl -o intent_model.npz
+    python intent_classifier.py evaluate decisions.jsonl -m intent_model.npz
+    python intent_classifier.py predict "Floyd, go north" -m intent_model.npz
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+import numpy as np
+
+DEFAULT_MODEL_PATH = os.environ.get(
+    "FLOYD_INTENT_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "intent_model.npz")
+)
+DEFAULT_THRESHOLD = float(os.environ.get("FLOYD_INTENT_THRESHOLD", "0.9"))
+# Only an explicit FLOYD_INTENT_THRESHOLD overrides the threshold saved with the deployed model
+THRESHOLD_OVERRIDE = DEFAULT_THRESHOLD if os.environ.get("FLOYD_INTENT_THRESHOLD") else None
+DEFAULT_N_FEATURES = 2 ** 15
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def featurize(text: str, n_features: int = DEFAULT_N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash a prompt into a sparse, L2-normalised feature vector.
+
+    Features are word unigrams, word bigrams and character trigrams. Each one
+    is hashed with CRC32 (stable across processes, unlike `hash`) into a
+    bucket, and one bit of the hash picks the sign so collisions tend to
+    cancel rather than accumulate.
+
+    Returns:
+        (indices, values) with unique indices
+    """
+    text = text.lower()
+    tokens = _TOKEN_RE.findall(text)
+    grams = [f"w:{t}" for t in tokens]
+    grams += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    padded = f" {' '.join(tokens)} "
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        index = h % n_features
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        counts[index] = counts.get(index, 0.0) + sign
+
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = np.linalg.norm(values)
+    if norm > 0:
+        values /= norm
+    return indices, values
+
+
+def _stack(texts: Iterable[str], n_features: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Featurise many texts into COO arrays (rows, cols, vals)."""
+    rows, cols, vals = [], [], []
+    for row, text in enumerate(texts):
+        indices, values = featurize(text, n_features)
+        rows.append(np.full(len(indices), row, dtype=np.int64))
+        cols.append(indices)
+        vals.append(values)
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class IntentClassifier:
+    """Softmax classifier over hashed n-gram features."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: List[str],
+                 threshold: float = DEFAULT_THRESHOLD):
+        self.weights = weights
+        self.bias = bias
+        self.labels = list(labels)
+        self.threshold = threshold
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = featurize(text, self.n_features)
+        logits = values @ self.weights[indices] + self.bias
+        return _softmax(logits)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (label, confidence) for the most likely route."""
+        proba = self.predict_proba(text)
+        best = int(proba.argmax())
+        return self.labels[best], float(proba[best])
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return the route if confidence clears the threshold, otherwise None."""
+        label, confidence = self.predict(text)
+        return label if confidence >= self.threshold else None
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str], n_features: int = DEFAULT_N_FEATURES,
+              epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-4,
+              threshold: float = DEFAULT_THRESHOLD) -> "IntentClassifier":
+        """Fit the classifier with full-batch gradient descent on sparse features."""
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        targets = np.zeros((len(texts), len(classes)), dtype=np.float32)
+        targets[np.arange(len(texts)), [class_index[label] for label in labels]] = 1.0
+
+        rows, cols, vals = _stack(texts, n_features)
+        weights = np.zeros((n_features, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        n = max(len(texts), 1)
+
+        for _ in range(epochs):
+            logits = np.zeros((len(texts), len(classes)), dtype=np.float32)
+            np.add.at(logits, rows, weights[cols] * vals[:, None])
+            error = (_softmax(logits + bias) - targets) / n
+            grad = np.zeros_like(weights)
+            np.add.at(grad, cols, error[rows] * vals[:, None])
+            weights -= learning_rate * (grad + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(weights, bias, classes, threshold)
+
+    def save(self, path: str) -> None:
+        """Write an uncompressed .npz archive (fast to load, no pickle)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            threshold=np.array(self.threshold, dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "IntentClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            stored_threshold = float(data["threshold"])
+            return cls(
+                data["weights"],
+                data["bias"],
+                [str(label) for label in data["labels"]],
+                stored_threshold if threshold is None else threshold,
+            )
+
+
+class RoutingStats:
+    """Counts how often each routing path was taken."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def record(self, source: str) -> None:
+        with self._lock:
+            self.counts[source] = self.counts.get(source, 0) + 1
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+routing_stats = RoutingStats()
+_classifier: Optional[IntentClassifier] = None
+
+
+def _load_default() -> Optional[IntentClassifier]:
+    if not os.path.exists(DEFAULT_MODEL_PATH):
+        return None
+    try:
+        return IntentClassifier.load(DEFAULT_MODEL_PATH, THRESHOLD_OVERRIDE)
+    except Exception as e:
+        print(f"Failed to load intent model {DEFAULT_MODEL_PATH}: {e}")
+        return None
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """Return the classifier loaded at import time, or None if no model is deployed."""
+    return _classifier
+
+
+def set_intent_classifier(classifier: Optional[IntentClassifier]) -> None:
+    global _classifier
+    _classifier = classifier
+
+
+_classifier = _load_default()
+
+
+def load_decisions(path: str) -> Tuple[List[str], List[str]]:
+    """Read (prompt, route) pairs from a JSONL decision log."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            prompt = record.get("prompt")
+            route = record.get("route")
+            if prompt and route:
+                texts.append(prompt)
+                labels.append(route)
+    return texts, labels
+
+
+def evaluate(classifier: IntentClassifier, texts: List[str], labels: List[str]) -> Dict[str, Any]:
+    """Accuracy overall and on the confident subset, plus coverage at the threshold."""
+    correct = confident = confident_correct = 0
+    for text, label in zip(texts, labels):
+        predicted, confidence = classifier.predict(text)
+        correct += predicted == label
+        if confidence >= classifier.threshold:
+            confident += 1
+            confident_correct += predicted == label
+    total = max(len(texts), 1)
+    return {
+        'samples': len(texts),
+        'accuracy': round(correct / total, 4),
+        'coverage': round(confident / total, 4),
+        'confident_accuracy': round(confident_correct / confident, 4) if confident else 0.0,
+        'threshold': classifier.threshold,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train and inspect the local Floyd intent classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = sub.add_parser("train", help="Train a model from a router decision log")
+    train_cmd.add_argument("decisions", help="JSONL file with prompt/route records")
+    train_cmd.add_argument("-o", "--output", default=DEFAULT_MODEL_PATH)
+    train_cmd.add_argument("--epochs", type=int, default=200)
+    train_cmd.add_argument("--learning-rate", type=float, default=0.5)
+    train_cmd.add_argument("--features", type=int, default=DEFAULT_N_FEATURES)
+    train_cmd.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    eval_cmd = sub.add_parser("evaluate", help="Score a model against a decision log")
+    eval_cmd.add_argument("decisions")
+    eval_cmd.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH)
+    eval_cmd.add_argument("--threshold", type=float)
+
+    predict_cmd = sub.add_parser("predict", help="Classify a single prompt")
+    predict_cmd.add_argument("prompt")
+    predict_cmd.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        texts, labels = load_decisions(args.decisions)
+        if not texts:
+            parser.error(f"No prompt/route records found in {args.decisions}")
+        classifier = IntentClassifier.train(
+            texts, labels,
+            n_features=args.features,
+            epochs=args.epochs,
+            learning_rate=args.learning_rate,
+            threshold=args.threshold,
+        )
+        classifier.save(args.output)
+        print(json.dumps(evaluate(classifier, texts, labels)))
+        print(f"Model written to {args.output}")
+    elif args.command == "evaluate":
+        classifier = IntentClassifier.load(args.model, args.threshold)
+        texts, labels = load_decisions(args.decisions)
+        print(json.dumps(evaluate(classifier, texts, labels)))
+    else:
+        classifier = IntentClassifier.load(args.model)
+        label, confidence = classifier.predict(args.prompt)
+        print(json.dumps({'route': label, 'confidence': round(confidence, 4)}))
+
+
+if __name__ == "__main__":
+    main()
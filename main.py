@@ -1,17 +1,51 @@
+import cold_start
+cold_start.start_from_env()
+
+import asyncio
+import importlib
 import os
 import json
+import sys
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Union, Iterator, TYPE_CHECKING
 from dataclasses import dataclass
 
-from openAIAssistantClient import OpenAIAssistantClient
-from characters.floyd import Floyd
-from rewrite_second_person import RewriteSecondPerson
-from characters.blather import Blather
-from characters.ambassador import Ambassador
+from client_registry import registry
+from routing_cache import route_cache
+from speculative import SpeculativeRouter, SPECULATIVE_RUNS, speculation_stats
+from openAIAssistantClient import OpenAIAssistantClient, AsyncOpenAIAssistantClient
+from rewrite_rules import rule_stats
+from sessions import get_session_manager
+from incremental_parser import IncrementalResponseParser
+import capture
+import metrics
+import tracing
+from streaming import SSE_HEADERS, TimedStream, sse_event, stream_stats, wants_stream
+
+# Character modules, the caches and their numpy/zstandard dependencies are
+# imported when an invocation first needs them, not at cold start
+if TYPE_CHECKING:
+    from response_cache import ResponseCache
+    from semantic_cache import SemanticCache
+
+# Batch events: most items accepted per event and how many are processed at once
+BATCH_MAX_ITEMS = int(os.environ.get("FLOYD_BATCH_MAX_ITEMS", "25"))
+BATCH_CONCURRENCY = int(os.environ.get("FLOYD_BATCH_CONCURRENCY", "4"))
 
 DEPLOYMENT_VERSION = "1.0.1"
 print(f"Floyd Lambda initialized - Version: {DEPLOYMENT_VERSION}")
+capture.start_from_env()
+
+
+def _load(module_name: str, attribute: str) -> Any:
+    """Import `module_name` on first use and return one of its attributes."""
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _character(key: str, module_name: str, class_name: str) -> Any:
+    """Return the process-wide character object, importing its module on first use."""
+    return registry.get_or_create(key, lambda: _load(module_name, class_name)())
 
 
 @dataclass
@@ -19,6 +53,7 @@ class AssistantRequest:
     """Data class for assistant requests."""
     assistant_type: str
     prompt: str
+    session_id: Optional[str] = None
 
 
 @dataclass
@@ -40,6 +75,13 @@ class AssistantResponse:
             })
         }
 
+    def to_batch_item(self) -> Dict[str, Any]:
+        """Convert to one entry of a batch response."""
+        results = {'single_message': self.content}
+        if self.metadata:
+            results['metadata'] = self.metadata
+        return {'statusCode': 200, 'results': results}
+
 
 class AssistantError(Exception):
     """Custom exception for assistant errors."""
@@ -54,48 +96,183 @@ class AssistantError(Exception):
             'body': json.dumps({'error': str(self)})
         }
 
+    def to_batch_item(self) -> Dict[str, Any]:
+        """Convert to one entry of a batch response."""
+        return {'statusCode': self.status_code, 'error': str(self)}
+
+
+History = Optional[List[Dict[str, str]]]
+
 
 class AssistantInterface(ABC):
     """Interface for all assistants (Single Responsibility + Interface Segregation)."""
 
+    # Whether requests with a session_id should carry earlier turns as `history`
+    supports_sessions = False
+
     @abstractmethod
-    def process(self, prompt: str) -> str:
+    def process(self, prompt: str, history: History = None) -> str:
         """Process a prompt and return a response."""
         pass
 
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        """
+        Async version of `process`.
+
+        Assistants without a native async implementation run `process` on a
+        worker thread so they never block the event loop.
+        """
+        return await asyncio.to_thread(self.process, prompt, history)
+
+    def stream(self, prompt: str, history: History = None) -> Iterator[str]:
+        """
+        Yield the response as it is generated.
+
+        Assistants that cannot stream yield the whole response as one chunk.
+        """
+        yield self.process(prompt, history)
+
     def get_metadata(self) -> Optional[Dict[str, Any]]:
         """Get metadata from the last processing operation. Override if needed."""
         return None
 
+    def cache_settings(self) -> Optional[Dict[str, Any]]:
+        """
+        Opt in to the response cache by returning the settings that determine output.
+
+        Must include 'model' and 'system_prompt'; any other keys (temperature,
+        max_tokens, ...) also become part of the cache key. Only assistants
+        whose output is deterministic for a given prompt should opt in.
+        """
+        return None
+
+
+class CachedAssistant(AssistantInterface):
+    """
+    Serves repeated prompts for a deterministic assistant from the response cache.
+
+    An exact match is tried first; if a semantic cache is configured for the
+    assistant type, a near-duplicate prompt above its threshold is served next.
+    """
+
+    def __init__(self, assistant: AssistantInterface, cache: "ResponseCache",
+                 semantic: Optional["SemanticCache"] = None):
+        self._assistant = assistant
+        self._cache = cache
+        self._semantic = semantic
+        self.supports_sessions = assistant.supports_sessions
+
+    def _lookup(self, prompt: str) -> Optional[str]:
+        with metrics.stage('CacheLookup'):
+            cached = self._cache.get(prompt)
+            if cached is None and self._semantic is not None:
+                cached = self._semantic.get(prompt)
+        metrics.count('CacheHits' if cached is not None else 'CacheMisses')
+        return cached
+
+    def process(self, prompt: str, history: History = None) -> str:
+        if history:
+            # Output depends on the conversation so far, not just the prompt
+            return self._assistant.process(prompt, history)
+        cached = self._lookup(prompt)
+        if cached is not None:
+            return cached
+        content = self._assistant.process(prompt)
+        self._store(prompt, content)
+        return content
+
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        if history:
+            return await self._assistant.process_async(prompt, history)
+        cached = self._lookup(prompt)
+        if cached is not None:
+            return cached
+        content = await self._assistant.process_async(prompt)
+        self._store(prompt, content)
+        return content
+
+    def stream(self, prompt: str, history: History = None) -> Iterator[str]:
+        if history:
+            yield from self._assistant.stream(prompt, history)
+            return
+        cached = self._lookup(prompt)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for token in self._assistant.stream(prompt):
+            parts.append(token)
+            yield token
+        self._store(prompt, "".join(parts))
+
+    def _store(self, prompt: str, content: str) -> None:
+        self._cache.put(prompt, content)
+        if self._semantic is not None:
+            self._semantic.put(prompt, content)
+
+    def get_metadata(self) -> Optional[Dict[str, Any]]:
+        return self._assistant.get_metadata()
+
+    def cache_settings(self) -> Optional[Dict[str, Any]]:
+        return self._assistant.cache_settings()
+
 
 class RewriteAssistant(AssistantInterface):
     """Wrapper for RewriteSecondPerson."""
     
     def __init__(self):
-        self._rewriter = RewriteSecondPerson()
+        self._rewriter = _character('RewriteSecondPerson', 'rewrite_second_person', 'RewriteSecondPerson')
     
-    def process(self, prompt: str) -> str:
+    def process(self, prompt: str, history: History = None) -> str:
         return self._rewriter.rewrite(prompt)
 
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        return await self._rewriter.rewrite_async(prompt)
+
+    def cache_settings(self) -> Optional[Dict[str, Any]]:
+        # temperature=0 against a fixed system prompt, so output is repeatable
+        rewrite_second_person = importlib.import_module('rewrite_second_person')
+        return {
+            'model': rewrite_second_person.MODEL,
+            'system_prompt': rewrite_second_person.SYSTEM_PROMPT,
+            'temperature': rewrite_second_person.TEMPERATURE,
+        }
+
 
 class BlatherAssistant(AssistantInterface):
     """Wrapper for Blather character."""
+
+    supports_sessions = True
     
     def __init__(self):
-        self._blather = Blather()
+        self._blather = _character('Blather', 'characters.blather', 'Blather')
     
-    def process(self, prompt: str) -> str:
-        return self._blather.blather(prompt)
+    def process(self, prompt: str, history: History = None) -> str:
+        return self._blather.blather(prompt, history)
+
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        return await self._blather.blather_async(prompt, history)
+
+    def stream(self, prompt: str, history: History = None) -> Iterator[str]:
+        return self._blather.blather_stream(prompt, history)
 
 
 class AmbassadorAssistant(AssistantInterface):
     """Wrapper for Ambassador character."""
+
+    supports_sessions = True
     
     def __init__(self):
-        self._ambassador = Ambassador()
+        self._ambassador = _character('Ambassador', 'characters.ambassador', 'Ambassador')
     
-    def process(self, prompt: str) -> str:
-        return self._ambassador.respond(prompt)
+    def process(self, prompt: str, history: History = None) -> str:
+        return self._ambassador.respond(prompt, history)
+
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        return await self._ambassador.respond_async(prompt, history)
+
+    def stream(self, prompt: str, history: History = None) -> Iterator[str]:
+        return self._ambassador.respond_stream(prompt, history)
 
 
 class ResponseParser:
@@ -142,33 +319,142 @@ class ResponseParser:
 class FloydAssistant(AssistantInterface):
     """Wrapper for Floyd routing assistant."""
 
+    # The router sees only the prompt; the routed assistant also gets the history
+    supports_sessions = True
+
     def __init__(self):
         self._floyd_assistant_id = os.environ.get("OPENAI_ROUTER_ASSISTANT_ID")
         if not self._floyd_assistant_id:
             raise AssistantError("Floyd assistant ID not configured", 500)
         self._last_metadata: Optional[Dict[str, Any]] = None
 
-    def process(self, prompt: str) -> str:
+    @staticmethod
+    def _client_for(assistant_id: str) -> OpenAIAssistantClient:
+        return registry.get_or_create(
+            ('OpenAIAssistantClient', assistant_id),
+            lambda: OpenAIAssistantClient(assistant_id)
+        )
+
+    @staticmethod
+    def _async_client_for(assistant_id: str) -> AsyncOpenAIAssistantClient:
+        return registry.get_or_create(
+            ('AsyncOpenAIAssistantClient', assistant_id),
+            lambda: AsyncOpenAIAssistantClient(assistant_id)
+        )
+
+    def _router(self):
+        return registry.get_or_create(
+            ('Floyd', self._floyd_assistant_id),
+            lambda: _load('characters.floyd', 'Floyd')(self._floyd_assistant_id)
+        )
+
+    def process(self, prompt: str, history: History = None) -> str:
+        try:
+            router = self._router()
+            print("Processing router assistant type")
+            if SPECULATIVE_RUNS > 0:
+                decision, response = SpeculativeRouter().execute(router, prompt, self._client_for, history)
+            else:
+                with metrics.stage('Route'):
+                    decision = router.decide(prompt)
+                client = self._client_for(router.resolve(decision['route']))
+                response = client.run_once(prompt, stream=True, history=history)
+            return self._finish(decision, response)
+        except ValueError as e:
+            raise AssistantError(str(e))
+
+    async def process_async(self, prompt: str, history: History = None) -> str:
+        try:
+            router = registry.get_or_create(
+                ('AsyncFloyd', self._floyd_assistant_id),
+                lambda: _load('characters.floyd', 'AsyncFloyd')(self._floyd_assistant_id)
+            )
+            print("Processing router assistant type")
+            if SPECULATIVE_RUNS > 0:
+                decision, response = await SpeculativeRouter().execute_async(
+                    router, prompt, self._async_client_for, history
+                )
+            else:
+                with metrics.stage('Route'):
+                    decision = await router.decide(prompt)
+                client = self._async_client_for(router.resolve(decision['route']))
+                response = await client.run_once(prompt, stream=True, history=history)
+            return self._finish(decision, response)
+        except ValueError as e:
+            raise AssistantError(str(e))
+
+    def stream(self, prompt: str, history: History = None) -> Iterator[str]:
+        """
+        Yield the routed assistant's message as it is generated.
+
+        Structured replies are parsed incrementally, so only the `message`
+        text is streamed and the other fields end up in the metadata. With
+        speculative routing or polling runs the reply arrives in one piece.
+        """
+        if SPECULATIVE_RUNS > 0:
+            yield self.process(prompt, history)
+            return
         try:
-            router = Floyd(self._floyd_assistant_id)
-            route, assistant_id = router.route_and_get_assistant_id(prompt)
-            client = OpenAIAssistantClient(assistant_id)
-            response = client.chat(prompt)
-            raw_content = response['content']
-
-            # Parse response - may contain structured JSON data
-            message, parameters = ResponseParser.parse(raw_content)
-
-            # Build metadata
-            self._last_metadata = {
-                'assistant_type': route
-            }
-            if parameters:
-                self._last_metadata['parameters'] = parameters
-
-            return message
+            router = self._router()
+            with metrics.stage('Route'):
+                decision = router.decide(prompt)
+            client = self._client_for(router.resolve(decision['route']))
         except ValueError as e:
             raise AssistantError(str(e))
+        if client.run_mode != "stream":
+            response = client.run_once(prompt, history=history)
+            yield self._finish(decision, response)
+            return
+
+        parser = IncrementalResponseParser()
+        result: Dict[str, Any] = {}
+        for token in client.stream_once(prompt, history=history, result=result):
+            text = parser.feed(token)
+            if text:
+                yield text
+        message, parameters = parser.close()
+        # Replies that turned out not to be structured were held back until now
+        if isinstance(message, str) and message.startswith(parser.message):
+            rest = message[len(parser.message):]
+            if rest:
+                yield rest
+        self._record(decision, 1, parameters)
+
+    def _finish(self, decision: Dict[str, Any], response: Dict[str, Any]) -> str:
+        """Parse the routed assistant's reply and record the turn's metadata."""
+        # Parse response - may contain structured JSON data
+        message, parameters = ResponseParser.parse(response['content'])
+        self._record(decision, response.get('round_trips', 0), parameters)
+        return message
+
+    def _record(self, decision: Dict[str, Any], response_round_trips: int,
+                parameters: Optional[Dict[str, Any]]) -> None:
+        """Record the turn's metadata."""
+        route = decision['route']
+        print(f"Router selected route: {route} (via {decision['source']})")
+        round_trips = decision['round_trips'] + response_round_trips
+        print(f"Floyd turn used {round_trips} API round trips")
+        metrics.set_dimension('Route', route)
+        metrics.set_property('RouteSource', decision['source'])
+        metrics.count('ApiRoundTrips', round_trips)
+        if parameters:
+            metrics.set_detail('parameters', parameters)
+        tracing.current_span().set_attributes({
+            'floyd.route': route,
+            'floyd.route_source': decision['source'],
+            'floyd.api_round_trips': round_trips,
+        })
+
+        # Build metadata
+        self._last_metadata = {
+            'assistant_type': route,
+            'api_round_trips': round_trips,
+            'route_source': decision['source']
+        }
+        if decision.get('speculative_runs'):
+            self._last_metadata['speculative_hit'] = decision['speculative_hit']
+        if parameters:
+            self._last_metadata['parameters'] = parameters
 
     def get_metadata(self) -> Optional[Dict[str, Any]]:
         """Return metadata from the last routing operation."""
@@ -191,8 +477,27 @@ class AssistantFactory:
         if assistant_type not in cls._assistants:
             valid_types = ', '.join(f'"{t}"' for t in cls._assistants.keys())
             raise AssistantError(f'Unknown assistant type. Use {valid_types}')
-        
-        return cls._assistants[assistant_type]()
+
+        assistant = cls._assistants[assistant_type]()
+        settings = assistant.cache_settings()
+        if settings and _load('response_cache', 'RESPONSE_CACHE_ENABLED'):
+            cache = cls.response_cache(assistant_type, settings)
+            prompt_hash = _load('response_cache', 'prompt_hash')
+            get_semantic_cache = _load('semantic_cache', 'get_semantic_cache')
+            semantic = get_semantic_cache(assistant_type, prompt_hash(settings['system_prompt'])[:12])
+            return CachedAssistant(assistant, cache, semantic)
+        return assistant
+
+    @staticmethod
+    def response_cache(assistant_type: str, settings: Dict[str, Any]) -> "ResponseCache":
+        """Return the process-wide response cache for an opted-in assistant type."""
+        settings = dict(settings)
+        model = settings.pop('model')
+        system_prompt = settings.pop('system_prompt')
+        return registry.get_or_create(
+            ('ResponseCache', assistant_type),
+            lambda: _load('response_cache', 'ResponseCache')(model, system_prompt, settings)
+        )
 
 
 class RequestParser:
@@ -209,11 +514,35 @@ class RequestParser:
 
         assistant_type = data.get('assistant')
         prompt = data.get('prompt')
+        session_id = data.get('session_id')
         
         if not prompt:
             raise AssistantError('Prompt is required')
+        if session_id is not None and not isinstance(session_id, str):
+            raise AssistantError('session_id must be a string')
             
-        return AssistantRequest(assistant_type=assistant_type, prompt=prompt)
+        return AssistantRequest(assistant_type=assistant_type, prompt=prompt, session_id=session_id)
+
+    @staticmethod
+    def parse_batch(event: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the items of a batch event, or None for a single request.
+
+        A batch event carries a `requests` list of {"assistant", "prompt"}
+        objects. Items are validated one by one when processed, so a bad
+        item only fails itself.
+        """
+        body = event.get('body')
+        data = json.loads(body) if body else event
+        if not isinstance(data, dict) or 'requests' not in data:
+            return None
+
+        items = data['requests']
+        if not isinstance(items, list) or not items:
+            raise AssistantError('requests must be a non-empty list')
+        if len(items) > BATCH_MAX_ITEMS:
+            raise AssistantError(f'A batch may contain at most {BATCH_MAX_ITEMS} requests')
+        return items
 
 
 class AssistantService:
@@ -223,29 +552,274 @@ class AssistantService:
         self.factory = factory
         self.parser = parser
 
+    @staticmethod
+    def _session_key(request: AssistantRequest, assistant: AssistantInterface) -> Optional[str]:
+        """Each character keeps its own memory within a game session."""
+        if request.session_id and assistant.supports_sessions:
+            return f"{request.session_id}:{request.assistant_type}"
+        return None
+
+    @staticmethod
+    def _start(request: AssistantRequest) -> None:
+        metrics.set_dimension('AssistantType', request.assistant_type)
+        metrics.set_detail('prompt', request.prompt)
+        tracing.current_span().set_attribute('floyd.assistant_type', request.assistant_type)
+        if request.session_id:
+            metrics.set_property('SessionId', request.session_id)
+            tracing.current_span().set_attribute('floyd.session_id', request.session_id)
+
+    @staticmethod
+    def _failed(error: AssistantError) -> AssistantError:
+        metrics.count('Errors')
+        metrics.set_property('StatusCode', error.status_code)
+        span = tracing.current_span()
+        span.set_attribute('http.status_code', error.status_code)
+        span.set_error(str(error))
+        return error
+
     def process_request(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Process an assistant request."""
-        try:
-            request = self.parser.parse(event)
-            assistant = self.factory.create(request.assistant_type)
-            content = assistant.process(request.prompt)
-            metadata = assistant.get_metadata()
-            response = AssistantResponse(content=content, metadata=metadata)
-            return response.to_lambda_response()
-        except AssistantError as e:
-            return e.to_lambda_response()
-        except Exception as e:
-            error = AssistantError(str(e), 500)
-            return error.to_lambda_response()
+        with metrics.request_metrics(), tracing.span('AssistantService.process_request'):
+            try:
+                with metrics.stage('Parse'):
+                    request = self.parser.parse(event)
+                self._start(request)
+                with metrics.stage('Create'):
+                    assistant = self.factory.create(request.assistant_type)
+                session_key = self._session_key(request, assistant)
+                if session_key:
+                    sessions = get_session_manager()
+                    with metrics.stage('SessionContext'):
+                        history = sessions.context(session_key)
+                    with metrics.stage('Process'):
+                        content = assistant.process(request.prompt, history)
+                    with metrics.stage('SessionRecord'):
+                        sessions.record(session_key, request.prompt, content)
+                else:
+                    with metrics.stage('Process'):
+                        content = assistant.process(request.prompt)
+                metadata = assistant.get_metadata()
+                response = AssistantResponse(content=content, metadata=metadata)
+                return response.to_lambda_response()
+            except AssistantError as e:
+                return self._failed(e).to_lambda_response()
+            except Exception as e:
+                error = AssistantError(str(e), 500)
+                return self._failed(error).to_lambda_response()
+
+    def stream_request(self, event: Dict[str, Any]) -> Iterator[str]:
+        """
+        Process an assistant request as a stream of server-sent events.
 
-def lambda_handler(event, context):
-    """AWS Lambda entry point."""
-    print("lambda_handler invoked with event:", event)
-    
+        Emits a `token` event per chunk of text as it arrives, then a `done`
+        event carrying the same `results` a non-streaming call returns, with
+        `ttft_ms` (time to first token) added to the metadata. Failures are
+        reported as an `error` event with the status code.
+        """
+        started = time.perf_counter()
+        with metrics.request_metrics(), tracing.span('AssistantService.stream_request'):
+            try:
+                with metrics.stage('Parse'):
+                    request = self.parser.parse(event)
+                self._start(request)
+                metrics.set_detail('stream', True)
+                with metrics.stage('Create'):
+                    assistant = self.factory.create(request.assistant_type)
+                session_key = self._session_key(request, assistant)
+                sessions = get_session_manager() if session_key else None
+                with metrics.stage('SessionContext'):
+                    history = sessions.context(session_key) if sessions else None
+                timed = TimedStream(assistant.stream(request.prompt, history), started)
+                for token in timed:
+                    yield sse_event('token', {'text': token})
+                if sessions:
+                    with metrics.stage('SessionRecord'):
+                        sessions.record(session_key, request.prompt, timed.content)
+                if timed.ttft_ms is not None:
+                    metrics.record_time('TimeToFirstToken', timed.ttft_ms)
+
+                metadata = dict(assistant.get_metadata() or {})
+                metadata['ttft_ms'] = timed.ttft_ms
+                response = AssistantResponse(content=timed.content, metadata=metadata)
+                yield sse_event('done', response.to_batch_item())
+            except AssistantError as e:
+                yield sse_event('error', self._failed(e).to_batch_item())
+            except Exception as e:
+                yield sse_event('error', self._failed(AssistantError(str(e), 500)).to_batch_item())
+
+
+class AsyncAssistantService(AssistantService):
+    """Async variant of AssistantService; assistants run via `process_async`."""
+
+    async def _process(self, event: Dict[str, Any]) -> Union[AssistantResponse, AssistantError]:
+        with metrics.request_metrics(), tracing.span('AsyncAssistantService.process_request'):
+            try:
+                if not isinstance(event, dict):
+                    raise AssistantError('Each request must be an object')
+                with metrics.stage('Parse'):
+                    request = self.parser.parse(event)
+                self._start(request)
+                with metrics.stage('Create'):
+                    assistant = self.factory.create(request.assistant_type)
+                session_key = self._session_key(request, assistant)
+                if session_key:
+                    sessions = get_session_manager()
+                    with metrics.stage('SessionContext'):
+                        history = sessions.context(session_key)
+                    with metrics.stage('Process'):
+                        content = await assistant.process_async(request.prompt, history)
+                    with metrics.stage('SessionRecord'):
+                        sessions.record(session_key, request.prompt, content)
+                else:
+                    with metrics.stage('Process'):
+                        content = await assistant.process_async(request.prompt)
+                metadata = assistant.get_metadata()
+                return AssistantResponse(content=content, metadata=metadata)
+            except AssistantError as e:
+                return self._failed(e)
+            except Exception as e:
+                return self._failed(AssistantError(str(e), 500))
+
+    async def process_request(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Process an assistant request without blocking the event loop."""
+        return (await self._process(event)).to_lambda_response()
+
+    async def process_batch(self, items: List[Dict[str, Any]],
+                            max_concurrency: int = BATCH_CONCURRENCY) -> Dict[str, Any]:
+        """
+        Process several requests concurrently.
+
+        At most `max_concurrency` items are in flight at once. Results come
+        back in request order, each with its own status code, so one failing
+        item never fails the batch.
+        """
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+        async def process_item(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return (await self._process(item)).to_batch_item()
+
+        results = await asyncio.gather(*(process_item(item) for item in items))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'results': results})
+        }
+
+
+def get_service() -> AssistantService:
+    """Return the process-wide service so warm invocations reuse it."""
     # Dependency injection - easy to test and extend
-    service = AssistantService(
-        factory=AssistantFactory,
-        parser=RequestParser
+    return registry.get_or_create(
+        'AssistantService',
+        lambda: AssistantService(factory=AssistantFactory, parser=RequestParser)
     )
-    
-    return service.process_request(event)
+
+
+def get_async_service() -> AsyncAssistantService:
+    """Return the process-wide async service."""
+    return registry.get_or_create(
+        'AsyncAssistantService',
+        lambda: AsyncAssistantService(factory=AssistantFactory, parser=RequestParser)
+    )
+
+
+def _log_stats() -> None:
+    print("OpenAI connection stats:", registry.connection_stats())
+    intent_classifier = sys.modules.get('intent_classifier')
+    if intent_classifier is not None:
+        # Only loaded once a Floyd request has been routed in this process
+        print("Floyd routing stats:", intent_classifier.routing_stats.to_dict())
+    print("Floyd route cache stats:", route_cache.stats())
+    print("Rewrite rule stats:", rule_stats.to_dict())
+    if SPECULATIVE_RUNS > 0:
+        print("Speculative routing stats:", speculation_stats.to_dict())
+    if stream_stats.streams:
+        print("Streaming stats:", stream_stats.to_dict())
+    output_policy = sys.modules.get('output_policy')
+    if output_policy is not None and output_policy.policy_stats.checked:
+        # Loaded with the character modules
+        print("Output policy stats:", output_policy.policy_stats.to_dict())
+    capture_stats = capture.capture_stats()
+    if capture_stats is not None:
+        print("Capture stats:", capture_stats)
+    cold_start.report_once()
+
+
+def _process_batch(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the response for a batch event, or None if the event is a single request."""
+    try:
+        items = RequestParser.parse_batch(event)
+    except AssistantError as e:
+        return e.to_lambda_response()
+    except json.JSONDecodeError:
+        # Malformed body: let the single-request path report it as before
+        return None
+    if items is None:
+        return None
+    print(f"Processing batch of {len(items)} requests")
+    return registry.run(get_async_service().process_batch(items))
+
+
+def _stream_response(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Return a text/event-stream response if the request asked for streaming, else None.
+
+    API Gateway buffers Lambda responses, so here the events arrive together;
+    http_server.py sends the same events incrementally as chunks.
+    """
+    try:
+        body = event.get('body')
+        data = json.loads(body) if body else event
+    except json.JSONDecodeError:
+        return None
+    if not wants_stream(event, data):
+        return None
+    return {
+        'statusCode': 200,
+        'headers': dict(SSE_HEADERS),
+        'body': "".join(get_service().stream_request(event)),
+    }
+
+
+def _traced(response: Dict[str, Any], root) -> Dict[str, Any]:
+    """Return our trace context to the caller so it can link its own spans."""
+    if root.recording:
+        response.setdefault('headers', {})['traceparent'] = root.traceparent()
+    return response
+
+
+def lambda_handler(event, context):
+    """AWS Lambda entry point."""
+    # Prompts are not logged; sample them with capture (FLOYD_CAPTURE_SAMPLE_RATE) instead
+    print("lambda_handler invoked with event keys:", sorted(event) if isinstance(event, dict) else type(event).__name__)
+
+    with tracing.start_trace('lambda_handler', event) as root:
+        response = _process_batch(event)
+        if response is None:
+            response = _stream_response(event)
+        if response is None:
+            response = get_service().process_request(event)
+        root.set_attribute('http.status_code', response.get('statusCode'))
+    _log_stats()
+    tracing.flush()
+    return _traced(response, root)
+
+
+def async_lambda_handler(event, context):
+    """
+    AWS Lambda entry point for the async stack.
+
+    Runs on the registry's event loop so the async connection pool stays
+    warm across invocations.
+    """
+    print("async_lambda_handler invoked with event keys:",
+          sorted(event) if isinstance(event, dict) else type(event).__name__)
+
+    with tracing.start_trace('async_lambda_handler', event) as root:
+        response = _process_batch(event)
+        if response is None:
+            response = registry.run(get_async_service().process_request(event))
+        root.set_attribute('http.status_code', response.get('statusCode'))
+    _log_stats()
+    tracing.flush()
+    return _traced(response, root)
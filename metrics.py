@@ -0,0 +1,194 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Iterator, Callable, List, Tuple
+
+# Set FLOYD_METRICS=0 to stop emitting per-request metric logs
+METRICS_ENABLED = os.environ.get("FLOYD_METRICS", "1").lower() not in {"0", "false", "no"}
+METRICS_NAMESPACE = os.environ.get("FLOYD_METRICS_NAMESPACE", "Floyd")
+
+# CloudWatch aggregates each metric by every one of these dimension sets
+DIMENSION_SETS = [["AssistantType"], ["AssistantType", "Route"], ["StartType"]]
+
+_current: contextvars.ContextVar[Optional["RequestMetrics"]] = contextvars.ContextVar(
+    "floyd_request_metrics", default=None
+)
+_cold_start = True
+_cold_start_lock = threading.Lock()
+# Called with each finished request's metrics, e.g. by the capture subsystem
+_listeners: List[Callable[["RequestMetrics"], None]] = []
+
+
+class RequestMetrics:
+    """
+    Stage timings and counts collected while serving one request.
+
+    Repeated stages add up, so a turn that lists messages twice reports the
+    total time spent listing. Stages may be recorded from worker threads.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self.started = time.perf_counter()
+        self.dimensions: Dict[str, str] = {'AssistantType': 'unknown', 'Route': 'none'}
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self.properties: Dict[str, Any] = {}
+        # Request data for listeners, such as the prompt; never written to the metric log
+        self.details: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage_name: str, ms: float) -> None:
+        with self._lock:
+            self.timings[stage_name] = self.timings.get(stage_name, 0.0) + ms
+
+    def add_count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def snapshot(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Copies of the stage timings and counts recorded so far."""
+        with self._lock:
+            return dict(self.timings), dict(self.counts)
+
+    def to_emf(self, cold_start: bool) -> Dict[str, Any]:
+        """Build the Embedded Metric Format document for this request."""
+        timings, counts = self.snapshot()
+        metrics = [{'Name': f"{name}Latency", 'Unit': 'Milliseconds'} for name in timings]
+        metrics += [{'Name': name, 'Unit': 'Count'} for name in counts]
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': DIMENSION_SETS,
+                    'Metrics': metrics,
+                }],
+            },
+            **self.properties,
+            **self.dimensions,
+            'StartType': 'cold' if cold_start else 'warm',
+        }
+        document.update({f"{name}Latency": round(ms, 2) for name, ms in timings.items()})
+        document.update(counts)
+        return document
+
+
+def current() -> Optional[RequestMetrics]:
+    """The metrics of the request being served, or None outside a request."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def request_metrics(**dimensions: str) -> Iterator[Optional[RequestMetrics]]:
+    """
+    Collect metrics for one request and log them as one EMF line when it ends.
+
+    Yields None when metrics are disabled and no listener is registered;
+    the module-level helpers are then no-ops.
+    """
+    if not METRICS_ENABLED and not _listeners:
+        yield None
+        return
+    metrics = RequestMetrics()
+    metrics.dimensions.update(dimensions)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A streamed request finished from a different context
+            pass
+        metrics.add_time('Total', (time.perf_counter() - metrics.started) * 1000)
+        if METRICS_ENABLED:
+            emit(metrics)
+        for listener in list(_listeners):
+            try:
+                listener(metrics)
+            except Exception as e:
+                # A listener must never fail the request it observes
+                print(f"Metrics listener failed: {e}")
+
+
+def add_listener(listener: Callable[[RequestMetrics], None]) -> None:
+    """Call `listener` with every request's metrics once the request ends."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[RequestMetrics], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def emit(metrics: RequestMetrics) -> None:
+    """Print the request's metrics; Lambda turns EMF log lines into CloudWatch metrics."""
+    global _cold_start
+    with _cold_start_lock:
+        cold_start, _cold_start = _cold_start, False
+    print(json.dumps(metrics.to_emf(cold_start)))
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, (time.perf_counter() - started) * 1000)
+
+
+def record_time(name: str, ms: float) -> None:
+    """Record a stage of the current request that was timed elsewhere."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(name, ms)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter of the current request."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_count(name, value)
+
+
+def count_tokens(total_tokens: Any) -> None:
+    """Add an API call's token usage to the current request's Tokens count."""
+    if isinstance(total_tokens, (int, float)) and not isinstance(total_tokens, bool):
+        count('Tokens', total_tokens)
+
+
+def count_usage(response: Any) -> None:
+    """Add a chat completion's token usage to the current request's Tokens count."""
+    count_tokens(getattr(getattr(response, 'usage', None), 'total_tokens', None))
+
+
+def set_dimension(name: str, value: str) -> None:
+    """Tag the current request, e.g. with its assistant type or route."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.dimensions[name] = value
+
+
+def set_property(name: str, value: Any) -> None:
+    """Attach a searchable, non-metric value to the current request's log line."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.properties[name] = value
+
+
+def set_detail(name: str, value: Any) -> None:
+    """Attach request data for listeners only; details never appear in the metric log."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.details[name] = value
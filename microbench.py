@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import fnmatch
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(REPO_DIR, "microbench_baseline.json")
+
+# A case fails --check once it costs this much more than its baseline. Timings of
+# microsecond calls wobble by a third on a busy machine, so the time limit only
+# catches gross slowdowns; allocations are repeatable and are held much closer.
+TIME_TOLERANCE = 2.0
+ALLOC_TOLERANCE = 1.2
+# Peak allocations this small are noise from the interpreter, not the code under test
+ALLOC_FLOOR_BYTES = 512
+
+# Prompts players actually type are short; the long ones are pasted walkthroughs
+SHORT_PROMPT = "Floyd, go north and see what is in the corridor"
+LONG_PROMPT = ("I open the hatch, climb down the ladder and look around the Feinstein's engine room for "
+               "anything that could fix the communicator; then I ask Floyd what he thinks. ") * 24
+# A long character reply, as Blather gives when he is properly worked up
+LONG_REPLY = ('Blather turns crimson. "Ensign Seventh Class! Scrub the decks of the Feinstein again, and '
+              'this time with the proper brush! Report to the brig when you are done. ') * 30
+STRUCTURED_REPLY = json.dumps({
+    "message": "Floyd bounds off to the north, humming a little tune and bumping into the door frame.",
+    "direction": "north",
+})
+LONG_STRUCTURED_REPLY = json.dumps({"message": LONG_REPLY, "item": "brush", "mood": "indignant"})
+FLOYD_METADATA = {
+    'assistant_type': 'GoSomewhere',
+    'api_round_trips': 2,
+    'route_source': 'router',
+    'parameters': {'direction': 'north'},
+}
+
+
+def _event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """An API Gateway proxy event, with the request as a JSON body."""
+    return {
+        'resource': '/floyd',
+        'httpMethod': 'POST',
+        'headers': {'Content-Type': 'application/json', 'Accept': 'application/json'},
+        'body': json.dumps(data),
+        'isBase64Encoded': False,
+    }
+
+
+def configure_environment() -> None:
+    """
+    Give `main` the configuration it needs to build every assistant offline.
+
+    Must run before `main` is imported. Values already in the environment
+    win, so the suite can be run against a deployment's own settings.
+    """
+    os.environ.setdefault('OPENAI_API_KEY', 'microbench-key')
+    os.environ.setdefault('OPENAI_ROUTER_ASSISTANT_ID', 'asst_router')
+    os.environ.setdefault('FLOYD_METRICS', '0')
+    os.environ.setdefault('FLOYD_CAPTURE_SAMPLE_RATE', '0')
+
+
+def build_cases(main) -> Dict[str, Tuple[Callable[[], Any], Callable[[Any], bool]]]:
+    """
+    The benchmarked calls, keyed by name, as (call, check) pairs.
+
+    Each check is run once on the call's result before timing, so a case
+    that starts failing (and timing its error path instead) is reported
+    rather than measured.
+    """
+    batch_size = main.BATCH_MAX_ITEMS
+    batch_event = _event({'requests': [
+        {'assistant': 'floyd' if i % 2 else 'blather', 'prompt': LONG_PROMPT, 'session_id': f"player-{i}"}
+        for i in range(batch_size)
+    ]})
+    single_event = _event({'assistant': 'floyd', 'prompt': SHORT_PROMPT, 'session_id': 'player-1'})
+    long_event = _event({'assistant': 'blather', 'prompt': LONG_PROMPT, 'session_id': 'player-1'})
+    direct_event = {'assistant': 'floyd', 'prompt': SHORT_PROMPT}
+    parse, parse_batch = main.RequestParser.parse, main.RequestParser.parse_batch
+    parse_response, create = main.ResponseParser.parse, main.AssistantFactory.create
+    short_response = main.AssistantResponse(SHORT_PROMPT, FLOYD_METADATA)
+    long_response = main.AssistantResponse(LONG_REPLY, None)
+    return {
+        'RequestParser.parse/short': (lambda: parse(single_event), lambda r: r.prompt == SHORT_PROMPT),
+        'RequestParser.parse/long': (lambda: parse(long_event), lambda r: r.prompt == LONG_PROMPT),
+        'RequestParser.parse/direct': (lambda: parse(direct_event), lambda r: r.assistant_type == 'floyd'),
+        'RequestParser.parse_batch/single': (lambda: parse_batch(single_event), lambda r: r is None),
+        'RequestParser.parse_batch/max': (lambda: parse_batch(batch_event), lambda r: len(r) == batch_size),
+        'ResponseParser.parse/structured': (lambda: parse_response(STRUCTURED_REPLY),
+                                            lambda r: r[1] == {'direction': 'north'}),
+        'ResponseParser.parse/long_structured': (lambda: parse_response(LONG_STRUCTURED_REPLY),
+                                                 lambda r: r[0] == LONG_REPLY),
+        'ResponseParser.parse/long_text': (lambda: parse_response(LONG_REPLY),
+                                           lambda r: r == (LONG_REPLY, None)),
+        'AssistantFactory.create/floyd': (lambda: create('floyd'),
+                                          lambda r: isinstance(r, main.FloydAssistant)),
+        'AssistantFactory.create/blather': (lambda: create('blather'),
+                                            lambda r: isinstance(r, main.BlatherAssistant)),
+        'AssistantFactory.create/RewriteSecondPerson': (lambda: create('RewriteSecondPerson'),
+                                                        lambda r: r.cache_settings() is not None),
+        'AssistantResponse.to_lambda_response/short': (short_response.to_lambda_response,
+                                                       lambda r: r['statusCode'] == 200),
+        'AssistantResponse.to_lambda_response/long': (long_response.to_lambda_response,
+                                                      lambda r: r['statusCode'] == 200),
+    }
+
+
+def _calibration() -> Callable[[], Any]:
+    """A fixed workload of the same kind (JSON and small dicts) that timings are measured against."""
+    data = {'results': {'single_message': SHORT_PROMPT, 'metadata': dict(FLOYD_METADATA)}}
+    return lambda: json.loads(json.dumps(data))
+
+
+def _loop_ns(fn: Callable[[], Any], number: int) -> int:
+    started = time.perf_counter_ns()
+    for _ in range(number):
+        fn()
+    return time.perf_counter_ns() - started
+
+
+def _loop_size(fn: Callable[[], Any], budget_ns: float) -> int:
+    """Calls per timed loop: doubled until one loop takes `budget_ns`."""
+    number = 1
+    while _loop_ns(fn, number) < budget_ns and number < 1 << 20:
+        number *= 2
+    return number
+
+
+def time_call(fn: Callable[[], Any], reference: Callable[[], Any], min_time: float = 0.2,
+              repeat: int = 7) -> Tuple[float, float]:
+    """
+    Nanoseconds per call of `fn`, and of `reference`: the best of `repeat` timed loops each.
+
+    The loops of the two alternate, so a machine that slows down part way
+    through slows both; comparing `fn` to `reference` rather than to the
+    clock is what keeps results comparable between runs and machines. The
+    garbage collector is paused while timing, as `timeit` does.
+    """
+    budget_ns = min_time * 1e9 / repeat / 2
+    number, reference_number = _loop_size(fn, budget_ns), _loop_size(reference, budget_ns)
+    best = reference_best = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            reference_best = min(reference_best, _loop_ns(reference, reference_number))
+            best = min(best, _loop_ns(fn, number))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best / number, reference_best / reference_number
+
+
+def measure_allocations(fn: Callable[[], Any], calls: int = 20) -> Dict[str, int]:
+    """
+    Memory allocated per call, as traced by tracemalloc.
+
+    `peak_bytes` is the most memory a call had allocated at once, which is
+    what large payloads cost; `retained_bytes` is what is still held after
+    `calls` calls, per call, and should be zero for these functions.
+    """
+    fn()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak, 'retained_bytes': max(retained // calls, 0)}
+
+
+def run_suite(pattern: str = "*", min_time: float = 0.2, repeat: int = 7,
+              allocation_calls: int = 20) -> Dict[str, Any]:
+    """Benchmark every case whose name matches `pattern`; results are keyed by case under `cases`."""
+    configure_environment()
+    # Importing main and building the assistants logs; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        cases = build_cases(main)
+        for name, (fn, check) in cases.items():
+            if fnmatch.fnmatchcase(name, pattern) and not check(fn()):
+                raise AssertionError(f"Benchmark case {name} returned an unexpected result")
+    calibration = _calibration()
+    results, calibration_times = {}, []
+    for name, (fn, _) in cases.items():
+        if not fnmatch.fnmatchcase(name, pattern):
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            ns, calibration_ns = time_call(fn, calibration, min_time, repeat)
+            allocations = measure_allocations(fn, allocation_calls)
+        calibration_times.append(calibration_ns)
+        results[name] = {
+            'ns_per_call': round(ns, 1),
+            'relative': round(ns / calibration_ns, 3),
+            **allocations,
+        }
+    return {
+        'python': platform.python_version(),
+        'calibration_ns': round(min(calibration_times, default=0.0), 1),
+        'cases': results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], time_tolerance: float = TIME_TOLERANCE,
+            alloc_tolerance: float = ALLOC_TOLERANCE) -> List[str]:
+    """
+    Regressions of `results` against a stored baseline, as readable lines.
+
+    Timings are compared relative to the calibration workload, so a
+    baseline recorded on a laptop still holds on a CI runner. Allocations
+    are compared directly, but only when both runs used the same Python
+    version, since the interpreter's own allocations differ between them.
+    """
+    regressions = []
+    same_python = results.get('python', '').rsplit('.', 1)[0] == baseline.get('python', '').rsplit('.', 1)[0]
+    for name, result in results['cases'].items():
+        expected = baseline['cases'].get(name)
+        if expected is None:
+            continue
+        if result['relative'] > expected['relative'] * time_tolerance:
+            regressions.append(f"{name}: {result['relative']:.3f}x calibration, baseline "
+                               f"{expected['relative']:.3f}x (limit {time_tolerance}x)")
+        if not same_python:
+            continue
+        for metric in ('peak_bytes', 'retained_bytes'):
+            limit = max(expected[metric] * alloc_tolerance, expected[metric] + ALLOC_FLOOR_BYTES)
+            if result[metric] > limit:
+                regressions.append(f"{name}: {metric} {result[metric]}, baseline {expected[metric]}")
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Any], path: str = BASELINE_FILE) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> List[str]:
+    lines = [f"Python {results['python']}, calibration {results['calibration_ns'] / 1000:.2f} us",
+             f"{'case':<46} {'us/call':>9} {'relative':>9} {'vs base':>8} {'peak B':>9} {'kept B':>7}"]
+    for name, r in results['cases'].items():
+        expected = (baseline or {}).get('cases', {}).get(name)
+        change = f"{r['relative'] / expected['relative']:>7.2f}x" if expected else f"{'-':>8}"
+        lines.append(f"{name:<46} {r['ns_per_call'] / 1000:>9.2f} {r['relative']:>9.3f} {change} "
+                     f"{r['peak_bytes']:>9} {r['retained_bytes']:>7}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Microbenchmark the per-request parsing, factory and response code in main.py.")
+    parser.add_argument("--only", default="*", help="Run only cases matching this glob, e.g. 'ResponseParser.*'")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case (use 1 or more with --update)")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed loops per case; the best one counts")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Stored baseline JSON")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case regressed")
+    parser.add_argument("--update", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help="Allowed slowdown against the baseline, as a factor")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON results")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.only, args.min_time, args.repeat)
+    baseline = load_baseline(args.baseline)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("\n".join(format_report(results, baseline)))
+
+    if args.update:
+        if baseline is not None and args.only != "*":
+            # Keep the cases that were not rerun
+            results = {**results, 'cases': {**baseline['cases'], **results['cases']}}
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    elif args.check:
+        if baseline is None:
+            raise SystemExit(f"No baseline at {args.baseline}; run with --update first")
+        regressions = compare(results, baseline, args.time_tolerance)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            raise SystemExit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
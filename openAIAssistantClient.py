@@ -1,10 +1,98 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterator, AsyncIterator, Tuple, List
+import asyncio
+import contextlib
+import os
+import threading
 import time
 
-from openai import OpenAI
+import metrics
+import tracing
+from client_registry import get_openai_client, get_async_openai_client
+from run_poller import TERMINAL_RUN_STATUSES, get_run_poller
+
+# Set OPENAI_RUN_MODE=poll to force the polling path even where streaming is requested
+RUN_MODE = os.environ.get("OPENAI_RUN_MODE", "stream")
+# Set OPENAI_SHARED_POLLER=0 to poll each run from its own thread with a fixed sleep
+SHARED_POLLER = os.environ.get("OPENAI_SHARED_POLLER", "1") not in {"0", "false", "no"}
+# How often a run waiting on the shared poller checks whether it has been cancelled
+CANCEL_CHECK_INTERVAL = 0.05
+
+
+def _total_tokens(run) -> Optional[int]:
+    usage = getattr(run, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _apply_stream_event(event, result: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+    """
+    Fold one Assistants stream event into `result`.
+
+    Returns (text delta or None, whether the run has finished).
+    """
+    if event.event == "thread.message.delta":
+        parts = []
+        for block in event.data.delta.content or []:
+            text = getattr(block, "text", None)
+            if text is not None and text.value:
+                parts.append(text.value)
+        return "".join(parts) or None, False
+    if event.event.startswith("thread.run.") and not event.event.startswith("thread.run.step"):
+        result["run_id"] = event.data.id
+        result["thread_id"] = getattr(event.data, "thread_id", None)
+        result["status"] = event.data.status
+        if event.data.status in TERMINAL_RUN_STATUSES:
+            result["total_tokens"] = _total_tokens(event.data)
+            return None, True
+    return None, False
+
+
+def _thread_messages(prompt: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """Messages for a new thread: any prior session context, then the prompt."""
+    messages = [{"role": m["role"], "content": m["content"]} for m in history or ()]
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+@contextlib.contextmanager
+def _traced_stage(client, name: str):
+    """Time one API call as a metrics stage and a trace span."""
+    with metrics.stage(client.metric_prefix + name), \
+            tracing.span(f"{type(client).__name__}.{name}", {'openai.assistant_id': client.assistant_id},
+                         tracing.SPAN_KIND_CLIENT) as span:
+        yield span
+
+
+def _record_run(span, run_id: Optional[str], thread_id: Optional[str], status: Optional[str] = None,
+                total_tokens: Optional[int] = None) -> None:
+    metrics.count_tokens(total_tokens)
+    span.set_attributes({
+        'openai.run_id': run_id,
+        'openai.thread_id': thread_id,
+        'openai.run_status': status,
+        'gen_ai.usage.total_tokens': total_tokens,
+    })
+
+
+def _record_result(span, result: Dict[str, Any]) -> None:
+    _record_run(span, result.get("run_id"), result.get("thread_id"), result.get("status"), result.get("total_tokens"))
+
+
+def _first_assistant_message(messages) -> Dict[str, Any]:
+    """Return the latest assistant message from a messages page."""
+    for msg in messages:
+        if msg.role == "assistant":
+            return {
+                "role": msg.role,
+                "content": msg.content[0].text.value
+            }
+
+    return {"role": "assistant", "content": "No response generated"}
 
 
 class OpenAIAssistantClient:
+    # Prefix for this client's stage metrics, so the router's runs are told apart from routed ones
+    metric_prefix = ""
+
     def __init__(self, assistant_id: str, api_key: Optional[str] = None):
         """
         Initialize OpenAIAssistantClient with an existing OpenAI assistant ID.
@@ -13,12 +101,15 @@ class OpenAIAssistantClient:
             assistant_id: The ID of the existing OpenAI assistant to use
             api_key: Optional OpenAI API key. If not provided, will use environment variable
         """
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_openai_client(api_key)
         self.assistant_id = assistant_id
+        self.run_mode = RUN_MODE
+        self.poller = get_run_poller() if SHARED_POLLER else None
 
     def create_thread(self) -> str:
         """Create a new conversation thread."""
-        thread = self.client.beta.threads.create()
+        with self._stage("ThreadCreate"):
+            thread = self.client.beta.threads.create()
         return thread.id
 
     def add_message(self, thread_id: str, content: str) -> None:
@@ -29,11 +120,12 @@ class OpenAIAssistantClient:
             thread_id: The ID of the thread to add the message to
             content: The message content
         """
-        self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=content
-        )
+        with self._stage("AddMessage"):
+            self.client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=content
+            )
 
     def run_assistant(self, thread_id: str, instructions: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -47,44 +139,165 @@ class OpenAIAssistantClient:
             Dict containing the assistant's response
         """
         # Create and start the run
-        run = self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=self.assistant_id,
-            instructions=instructions
-        )
+        with self._stage("RunCreate"):
+            run = self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                instructions=instructions
+            )
+
+        return self._await_reply(thread_id, run)
+
+    def _await_reply(self, thread_id: str, run) -> Dict[str, Any]:
+        """Wait for a run on the thread to finish and return the thread's latest reply."""
+        if run.status not in TERMINAL_RUN_STATUSES:
+            run, _ = self._wait_for_run(thread_id, run)
+
+        # Get messages
+        with self._stage("MessageList"):
+            messages = self.client.beta.threads.messages.list(thread_id=thread_id)
+        return _first_assistant_message(messages.data)
+
+    def _stage(self, name: str):
+        return _traced_stage(self, name)
+
+    def _wait_for_run(self, thread_id: str, run,
+                      cancel_event: Optional[threading.Event] = None) -> Tuple[Any, int]:
+        """
+        Poll a run until it reaches a terminal status. Returns (run, poll count).
+
+        If `cancel_event` is set first, returns early with the run as last
+        seen, still in progress; cancelling it is up to the caller.
+        """
+        with self._stage("RunPoll") as span:
+            run, polls = self._poll_run(thread_id, run, cancel_event)
+            span.set_attribute('openai.poll_count', polls)
+            _record_run(span, run.id, thread_id, run.status, _total_tokens(run))
+        metrics.count(self.metric_prefix + "Polls", polls)
+        return run, polls
+
+    def _poll_run(self, thread_id: str, run,
+                  cancel_event: Optional[threading.Event] = None) -> Tuple[Any, int]:
+        if self.poller is not None:
+            if cancel_event is None:
+                return self.poller.wait(self.client, thread_id, run.id, self.assistant_id)
+            future = self.poller.submit(self.client, thread_id, run.id, self.assistant_id)
+            while not future.done():
+                if cancel_event.wait(CANCEL_CHECK_INTERVAL):
+                    future.cancel()
+                    return run, 0
+            return future.result()
 
-        # Wait for run to complete
+        polls = 0
         while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return run, polls
             run = self.client.beta.threads.runs.retrieve(
                 thread_id=thread_id,
                 run_id=run.id
             )
-            if run.status in {
-                "completed",
-                "failed",
-                "cancelled",
-                "expired",
-                "requires_action",
-            }:
-                break
+            polls += 1
+            if run.status in TERMINAL_RUN_STATUSES:
+                return run, polls
             # Avoid hammering the API in a tight loop
-            time.sleep(1)
+            if cancel_event is not None:
+                cancel_event.wait(1)
+            else:
+                time.sleep(1)
 
-        # Get messages
-        messages = self.client.beta.threads.messages.list(thread_id=thread_id)
+    def cancel_run(self, thread_id: Optional[str], run_id: Optional[str]) -> bool:
+        """Best-effort cancellation of an in-flight run. Returns True if the request was sent."""
+        if not thread_id or not run_id:
+            return False
+        try:
+            self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            return True
+        except Exception as e:
+            # The run may already have finished; nothing left to stop
+            print(f"Could not cancel run {run_id}: {e}")
+            return False
+
+    def _iter_stream_deltas(self, stream, result: Dict[str, Any],
+                            cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Yield text deltas from an Assistants event stream.
+
+        The run ID, thread ID, final status and token usage are recorded into
+        `result` as the corresponding run events arrive. If `cancel_event` is
+        set while the run is still going, the run is cancelled and the stream
+        closed.
+        """
+        try:
+            for event in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    result["status"] = "cancelled"
+                    result["cancelled"] = self.cancel_run(result.get("thread_id"), result.get("run_id"))
+                    break
+                text, finished = _apply_stream_event(event, result)
+                if text:
+                    yield text
+                if finished:
+                    break
+        finally:
+            stream.close()
+
+    def _open_stream(self, thread_id: str, instructions: Optional[str] = None):
+        return self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            instructions=instructions,
+            stream=True
+        )
+
+    def stream_assistant(self, thread_id: str, instructions: Optional[str] = None,
+                         on_token: Optional[Callable[[str], None]] = None,
+                         result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run the assistant using the event stream and return as soon as the run ends.
+
+        Args:
+            thread_id: The ID of the thread to run the assistant on
+            instructions: Optional override instructions for this run
+            on_token: Optional callback invoked with each text delta as it arrives
+            result: Optional dict that receives the run ID, status and token usage
+
+        Returns:
+            Dict containing the assistant's response
+        """
+        result = {} if result is None else result
+        parts = []
+        with self._stage("RunStream") as span:
+            for token in self._iter_stream_deltas(self._open_stream(thread_id, instructions), result):
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+            _record_result(span, result)
 
-        # Return the latest assistant message
-        for msg in messages.data:
-            if msg.role == "assistant":
-                return {
-                    "role": msg.role,
-                    "content": msg.content[0].text.value
-                }
+        content = "".join(parts)
+        return {"role": "assistant", "content": content or "No response generated"}
 
-        return {"role": "assistant", "content": "No response generated"}
+    def _execute_run(self, thread_id: str, instructions: Optional[str], stream: bool,
+                     on_token: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        """Run in streaming mode when requested and enabled, otherwise poll."""
+        if stream and self.run_mode == "stream":
+            result: Dict[str, Any] = {}
+            try:
+                return self.stream_assistant(thread_id, instructions, on_token, result)
+            except Exception as e:
+                if result.get("run_id") is not None:
+                    # The run exists and may already have sent tokens; starting a
+                    # second one would pay for the reply twice
+                    print(f"Stream of run {result['run_id']} broke off, polling the run instead: {e}")
+                    run = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=result["run_id"])
+                    return self._await_reply(thread_id, run)
+                # No run was started; the polling path still works against
+                # older API deployments
+                print(f"Streaming run failed, falling back to polling: {e}")
+        return self.run_assistant(thread_id, instructions)
 
     def chat(self, prompt: str, thread_id: Optional[str] = None,
-             instructions: Optional[str] = None) -> Dict[str, Any]:
+             instructions: Optional[str] = None, stream: bool = False,
+             on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Send a message and get a response in a single call.
         Creates a new thread if thread_id is not provided.
@@ -93,6 +306,8 @@ class OpenAIAssistantClient:
             prompt: The prompt to send
             thread_id: Optional thread ID to continue an existing conversation
             instructions: Optional override instructions for this run
+            stream: Use the streaming run path instead of polling
+            on_token: Optional callback for text deltas (streaming only)
 
         Returns:
             Dict containing the assistant's response
@@ -101,4 +316,423 @@ class OpenAIAssistantClient:
             thread_id = self.create_thread()
 
         self.add_message(thread_id, prompt)
-        return self.run_assistant(thread_id, instructions)
\ No newline at end of file
+        return self._execute_run(thread_id, instructions, stream, on_token)
+
+    def stream_chat(self, prompt: str, thread_id: Optional[str] = None,
+                    instructions: Optional[str] = None) -> Iterator[str]:
+        """
+        Send a message and yield the assistant's reply token by token.
+
+        Args:
+            prompt: The prompt to send
+            thread_id: Optional thread ID to continue an existing conversation
+            instructions: Optional override instructions for this run
+        """
+        if thread_id is None:
+            thread_id = self.create_thread()
+
+        self.add_message(thread_id, prompt)
+        yield from self._iter_stream_deltas(self._open_stream(thread_id, instructions), {})
+
+    def stream_once(self, prompt: str, instructions: Optional[str] = None,
+                    history: Optional[List[Dict[str, str]]] = None,
+                    result: Optional[Dict[str, Any]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Create thread and run in one streamed request and yield the reply's text deltas.
+
+        The run ID, thread ID, final status and token usage are recorded into
+        `result` when one is passed in.
+        """
+        result = {} if result is None else result
+        with self._stage("RunStream") as span:
+            stream = self.client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id,
+                thread={"messages": _thread_messages(prompt, history)},
+                instructions=instructions,
+                stream=True
+            )
+            try:
+                yield from self._iter_stream_deltas(stream, result, cancel_event)
+            finally:
+                _record_result(span, result)
+
+    def _stream_once(self, prompt: str, instructions: Optional[str],
+                     on_token: Optional[Callable[[str], None]],
+                     cancel_event: Optional[threading.Event] = None,
+                     history: Optional[List[Dict[str, str]]] = None,
+                     result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create thread and run in one streamed request."""
+        result = {} if result is None else result
+        parts = []
+        for token in self.stream_once(prompt, instructions, history, result, cancel_event):
+            parts.append(token)
+            if on_token:
+                on_token(token)
+
+        content = "".join(parts)
+        return {
+            "role": "assistant",
+            "content": content or "No response generated",
+            "thread_id": result.get("thread_id"),
+            "run_id": result.get("run_id"),
+            "status": result.get("status"),
+            "total_tokens": result.get("total_tokens"),
+            "round_trips": 1 + int(bool(result.get("cancelled"))),
+        }
+
+    def _poll_once(self, prompt: str, instructions: Optional[str],
+                   cancel_event: Optional[threading.Event] = None,
+                   history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Create thread and run together, poll it, then list only that run's messages."""
+        with self._stage("RunCreate"):
+            run = self.client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id,
+                thread={"messages": _thread_messages(prompt, history)},
+                instructions=instructions
+            )
+        run, polls = self._wait_for_run(run.thread_id, run, cancel_event)
+        if run.status not in TERMINAL_RUN_STATUSES:
+            # Cancelled while still going: stop it rather than pay for a reply nobody reads
+            cancelled = self.cancel_run(run.thread_id, run.id)
+            return {
+                "role": "assistant",
+                "content": "",
+                "thread_id": run.thread_id,
+                "run_id": run.id,
+                "status": "cancelled",
+                "total_tokens": None,
+                "round_trips": 1 + polls + int(cancelled),
+            }
+        return self._run_reply(run, 1 + polls)
+
+    def _resume_run(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        """Wait for a run whose stream broke off and return its reply."""
+        run = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        polls = 0
+        if run.status not in TERMINAL_RUN_STATUSES:
+            run, polls = self._wait_for_run(thread_id, run)
+        # The broken stream and the lookup, then the polls
+        return self._run_reply(run, 2 + polls)
+
+    def _run_reply(self, run, round_trips: int) -> Dict[str, Any]:
+        """Fetch only a finished run's messages; `round_trips` counts the calls made so far."""
+        with self._stage("MessageList"):
+            messages = self.client.beta.threads.messages.list(
+                thread_id=run.thread_id,
+                run_id=run.id,
+                order="desc",
+                limit=1
+            )
+        response = _first_assistant_message(messages.data)
+        response.update({
+            "thread_id": run.thread_id,
+            "run_id": run.id,
+            "status": run.status,
+            "total_tokens": _total_tokens(run),
+            "round_trips": round_trips + 1,
+        })
+        return response
+
+    def run_once(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 on_token: Optional[Callable[[str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Run a single-turn conversation with the fewest possible API round trips.
+
+        The thread and the run are created by one `create_and_run` call, and
+        only the messages belonging to that run are fetched afterwards.
+        Streaming needs one round trip in total; polling needs two plus one
+        per poll.
+
+        Args:
+            prompt: The prompt to send
+            instructions: Optional override instructions for this run
+            stream: Use the streaming run path instead of polling
+            on_token: Optional callback for text deltas (streaming only)
+            cancel_event: Optional event that cancels the run once set
+            history: Optional earlier session messages to seed the thread with
+
+        Returns:
+            Dict containing the assistant's response, plus `thread_id`,
+            `run_id`, `status`, `total_tokens` and `round_trips`
+        """
+        if stream and self.run_mode == "stream":
+            result: Dict[str, Any] = {}
+            try:
+                return self._stream_once(prompt, instructions, on_token, cancel_event, history, result)
+            except Exception as e:
+                if result.get("run_id") is not None:
+                    if not result.get("thread_id"):
+                        raise
+                    # Tokens may already have gone out; a second run would be
+                    # billed again and its reply would not match them
+                    print(f"Stream of run {result['run_id']} broke off, polling the run instead: {e}")
+                    return self._resume_run(result["thread_id"], result["run_id"])
+                print(f"Streaming run failed, falling back to polling: {e}")
+        return self._poll_once(prompt, instructions, cancel_event, history)
+
+
+
+class AsyncOpenAIAssistantClient:
+    """Async counterpart of OpenAIAssistantClient built on AsyncOpenAI."""
+
+    metric_prefix = ""
+
+    def __init__(self, assistant_id: str, api_key: Optional[str] = None):
+        """
+        Initialize AsyncOpenAIAssistantClient with an existing OpenAI assistant ID.
+
+        Args:
+            assistant_id: The ID of the existing OpenAI assistant to use
+            api_key: Optional OpenAI API key. If not provided, will use environment variable
+        """
+        self.client = get_async_openai_client(api_key)
+        self.assistant_id = assistant_id
+        self.run_mode = RUN_MODE
+        self.poller = get_run_poller()
+
+    async def create_thread(self) -> str:
+        """Create a new conversation thread."""
+        with self._stage("ThreadCreate"):
+            thread = await self.client.beta.threads.create()
+        return thread.id
+
+    async def add_message(self, thread_id: str, content: str) -> None:
+        """Add a user message to an existing thread."""
+        with self._stage("AddMessage"):
+            await self.client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=content
+            )
+
+    async def cancel_run(self, thread_id: Optional[str], run_id: Optional[str]) -> bool:
+        """Best-effort cancellation of an in-flight run. Returns True if the request was sent."""
+        if not thread_id or not run_id:
+            return False
+        try:
+            await self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+            return True
+        except Exception as e:
+            print(f"Could not cancel run {run_id}: {e}")
+            return False
+
+    def _stage(self, name: str):
+        return _traced_stage(self, name)
+
+    async def _wait_for_run(self, thread_id: str, run) -> Tuple[Any, int]:
+        """Poll a run on the shared adaptive schedule. Returns (run, poll count)."""
+        with self._stage("RunPoll") as span:
+            run, polls = await self._poll_run(thread_id, run)
+            span.set_attribute('openai.poll_count', polls)
+            _record_run(span, run.id, thread_id, run.status, _total_tokens(run))
+        metrics.count(self.metric_prefix + "Polls", polls)
+        return run, polls
+
+    async def _poll_run(self, thread_id: str, run) -> Tuple[Any, int]:
+        started = time.monotonic()
+        polls = 0
+        try:
+            for delay in self.poller.delays(self.assistant_id):
+                await asyncio.sleep(delay)
+                run = await self.client.beta.threads.runs.retrieve(
+                    thread_id=thread_id,
+                    run_id=run.id
+                )
+                polls += 1
+                if run.status in TERMINAL_RUN_STATUSES:
+                    self.poller.record_duration(self.assistant_id, time.monotonic() - started)
+                    return run, polls
+        except asyncio.CancelledError:
+            await self.cancel_run(thread_id, run.id)
+            raise
+
+    async def run_assistant(self, thread_id: str, instructions: Optional[str] = None) -> Dict[str, Any]:
+        """Run the assistant on the thread, poll until done and return the latest reply."""
+        with self._stage("RunCreate"):
+            run = await self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                instructions=instructions
+            )
+        return await self._await_reply(thread_id, run)
+
+    async def _await_reply(self, thread_id: str, run) -> Dict[str, Any]:
+        """Wait for a run on the thread to finish and return the thread's latest reply."""
+        if run.status not in TERMINAL_RUN_STATUSES:
+            run, _ = await self._wait_for_run(thread_id, run)
+        with self._stage("MessageList"):
+            messages = await self.client.beta.threads.messages.list(thread_id=thread_id)
+        return _first_assistant_message(messages.data)
+
+    async def _iter_stream_deltas(self, stream, result: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Yield text deltas from an async Assistants event stream.
+
+        If the consuming task is cancelled mid-run, the run itself is
+        cancelled before the cancellation propagates.
+        """
+        try:
+            async for event in stream:
+                text, finished = _apply_stream_event(event, result)
+                if text:
+                    yield text
+                if finished:
+                    break
+        except asyncio.CancelledError:
+            result["status"] = "cancelled"
+            await self.cancel_run(result.get("thread_id"), result.get("run_id"))
+            raise
+        finally:
+            await stream.close()
+
+    async def _collect(self, stream, on_token: Optional[Callable[[str], None]],
+                       result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        result = {} if result is None else result
+        parts = []
+        async for token in self._iter_stream_deltas(stream, result):
+            parts.append(token)
+            if on_token:
+                on_token(token)
+        result["content"] = "".join(parts)
+        return result
+
+    async def stream_assistant(self, thread_id: str, instructions: Optional[str] = None,
+                               on_token: Optional[Callable[[str], None]] = None,
+                               result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the assistant using the event stream and return as soon as the run ends."""
+        with self._stage("RunStream") as span:
+            stream = await self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=self.assistant_id,
+                instructions=instructions,
+                stream=True
+            )
+            result = await self._collect(stream, on_token, result)
+            _record_result(span, result)
+        return {"role": "assistant", "content": result["content"] or "No response generated"}
+
+    async def chat(self, prompt: str, thread_id: Optional[str] = None,
+                   instructions: Optional[str] = None, stream: bool = False,
+                   on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Send a message and get a response, creating a thread if none is given."""
+        if thread_id is None:
+            thread_id = await self.create_thread()
+
+        await self.add_message(thread_id, prompt)
+        if stream and self.run_mode == "stream":
+            result: Dict[str, Any] = {}
+            try:
+                return await self.stream_assistant(thread_id, instructions, on_token, result)
+            except Exception as e:
+                if result.get("run_id") is not None:
+                    # Don't pay for the reply twice; wait for the run already going
+                    print(f"Stream of run {result['run_id']} broke off, polling the run instead: {e}")
+                    run = await self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=result["run_id"])
+                    return await self._await_reply(thread_id, run)
+                print(f"Streaming run failed, falling back to polling: {e}")
+        return await self.run_assistant(thread_id, instructions)
+
+    async def stream_chat(self, prompt: str, thread_id: Optional[str] = None,
+                          instructions: Optional[str] = None) -> AsyncIterator[str]:
+        """Send a message and yield the assistant's reply token by token."""
+        if thread_id is None:
+            thread_id = await self.create_thread()
+
+        await self.add_message(thread_id, prompt)
+        stream = await self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            instructions=instructions,
+            stream=True
+        )
+        async for token in self._iter_stream_deltas(stream, {}):
+            yield token
+
+    async def _stream_once(self, prompt: str, instructions: Optional[str],
+                           on_token: Optional[Callable[[str], None]],
+                           history: Optional[List[Dict[str, str]]] = None,
+                           result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._stage("RunStream") as span:
+            stream = await self.client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id,
+                thread={"messages": _thread_messages(prompt, history)},
+                instructions=instructions,
+                stream=True
+            )
+            result = await self._collect(stream, on_token, result)
+            _record_result(span, result)
+        return {
+            "role": "assistant",
+            "content": result["content"] or "No response generated",
+            "thread_id": result.get("thread_id"),
+            "run_id": result.get("run_id"),
+            "status": result.get("status"),
+            "total_tokens": result.get("total_tokens"),
+            "round_trips": 1,
+        }
+
+    async def _poll_once(self, prompt: str, instructions: Optional[str],
+                         history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        with self._stage("RunCreate"):
+            run = await self.client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id,
+                thread={"messages": _thread_messages(prompt, history)},
+                instructions=instructions
+            )
+        run, polls = await self._wait_for_run(run.thread_id, run)
+        return await self._run_reply(run, 1 + polls)
+
+    async def _resume_run(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        """Wait for a run whose stream broke off and return its reply."""
+        run = await self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        polls = 0
+        if run.status not in TERMINAL_RUN_STATUSES:
+            run, polls = await self._wait_for_run(thread_id, run)
+        return await self._run_reply(run, 2 + polls)
+
+    async def _run_reply(self, run, round_trips: int) -> Dict[str, Any]:
+        """Fetch only a finished run's messages; `round_trips` counts the calls made so far."""
+        with self._stage("MessageList"):
+            messages = await self.client.beta.threads.messages.list(
+                thread_id=run.thread_id,
+                run_id=run.id,
+                order="desc",
+                limit=1
+            )
+        response = _first_assistant_message(messages.data)
+        response.update({
+            "thread_id": run.thread_id,
+            "run_id": run.id,
+            "status": run.status,
+            "total_tokens": _total_tokens(run),
+            "round_trips": round_trips + 1,
+        })
+        return response
+
+    async def run_once(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                       on_token: Optional[Callable[[str], None]] = None,
+                       history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Async single-turn run with the fewest API round trips (see OpenAIAssistantClient.run_once).
+
+        Cancel the awaiting task to cancel the run.
+        """
+        if stream and self.run_mode == "stream":
+            result: Dict[str, Any] = {}
+            try:
+                return await self._stream_once(prompt, instructions, on_token, history, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if result.get("run_id") is not None:
+                    if not result.get("thread_id"):
+                        raise
+                    # Tokens may already have gone out; a second run would be
+                    # billed again and its reply would not match them
+                    print(f"Stream of run {result['run_id']} broke off, polling the run instead: {e}")
+                    return await self._resume_run(result["thread_id"], result["run_id"])
+                print(f"Streaming run failed, falling back to polling: {e}")
+        return await self._poll_once(prompt, instructions, history)
@@ -0,0 +1,221 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Iterable, Iterator
+
+_TERMINATORS = ".!?"
+# Closing quotes and brackets that belong to the sentence they follow
+_CLOSERS = "\"'”’)]"
+# Words whose trailing period does not end a sentence
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "lt", "cpt", "capt", "sgt", "vs", "etc"}
+
+
+@dataclass(frozen=True)
+class OutputPolicy:
+    """
+    Limits a character declares for its replies.
+
+    `max_sentences` and `max_characters` cap the reply; it is always cut at a
+    sentence boundary. `attribution` is a regex the reply must contain (e.g.
+    the "Blather says," before dialogue); replies without it are counted,
+    not rejected.
+    """
+    max_sentences: Optional[int] = None
+    max_characters: Optional[int] = None
+    attribution: Optional[str] = None
+
+
+class PolicyStats:
+    """Counts of replies checked against an output policy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.truncated = 0
+        self.attribution_missing = 0
+
+    def record(self, enforcer: "PolicyEnforcer") -> None:
+        with self._lock:
+            self.checked += 1
+            self.truncated += int(enforcer.truncated)
+            self.attribution_missing += int(not enforcer.attribution_ok)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'truncated': self.truncated,
+                'truncated_rate': round(self.truncated / self.checked, 3) if self.checked else 0.0,
+                'attribution_missing': self.attribution_missing,
+            }
+
+
+policy_stats = PolicyStats()
+
+
+class PolicyEnforcer:
+    """
+    Checks generated text against a policy as it arrives.
+
+    `feed` returns the text that may be shown so far and sets `done` once the
+    policy is met, at which point generation should be stopped. A sentence
+    only counts as finished when whitespace (or the end of the reply) follows
+    its terminator, so "3.5" or "?!" never end one early. With a character
+    limit, text is released a sentence at a time, since an unfinished
+    sentence might not fit.
+    """
+
+    def __init__(self, policy: OutputPolicy):
+        self.policy = policy
+        self.text = ""
+        self.sentences = 0
+        self.boundary = 0  # end of the last complete sentence
+        self.cut: Optional[int] = None
+        self.done = False
+        self.truncated = False
+        self._released = 0
+        self._scan = 0
+
+    def feed(self, chunk: str) -> str:
+        """Add generated text; return the part that can be released now."""
+        if self.done or not chunk:
+            return ""
+        self.text += chunk
+        self._find_boundaries(final=False)
+        return self._release()
+
+    def finish(self) -> str:
+        """Generation ended on its own; return whatever is left to release."""
+        if not self.done:
+            self._find_boundaries(final=True)
+            if not self.done:
+                limit = self.policy.max_characters
+                if limit is not None and len(self.text.rstrip()) > limit:
+                    self._stop(self.boundary or self._word_boundary(limit))
+                else:
+                    self.cut = len(self.text)
+                    self.done = True
+        return self._release()
+
+    @property
+    def released_text(self) -> str:
+        return self.text[:self._released]
+
+    @property
+    def attribution_ok(self) -> bool:
+        if not self.policy.attribution:
+            return True
+        return re.search(self.policy.attribution, self.released_text) is not None
+
+    def _stop(self, cut: int) -> None:
+        self.cut = cut
+        self.done = True
+        self.truncated = True
+
+    def _word_boundary(self, limit: int) -> int:
+        # A single sentence longer than the limit; cut it between words
+        space = self.text.rfind(" ", 0, limit + 1)
+        return space if space > 0 else limit
+
+    def _find_boundaries(self, final: bool) -> None:
+        text = self.text
+        i = self._scan
+        while i < len(text) and not self.done:
+            if text[i] not in _TERMINATORS:
+                i += 1
+                continue
+            j = i
+            while j < len(text) and text[j] in _TERMINATORS:
+                j += 1
+            run = text[i:j]
+            while j < len(text) and text[j] in _CLOSERS:
+                j += 1
+            if j == len(text) and not final:
+                # Can't tell yet whether this ends the sentence
+                break
+            if (j == len(text) or text[j].isspace()) and self._ends_sentence(i, run):
+                self._sentence_end(j, final)
+            i = j
+        self._scan = i
+        limit = self.policy.max_characters
+        if not self.done and limit is not None and len(text) > limit and self._scan >= limit:
+            # The sentence in progress can no longer end within the limit
+            self._stop(self.boundary or self._word_boundary(limit))
+
+    def _ends_sentence(self, index: int, run: str) -> bool:
+        if len(run) > 1 and set(run) == {"."}:
+            return False  # an ellipsis
+        if run == ".":
+            word = re.search(r"(\w+)$", self.text[:index])
+            if word and (word.group(1).lower() in _ABBREVIATIONS or len(word.group(1)) == 1 and word.group(1).isupper()):
+                return False
+        return True
+
+    def _sentence_end(self, end: int, final: bool) -> None:
+        limit = self.policy.max_characters
+        if limit is not None and end > limit:
+            self._stop(self.boundary or self._word_boundary(limit))
+            return
+        self.sentences += 1
+        self.boundary = end
+        if self.policy.max_sentences is not None and self.sentences >= self.policy.max_sentences:
+            self.cut = end
+            self.done = True
+            # Mid-stream we stop a model that is still generating
+            self.truncated = not final or bool(self.text[end:].strip())
+
+    def _release(self) -> str:
+        if self.done:
+            end = self.cut
+        elif self.policy.max_characters is not None:
+            end = self.boundary
+        else:
+            end = len(self.text)
+        released = self.text[self._released:end]
+        self._released = max(self._released, end)
+        if self.done and self.truncated:
+            released += self._closing_quote(self.text[:end])
+        return released
+
+    @staticmethod
+    def _closing_quote(text: str) -> str:
+        """Close dialogue left open by the cut."""
+        if text.count("“") > text.count("”"):
+            return "”"
+        if text.count('"') % 2:
+            return '"'
+        return ""
+
+
+def enforce(tokens: Iterable[str], policy: OutputPolicy,
+            stats: Optional[PolicyStats] = policy_stats) -> Iterator[str]:
+    """
+    Yield streamed text until the policy is met, then stop generating.
+
+    Stopping closes `tokens`; for a chat completion stream that closes the
+    HTTP connection, which ends generation on the server.
+    """
+    enforcer = PolicyEnforcer(policy)
+    tokens = iter(tokens)
+    try:
+        for token in tokens:
+            text = enforcer.feed(token)
+            if text:
+                yield text
+            if enforcer.done:
+                break
+        else:
+            text = enforcer.finish()
+            if text:
+                yield text
+    finally:
+        close = getattr(tokens, "close", None)
+        if close is not None:
+            close()
+        if stats is not None:
+            stats.record(enforcer)
+
+
+def trim(text: str, policy: OutputPolicy, stats: Optional[PolicyStats] = policy_stats) -> str:
+    """Apply the policy to a finished reply."""
+    return "".join(enforce([text], policy, stats))
@@ -0,0 +1,338 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+
+from benchmark import summarise
+
+# Columns of an exported saturation curve, one row per load level
+CURVE_FIELDS = ['label', 'mode', 'level', 'offered_rps', 'requests', 'throughput_rps', 'error_rate',
+                'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms']
+
+
+def load_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a JSONL request log, such as a capture file.
+
+    Each line needs a `prompt`; `assistant`, `session_id` and the recording
+    time `ts` are used when present, so replayed turns keep their sessions.
+    Other fields (timings, routes) are ignored.
+    """
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get('prompt'):
+                continue
+            event = {'assistant': record.get('assistant'), 'prompt': record['prompt']}
+            if record.get('session_id'):
+                event['session_id'] = record['session_id']
+            entries.append({'event': event, 'ts': record.get('ts')})
+    return entries
+
+
+class _Discard(io.TextIOBase):
+    """A stdout replacement that drops everything written to it, however long the run."""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+
+def _route(body: Any) -> Optional[str]:
+    """The Floyd route a response was served by, from its metadata."""
+    try:
+        data = json.loads(body) if isinstance(body, (str, bytes)) else body
+        return data['results']['metadata']['assistant_type']
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class InProcessTarget:
+    """Sends events straight to a Lambda handler function."""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def send(self, event: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+        response = self.handler(dict(event), None)
+        return response.get('statusCode', 200), _route(response.get('body'))
+
+
+class HttpTarget:
+    """POSTs events as JSON to an HTTP endpoint, e.g. http_server.py or API Gateway."""
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(self.url, data=json.dumps(event).encode("utf-8"),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, _route(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+def poisson_offsets(count: int, rate: float, rng: random.Random) -> List[float]:
+    """Arrival times in seconds for `count` requests arriving at `rate` per second on average."""
+    offsets, t = [], 0.0
+    for _ in range(count):
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+def recorded_offsets(entries: List[Dict[str, Any]], time_scale: float = 1.0) -> List[float]:
+    """
+    Arrival times that reproduce the recording's own pacing.
+
+    The gaps between recorded timestamps are kept, divided by `time_scale`
+    (2 replays twice as fast). Entries without a timestamp, and the wrap
+    back to the start of a log repeated to reach --requests, follow the
+    previous entry immediately.
+    """
+    offsets, t, previous = [], 0.0, None
+    for entry in entries:
+        ts = entry.get('ts')
+        if ts is not None:
+            if previous is not None:
+                t += max(ts - previous, 0.0) / time_scale
+            previous = ts
+        offsets.append(t)
+    return offsets
+
+
+class ReplayRunner:
+    """
+    Replays logged requests against a target and summarises the results.
+
+    Closed-loop runs keep `concurrency` requests in flight. Open-loop runs
+    send each request at its scheduled arrival time whether or not earlier
+    ones have finished; their latency is measured from that scheduled time,
+    so queueing behind a saturated target counts against it.
+    """
+
+    def __init__(self, target, max_in_flight: int = 256):
+        self.target = target
+        self.max_in_flight = max_in_flight
+
+    def _send(self, entry: Dict[str, Any], scheduled: float) -> Dict[str, Any]:
+        event = entry['event']
+        try:
+            status, route = self.target.send(event)
+        except Exception as e:
+            print(f"Replay request failed: {e}")
+            status, route = 599, None
+        return {
+            'assistant': event.get('assistant'),
+            'route': route,
+            'status': status,
+            'latency_ms': (time.perf_counter() - scheduled) * 1000,
+        }
+
+    def closed_loop(self, entries: List[Dict[str, Any]], concurrency: int) -> Tuple[List[Dict[str, Any]], float]:
+        pending = iter(entries)
+        lock = threading.Lock()
+        results: List[Dict[str, Any]] = []
+
+        def worker():
+            while True:
+                with lock:
+                    entry = next(pending, None)
+                if entry is None:
+                    return
+                result = self._send(entry, time.perf_counter())
+                with lock:
+                    results.append(result)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(max(concurrency, 1))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def open_loop(self, entries: List[Dict[str, Any]], offsets: List[float]) -> Tuple[List[Dict[str, Any]], float]:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = []
+            for entry, offset in zip(entries, offsets):
+                scheduled = started + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._send, entry, scheduled))
+            results = [f.result() for f in futures]
+        return results, time.perf_counter() - started
+
+
+def build_report(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Overall, per assistant type and per Floyd route summaries of one load level, in name order."""
+    by_assistant: Dict[str, List[Dict[str, Any]]] = {}
+    by_route: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        by_assistant.setdefault(str(result['assistant']), []).append(result)
+        if result['assistant'] == 'floyd' and result['route']:
+            by_route.setdefault(result['route'], []).append(result)
+    return {
+        'overall': summarise(results, elapsed),
+        'assistants': {name: summarise(by_assistant[name], elapsed) for name in sorted(by_assistant)},
+        'routes': {name: summarise(by_route[name], elapsed) for name in sorted(by_route)},
+    }
+
+
+def curve_row(label: str, mode: str, level: float, offered_rps: Optional[float],
+              report: Dict[str, Any]) -> Dict[str, Any]:
+    overall = report['overall']
+    return {
+        'label': label,
+        'mode': mode,
+        'level': level,
+        'offered_rps': offered_rps,
+        'requests': overall['turns'],
+        **{field: overall[field] for field in CURVE_FIELDS[5:]},
+    }
+
+
+def export_curve(rows: List[Dict[str, Any]], path: str) -> None:
+    """Write a saturation curve as CSV (for .csv paths) or JSON."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=CURVE_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, f, indent=2)
+
+
+def format_report(title: str, report: Dict[str, Any]) -> List[str]:
+    lines = [title, f"  {'':<22} {'requests':>8} {'err %':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"]
+
+    def row(name, s):
+        lines.append(f"  {name:<22} {s['turns']:>8} {s['error_rate'] * 100:>6.1f} {s['p50_ms']:>9.1f} "
+                     f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['throughput_rps']:>8.2f}")
+
+    row('all', report['overall'])
+    for name, summary in report['assistants'].items():
+        row(name, summary)
+    for name, summary in report['routes'].items():
+        row(f"floyd/{name}", summary)
+    return lines
+
+
+def plan_levels(entries: List[Dict[str, Any]], concurrency: List[float], rates: List[float], recorded: bool,
+                time_scales: List[float], rng: random.Random) -> List[Tuple[str, float, Optional[List[float]]]]:
+    """
+    The load levels of a run as (mode, level, arrival offsets) tuples.
+
+    Poisson rates and recorded pacing are sped up by each time scale;
+    closed-loop levels have no arrival offsets. Defaults to one closed-loop
+    request at a time.
+    """
+    if rates:
+        return [('poisson', rate * scale, poisson_offsets(len(entries), rate * scale, rng))
+                for rate in rates for scale in time_scales]
+    if recorded:
+        return [('recorded', scale, recorded_offsets(entries, scale)) for scale in time_scales]
+    return [('closed', int(level), None) for level in concurrency or [1]]
+
+
+def run_levels(runner: ReplayRunner, entries: List[Dict[str, Any]],
+               levels: List[Tuple[str, float, Optional[List[float]]]], label: str = "",
+               quiet=None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Replay `entries` at each level; returns the reports and the saturation curve rows."""
+    reports, rows = [], []
+    for mode, level, offsets in levels:
+        with quiet or contextlib.nullcontext():
+            if offsets is None:
+                results, elapsed = runner.closed_loop(entries, int(level))
+            else:
+                results, elapsed = runner.open_loop(entries, offsets)
+        offered = round((len(offsets) - 1) / offsets[-1], 2) if offsets and offsets[-1] > 0 else None
+        report = build_report(results, elapsed)
+        reports.append({'mode': mode, 'level': level, **report})
+        rows.append(curve_row(label, mode, level, offered, report))
+    return reports, rows
+
+
+def _levels(value: Optional[str]) -> List[float]:
+    return [float(v) for v in value.split(",") if v.strip()] if value else []
+
+
+def _in_process_handler(fake: bool, config_path: Optional[str]):
+    """Import main, first pointing it at an in-process fake OpenAI server if asked to."""
+    if fake:
+        import benchmark
+        import fake_openai
+
+        config = fake_openai.load_config(config_path) if config_path else benchmark.BENCHMARK_CONFIG
+        _, base_url = fake_openai.start(0, config)
+        benchmark.configure_environment(base_url, cache=True)
+    import main
+    return main.lambda_handler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a JSONL request log against lambda_handler or an HTTP endpoint.")
+    parser.add_argument("log", help="JSONL request log, e.g. a capture file")
+    parser.add_argument("--url", help="POST requests to this endpoint instead of calling lambda_handler in process")
+    parser.add_argument("--fake", action="store_true", help="In process: answer API calls with a local fake OpenAI server")
+    parser.add_argument("--config", help="Fake server config JSON (with --fake)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", help="Closed loop: comma-separated concurrency levels (default 1)")
+    load.add_argument("--rate", help="Open loop: comma-separated Poisson arrival rates, requests per second")
+    load.add_argument("--recorded", action="store_true", help="Open loop: replay at the recording's own pacing")
+    parser.add_argument("--time-scale", default="1", help="Speed-up factors for the arrival timeline (comma-separated)")
+    parser.add_argument("--requests", type=int, help="Requests per level (default: the whole log, repeated as needed)")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests sent before the first level")
+    parser.add_argument("--seed", type=int, help="Random seed for Poisson arrivals")
+    parser.add_argument("--label", default="", help="Tag for this run in the exported curve, e.g. a build or cache setting")
+    parser.add_argument("--export", help="Write the saturation curve to this .csv or .json file")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON reports")
+    parser.add_argument("--verbose", action="store_true", help="Show the handler's own logging")
+    args = parser.parse_args(argv)
+
+    entries = load_log(args.log)
+    if not entries:
+        raise SystemExit(f"No replayable requests in {args.log}")
+    count = args.requests or len(entries)
+    entries = [entries[i % len(entries)] for i in range(count)]
+    quiet = contextlib.nullcontext() if args.verbose or args.url else contextlib.redirect_stdout(_Discard())
+    with quiet:
+        target = HttpTarget(args.url) if args.url else InProcessTarget(_in_process_handler(args.fake, args.config))
+    runner = ReplayRunner(target)
+    with quiet:
+        runner.closed_loop(entries[:args.warmup], 1)
+
+    levels = plan_levels(entries, _levels(args.concurrency), _levels(args.rate), args.recorded,
+                         _levels(args.time_scale) or [1.0], random.Random(args.seed))
+    reports, rows = run_levels(runner, entries, levels, args.label, quiet)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print("\n".join(format_report(f"{report['mode']} {report['level']}", report)))
+    if args.export:
+        export_curve(rows, args.export)
+        print(f"Saturation curve written to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
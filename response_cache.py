@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard ships in requirements.txt
+    zstandard = None
+
+RESPONSE_CACHE_ENABLED = os.environ.get("FLOYD_RESPONSE_CACHE", "1") not in {"0", "false", "no"}
+RESPONSE_CACHE_DB = os.environ.get("FLOYD_RESPONSE_CACHE_DB", "/tmp/floyd_response_cache.sqlite3")
+RESPONSE_CACHE_MEMORY_SIZE = int(os.environ.get("FLOYD_RESPONSE_CACHE_MEMORY_SIZE", "512"))
+
+# First byte of every stored value says how the rest is encoded
+_RAW = b"r"
+_ZSTD = b"z"
+
+
+def prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+class _SqliteStore:
+    """SQLite-backed key/value store shared by every cache namespace in the process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+
+    def put_many(self, items) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items]
+            )
+            self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_stores: Dict[str, _SqliteStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_for(path: str) -> _SqliteStore:
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = _SqliteStore(path)
+        return _stores[path]
+
+
+class ResponseCache:
+    """
+    Two-tier cache for deterministic assistant output.
+
+    Lookups hit an in-process LRU first and fall back to a local SQLite store
+    whose values are zstd-compressed. Keys cover the model, the other
+    generation settings and a hash of the system prompt, so editing a prompt
+    or switching models never serves stale entries.
+    """
+
+    def __init__(self, model: str, system_prompt: str, settings: Optional[Dict[str, Any]] = None,
+                 memory_size: int = RESPONSE_CACHE_MEMORY_SIZE, db_path: Optional[str] = RESPONSE_CACHE_DB):
+        self.model = model
+        self.system_prompt_hash = prompt_hash(system_prompt)
+        settings = settings or {}
+        self._namespace = "|".join(
+            [model, self.system_prompt_hash] + [f"{k}={settings[k]}" for k in sorted(settings)]
+        )
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._store = _store_for(db_path) if db_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self._namespace}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _encode(self, value: str) -> bytes:
+        data = value.encode("utf-8")
+        if zstandard is None:
+            return _RAW + data
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=3)
+        return _ZSTD + compressor.compress(data)
+
+    def _decode(self, blob: bytes) -> str:
+        codec, data = blob[:1], blob[1:]
+        if codec == _ZSTD:
+            decompressor = getattr(self._local, "decompressor", None)
+            if decompressor is None:
+                decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+            data = decompressor.decompress(data)
+        return data.decode("utf-8")
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = self.key(prompt)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        if self._store is not None:
+            blob = self._store.get(key)
+            if blob is not None:
+                value = self._decode(blob)
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, prompt: str, value: str) -> None:
+        key = self.key(prompt)
+        self._remember(key, value)
+        if self._store is not None:
+            self._store.put(key, self._encode(value))
+
+    def seed(self, pairs) -> int:
+        """Bulk-load (prompt, response) pairs, e.g. from an offline batch run."""
+        encoded = []
+        for prompt, value in pairs:
+            key = self.key(prompt)
+            self._remember(key, value)
+            encoded.append((key, self._encode(value)))
+        if self._store is not None and encoded:
+            self._store.put_many(encoded)
+        return len(encoded)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'memory_size': len(self._memory),
+        }
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Optional, Dict, Any
+
+# off: always ask the model; shadow: ask the model but compare with the rules;
+# on: answer locally whenever a rule matches
+REWRITE_RULES_MODE = os.environ.get("FLOYD_REWRITE_RULES", "shadow")
+
+ADDRESSEES = ("ensign blather", "the ambassador", "ambassador", "blather", "floyd")
+SPEECH_VERBS = {"say", "tell", "ask", "whisper", "yell", "shout", "scream", "call", "reply",
+                "answer", "beg", "order", "command", "inform", "warn", "remind", "plead"}
+PHYSICAL_VERBS = {"kiss", "kick", "shove", "hug", "hit", "punch", "slap", "push", "poke", "tickle",
+                  "pat", "pet", "attack", "kill", "touch", "grab", "carry", "lift", "trip", "bite",
+                  "pinch", "squeeze", "shake", "throw", "follow", "examine", "smell", "lick",
+                  "hold", "nudge", "tackle", "wake", "search", "fix", "repair"}
+ACTION_VERBS = {"open", "close", "take", "get", "go", "run", "walk", "pull", "drop", "look",
+                "read", "eat", "drink", "climb", "enter", "exit", "leave", "wait", "sit", "stand",
+                "turn", "press", "put", "insert", "wear", "remove", "inventory", "sleep", "jump",
+                "north", "south", "east", "west", "up", "down", "n", "s", "e", "w", "u", "d",
+                "unlock", "lock", "light", "move", "listen", "save", "restore", "quit", "score"}
+
+_ADDRESSEE = "|".join(re.escape(name) for name in ADDRESSEES)
+_QUOTE = r"(?P<q>[\"'])(?P<msg>.+)(?P=q)"
+_QUOTED_BEFORE_RE = re.compile(
+    rf"^(?:say|tell|whisper|yell|shout|scream)\s+(?:to\s+|at\s+)?(?:{_ADDRESSEE})\s*[,:]?\s*{_QUOTE}[.!]?$",
+    re.IGNORECASE
+)
+_QUOTED_AFTER_RE = re.compile(
+    rf"^(?:say|whisper|yell|shout|scream)\s+{_QUOTE}\s+(?:to|at)\s+(?:{_ADDRESSEE})[.!]?$",
+    re.IGNORECASE
+)
+_DIRECT_ADDRESS_RE = re.compile(rf"^(?:{_ADDRESSEE})\s*,\s*(?P<msg>.+)$", re.IGNORECASE)
+_MENTIONS_ADDRESSEE_RE = re.compile(rf"\b(?:{_ADDRESSEE})\b")
+_INTERNAL_STATE_RE = re.compile(
+    r"^(?:i'm|im|i am|i feel|i'm feeling|i am feeling)\s+(?:so\s+|very\s+|really\s+|a bit\s+)?[a-z]+[.!]*$"
+)
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def _normalize_quotes(text: str) -> str:
+    return (text.replace("“", '"').replace("”", '"')
+            .replace("‘", "'").replace("’", "'"))
+
+
+def _strip_quotes(text: str) -> str:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        text = text[1:-1].strip()
+    return text
+
+
+def _capitalize(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+def apply(prompt: str) -> Optional[str]:
+    """
+    Answer the obvious cases from the RewriteSecondPerson rules without the model.
+
+    Returns "no" for physical actions, unaddressed imperatives and statements
+    of internal state; the quoted message for "Tell Floyd \"...\"" style
+    input; and the message itself for "Floyd, ..." direct address. Returns
+    None for anything ambiguous, which must go to the model.
+    """
+    original = _normalize_quotes(prompt).strip()
+    text = original.lower()
+    if not text:
+        return None
+
+    for pattern in (_QUOTED_BEFORE_RE, _QUOTED_AFTER_RE):
+        match = pattern.match(original)
+        if match:
+            return match.group('msg').strip() or None
+
+    match = _DIRECT_ADDRESS_RE.match(original)
+    if match:
+        message = _strip_quotes(match.group('msg'))
+        return _capitalize(message) if message else None
+
+    words = _WORD_RE.findall(text)
+    if not words or SPEECH_VERBS.intersection(words):
+        return None
+
+    if words[0] in PHYSICAL_VERBS:
+        return "no"
+
+    if _MENTIONS_ADDRESSEE_RE.search(text):
+        return None
+
+    if _INTERNAL_STATE_RE.match(text):
+        return "no"
+
+    if words[0] in ACTION_VERBS:
+        return "no"
+
+    return None
+
+
+def _comparable(text: str) -> str:
+    return " ".join(_WORD_RE.findall(_normalize_quotes(text).lower()))
+
+
+class RuleStats:
+    """Agreement between the local rules and the model, gathered in shadow mode."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.served = 0
+        self.compared = 0
+        self.agreed = 0
+        self.unmatched = 0
+
+    def record_served(self) -> None:
+        with self._lock:
+            self.served += 1
+
+    def record_unmatched(self) -> None:
+        with self._lock:
+            self.unmatched += 1
+
+    def compare(self, prompt: str, local: str, model: str) -> bool:
+        agreed = _comparable(local) == _comparable(model)
+        with self._lock:
+            self.compared += 1
+            self.agreed += agreed
+            compared, disagreed = self.compared, self.compared - self.agreed
+        if not agreed:
+            # Player text never reaches the logs; the hash lets repeats be spotted
+            digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+            print(f"Rewrite rules disagree for prompt {digest} ({disagreed} of {compared} compared)")
+        return agreed
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'served': self.served,
+                'compared': self.compared,
+                'agreed': self.agreed,
+                'agreement': round(self.agreed / self.compared, 3) if self.compared else 0.0,
+                'unmatched': self.unmatched,
+            }
+
+
+rule_stats = RuleStats()
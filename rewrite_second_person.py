@@ -1,8 +1,11 @@
+import contextlib
 import json
 from typing import Optional
 
-from openai import OpenAI
-from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+import metrics
+import rewrite_rules
+import tracing
+from client_registry import get_openai_client, get_async_openai_client
 
 
 SYSTEM_PROMPT = """
@@ -42,15 +45,69 @@ Follow these rules:
 """
 
 
+MODEL = "gpt-4o"
+TEMPERATURE = 0
+
+
 class RewriteSecondPerson:
     """Rewrites prompts into direct second-person communication."""
 
-    def __init__(self, api_key: Optional[str] = None):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: Optional[str] = None, rules_mode: Optional[str] = None):
+        self.api_key = api_key
+        self.rules_mode = rules_mode or rewrite_rules.REWRITE_RULES_MODE
+
+    # Clients come from the registry on first use; a rules-only answer never loads openai
+    @property
+    def client(self):
+        return get_openai_client(self.api_key)
+
+    @property
+    def async_client(self):
+        return get_async_openai_client(self.api_key)
+
+    def _apply_rules(self, prompt: str) -> Optional[str]:
+        """Return the local rules' answer, or None when they are off or do not match."""
+        if self.rules_mode not in ("on", "shadow"):
+            return None
+        local = rewrite_rules.apply(prompt)
+        if local is None:
+            rewrite_rules.rule_stats.record_unmatched()
+        elif self.rules_mode == "on":
+            rewrite_rules.rule_stats.record_served()
+        return local
 
     def rewrite(self, prompt: str) -> str:
-        """Return the rewritten prompt."""
-        messages = [
+        """
+        Return the rewritten prompt.
+
+        Obvious cases are answered by the local rules when `rules_mode` is
+        "on". In "shadow" mode the model is still asked and the rules'
+        answer is only compared against it.
+        """
+        local = self._apply_rules(prompt)
+        if local is not None and self.rules_mode == "on":
+            return local
+
+        result = self._rewrite_with_model(prompt)
+        if local is not None:
+            rewrite_rules.rule_stats.compare(prompt, local, result)
+        return result
+
+    async def rewrite_async(self, prompt: str) -> str:
+        """Async version of `rewrite`."""
+        local = self._apply_rules(prompt)
+        if local is not None and self.rules_mode == "on":
+            return local
+
+        result = await self._rewrite_with_model_async(prompt)
+        if local is not None:
+            rewrite_rules.rule_stats.compare(prompt, local, result)
+        return result
+
+    @staticmethod
+    def _messages(prompt: str):
+        from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionSystemMessageParam
+        return [
             ChatCompletionSystemMessageParam(
                 role="system",
                 content=SYSTEM_PROMPT
@@ -60,16 +117,50 @@ class RewriteSecondPerson:
                 content=prompt
             )
         ]
-        resp = self.client.chat.completions.create(
-            model="gpt-4o",
-            temperature=0,
-            messages=messages,
-        )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _completion():
+        """Time one completion call as a metrics stage and a trace span."""
+        with metrics.stage("Completion"), tracing.span("RewriteSecondPerson.completion", {'gen_ai.request.model': MODEL},
+                                                       tracing.SPAN_KIND_CLIENT) as span:
+            yield span
+
+    @staticmethod
+    def _reply(span, resp) -> str:
+        """Record the completion's token usage and return its text."""
+        tracing.record_usage(span, resp)
+        metrics.count_usage(resp)
         return resp.choices[0].message.content.strip()
 
+    def _rewrite_with_model(self, prompt: str) -> str:
+        with self._completion() as span:
+            resp = self.client.chat.completions.create(
+                model=MODEL,
+                temperature=TEMPERATURE,
+                messages=self._messages(prompt),
+            )
+            return self._reply(span, resp)
+
+    async def _rewrite_with_model_async(self, prompt: str) -> str:
+        with self._completion() as span:
+            resp = await self.async_client.chat.completions.create(
+                model=MODEL,
+                temperature=TEMPERATURE,
+                messages=self._messages(prompt),
+            )
+            return self._reply(span, resp)
+
 
 def lambda_handler(event):
     """AWS Lambda entrypoint for the rewrite API."""
+    with tracing.start_trace('rewrite_second_person.lambda_handler', event):
+        response = _handle(event)
+    tracing.flush()
+    return response
+
+
+def _handle(event):
     try:
         body = event.get('body')
         if body:
@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Iterable
+
+ROUTE_CACHE_SIZE = int(os.environ.get("FLOYD_ROUTE_CACHE_SIZE", "1024"))
+ROUTE_CACHE_TTL = float(os.environ.get("FLOYD_ROUTE_CACHE_TTL", "3600"))
+ADDRESSEE_NAMES = ("floyd",)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s']+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str, names: Iterable[str] = ADDRESSEE_NAMES) -> str:
+    """
+    Fold a prompt to the form used as a routing cache key.
+
+    Case, punctuation and whitespace are folded, and the addressee's name is
+    dropped when it opens or closes the prompt, so "Floyd, go north!" and
+    "go north, floyd" both become "go north".
+    """
+    text = _PUNCTUATION_RE.sub(" ", prompt.lower())
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    for name in names:
+        if text.startswith(name + " "):
+            text = text[len(name) + 1:]
+        if text.endswith(" " + name):
+            text = text[:-len(name) - 1]
+    return text
+
+
+class RoutingCache:
+    """
+    Bounded LRU cache of routing decisions with TTL eviction.
+
+    Entries are tied to a fingerprint of the router's `assistant_map`; when
+    the map changes (a route is added, removed or pointed at a different
+    assistant), the whole cache is dropped on the next access.
+    """
+
+    def __init__(self, max_size: int = ROUTE_CACHE_SIZE, ttl: float = ROUTE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._fingerprint: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def fingerprint(assistant_map: Dict[str, Optional[str]]) -> int:
+        return hash(tuple(sorted(assistant_map.items(), key=lambda item: item[0])))
+
+    def _check_map(self, assistant_map: Dict[str, Optional[str]]) -> None:
+        fingerprint = self.fingerprint(assistant_map)
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, prompt: str, assistant_map: Dict[str, Optional[str]]) -> Optional[str]:
+        """Return the cached route for the prompt, or None."""
+        if not self.enabled:
+            return None
+        key = normalize_prompt(prompt)
+        with self._lock:
+            self._check_map(assistant_map)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            route, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return route
+
+    def put(self, prompt: str, route: str, assistant_map: Dict[str, Optional[str]]) -> None:
+        if not self.enabled:
+            return
+        key = normalize_prompt(prompt)
+        if not key:
+            return
+        with self._lock:
+            self._check_map(assistant_map)
+            self._entries[key] = (route, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+route_cache = RoutingCache()
@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple, Iterator
+
+from client_registry import registry
+
+TERMINAL_RUN_STATUSES = {
+    "completed",
+    "failed",
+    "cancelled",
+    "expired",
+    "requires_action",
+    "incomplete",
+}
+
+POLL_MIN_INTERVAL = float(os.environ.get("RUN_POLL_MIN_INTERVAL", "0.15"))
+POLL_MAX_INTERVAL = float(os.environ.get("RUN_POLL_MAX_INTERVAL", "2.0"))
+POLL_BACKOFF = float(os.environ.get("RUN_POLL_BACKOFF", "1.5"))
+POLL_JITTER = float(os.environ.get("RUN_POLL_JITTER", "0.2"))
+POLL_WORKERS = int(os.environ.get("RUN_POLL_WORKERS", "4"))
+
+
+class _TrackedRun:
+    """Book-keeping for one outstanding run."""
+
+    __slots__ = ("client", "thread_id", "run_id", "assistant_id", "future",
+                 "submitted_at", "interval", "polls")
+
+    def __init__(self, client, thread_id: str, run_id: str, assistant_id: Optional[str]):
+        self.client = client
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.assistant_id = assistant_id
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+        self.interval = 0.0
+        self.polls = 0
+
+
+class RunPoller:
+    """
+    Central poller that multiplexes many in-flight Assistants runs.
+
+    Callers `submit` a run and block on (or attach callbacks to) the returned
+    future, which resolves to `(run, poll_count)` once the run reaches a
+    terminal status. A single scheduler thread keeps every run in a heap
+    ordered by its next check time, and a small worker pool issues the
+    `runs.retrieve` calls, so hundreds of runs need only a handful of threads.
+
+    The schedule is adaptive: the first check is placed just before the
+    observed average run duration for that assistant (or after
+    `min_interval` when nothing is known yet), and later checks back off
+    geometrically up to `max_interval` with random jitter so that runs
+    submitted together do not poll in lockstep.
+    """
+
+    def __init__(self, min_interval: float = POLL_MIN_INTERVAL, max_interval: float = POLL_MAX_INTERVAL,
+                 backoff: float = POLL_BACKOFF, jitter: float = POLL_JITTER, workers: int = POLL_WORKERS,
+                 ewma_alpha: float = 0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.ewma_alpha = ewma_alpha
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="run-poller")
+        self._thread: Optional[threading.Thread] = None
+        self._durations: Dict[str, float] = {}
+        self._in_flight = 0
+        self.total_polls = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def expected_duration(self, assistant_id: Optional[str]) -> Optional[float]:
+        """Smoothed run duration observed for this assistant, if any."""
+        return self._durations.get(assistant_id) if assistant_id else None
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _first_delay(self, assistant_id: Optional[str]) -> float:
+        expected = self.expected_duration(assistant_id)
+        if expected is None:
+            return self.min_interval
+        return max(self.min_interval, expected * 0.8)
+
+    def _next_delay(self, tracked: _TrackedRun) -> float:
+        tracked.interval = min(self.max_interval, max(self.min_interval, tracked.interval * self.backoff))
+        return self._jittered(tracked.interval)
+
+    def delays(self, assistant_id: Optional[str] = None) -> Iterator[float]:
+        """
+        Yield the poll schedule for one run: first check, then jittered backoff.
+
+        Async callers use this to drive their own `asyncio.sleep` loop with
+        the same adaptive timing as the shared poller.
+        """
+        tracked = _TrackedRun(None, "", "", assistant_id)
+        yield self._first_delay(assistant_id)
+        while True:
+            yield self._next_delay(tracked)
+
+    def record_duration(self, assistant_id: Optional[str], elapsed: float) -> None:
+        """Fold an observed run duration into the assistant's smoothed estimate."""
+        if not assistant_id:
+            return
+        previous = self._durations.get(assistant_id)
+        if previous is None:
+            self._durations[assistant_id] = elapsed
+        else:
+            self._durations[assistant_id] = (
+                self.ewma_alpha * elapsed + (1 - self.ewma_alpha) * previous
+            )
+
+    def _record_duration(self, tracked: _TrackedRun) -> None:
+        self.record_duration(tracked.assistant_id, time.monotonic() - tracked.submitted_at)
+
+    def submit(self, client, thread_id: str, run_id: str, assistant_id: Optional[str] = None) -> Future:
+        """Start tracking a run. The future resolves to (run, poll_count)."""
+        tracked = _TrackedRun(client, thread_id, run_id, assistant_id)
+        with self._cond:
+            self._in_flight += 1
+        self._schedule(tracked, self._first_delay(assistant_id))
+        self._ensure_thread()
+        return tracked.future
+
+    def wait(self, client, thread_id: str, run_id: str, assistant_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> Tuple[Any, int]:
+        """Block until the run is terminal. Returns (run, poll_count)."""
+        return self.submit(client, thread_id, run_id, assistant_id).result(timeout)
+
+    def _schedule(self, tracked: _TrackedRun, delay: float) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), tracked))
+            self._cond.notify()
+
+    def _ensure_thread(self) -> None:
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="run-poller-scheduler", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, tracked = self._heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            self._executor.submit(self._check, tracked)
+
+    def _finish(self, tracked: _TrackedRun) -> None:
+        with self._cond:
+            self._in_flight -= 1
+
+    def _check(self, tracked: _TrackedRun) -> None:
+        if tracked.future.cancelled():
+            self._finish(tracked)
+            return
+        try:
+            run = tracked.client.beta.threads.runs.retrieve(
+                thread_id=tracked.thread_id,
+                run_id=tracked.run_id
+            )
+        except Exception as e:
+            self._finish(tracked)
+            tracked.future.set_exception(e)
+            return
+
+        tracked.polls += 1
+        self.total_polls += 1
+        if run.status in TERMINAL_RUN_STATUSES:
+            self._record_duration(tracked)
+            self._finish(tracked)
+            tracked.future.set_result((run, tracked.polls))
+        else:
+            self._schedule(tracked, self._next_delay(tracked))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': self._in_flight,
+            'total_polls': self.total_polls,
+            'expected_durations': dict(self._durations),
+        }
+
+
+def get_run_poller() -> RunPoller:
+    """Return the process-wide run poller."""
+    return registry.get_or_create('RunPoller', RunPoller)
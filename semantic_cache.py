@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+import numpy as np
+
+from intent_classifier import featurize
+
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("FLOYD_SEMANTIC_CACHE_CAPACITY", "4096"))
+SEMANTIC_CACHE_DIM = int(os.environ.get("FLOYD_SEMANTIC_CACHE_DIM", "1024"))
+SEMANTIC_CACHE_DIR = os.environ.get("FLOYD_SEMANTIC_CACHE_DIR")
+SEMANTIC_SAVE_EVERY = int(os.environ.get("FLOYD_SEMANTIC_SAVE_EVERY", "50"))
+
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """Parse "route=0.92,RewriteSecondPerson=0.98" into a threshold per cache name."""
+    thresholds = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            thresholds[name.strip()] = float(value)
+    return thresholds
+
+
+# A cache name without a threshold is disabled, and every cache is opt-in. The default
+# hashing embedding is lexical: "head north" scores 0.50 against "go north", below
+# the 0.59 of "drop the key" against "take the key", so no threshold would catch
+# route paraphrases without also misrouting. Plug in a real embedding before enabling.
+SEMANTIC_THRESHOLDS = parse_thresholds(os.environ.get("FLOYD_SEMANTIC_THRESHOLDS", ""))
+
+
+def hashing_embedding(dim: int = SEMANTIC_CACHE_DIM) -> Callable[[str], np.ndarray]:
+    """Offline default embedding: the intent classifier's hashed n-grams as a dense unit vector."""
+    def embed(text: str) -> np.ndarray:
+        indices, values = featurize(text, dim)
+        vector = np.zeros(dim, dtype=np.float32)
+        vector[indices] = values
+        return vector
+    return embed
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache for near-duplicate prompts.
+
+    Prompt vectors live in one contiguous (capacity x dim) float32 matrix, so a
+    lookup is a single matrix-vector product followed by an argmax. Vectors
+    are unit length, which makes that product the cosine similarity. When the
+    matrix is full the least recently used row is overwritten.
+
+    `save` writes the matrix as a plain .npy file next to a JSON list of
+    values; `load` memory-maps it copy-on-write, so a cold start touches only
+    the pages a lookup actually reads and never parses the vectors. The full
+    matrix is allocated on the first `put` that needs room beyond the mapped
+    rows. Once `put` has collected FLOYD_SEMANTIC_SAVE_EVERY new entries,
+    it saves them from a background thread.
+    """
+
+    def __init__(self, threshold: float, capacity: int = SEMANTIC_CACHE_CAPACITY,
+                 dim: int = SEMANTIC_CACHE_DIM, embed: Optional[Callable[[str], np.ndarray]] = None,
+                 path: Optional[str] = None):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.dim = dim
+        self.embed = embed or hashing_embedding(dim)
+        self.path = path
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._values: List[Optional[str]] = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self._unsaved = 0
+        self._saving = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path and os.path.exists(path + ".npy"):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def nearest(self, text: str) -> Tuple[Optional[str], float]:
+        """Return (value, similarity) of the closest stored prompt, regardless of threshold."""
+        query = self._vector(text)
+        with self._lock:
+            if self._size == 0:
+                return None, 0.0
+            similarities = self._vectors[:self._size] @ query
+            best = int(similarities.argmax())
+            return self._values[best], float(similarities[best])
+
+    def get(self, text: str) -> Optional[str]:
+        query = self._vector(text)
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ query
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    self._last_used[best] = self._tick()
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, value: str) -> None:
+        vector = self._vector(text)
+        if not vector.any():
+            return
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(self._last_used.argmin())
+                self.evictions += 1
+            if slot >= len(self._vectors):
+                # Empty or loaded short of capacity: move to a matrix with room for every row
+                vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+                vectors[:slot] = self._vectors[:slot]
+                self._vectors = vectors
+            self._vectors[slot] = vector
+            self._values[slot] = value
+            self._last_used[slot] = self._tick()
+            self._unsaved += 1
+            should_save = bool(self.path) and self._unsaved >= SEMANTIC_SAVE_EVERY and not self._saving
+            if should_save:
+                self._saving = True
+        if should_save:
+            threading.Thread(target=self._save_in_background, name="semantic-cache-save", daemon=True).start()
+
+    def _save_in_background(self) -> None:
+        try:
+            self.save(self.path)
+        except OSError as e:
+            print(f"Could not save semantic cache {self.path}: {e}")
+        finally:
+            with self._lock:
+                self._saving = False
+
+    def save(self, path: str) -> None:
+        """Write a snapshot of the cache; lookups only wait for the in-memory copy, not the disk."""
+        with self._lock:
+            vectors = np.array(self._vectors[:self._size])
+            values = self._values[:self._size]
+            self._unsaved = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Replace rather than overwrite: another cache may have the old file mapped
+        suffix = f".{threading.get_ident()}.tmp"
+        with open(path + ".npy" + suffix, "wb") as f:
+            np.save(f, vectors)
+        with open(path + ".json" + suffix, "w", encoding="utf-8") as f:
+            json.dump(values, f)
+        os.replace(path + ".npy" + suffix, path + ".npy")
+        os.replace(path + ".json" + suffix, path + ".json")
+
+    def load(self, path: str) -> None:
+        vectors = np.load(path + ".npy", mmap_mode="c")
+        with open(path + ".json", encoding="utf-8") as f:
+            values = json.load(f)
+        count = min(len(values), vectors.shape[0], self.capacity)
+        if vectors.shape[1] != self.dim:
+            print(f"Ignoring semantic cache {path}: dimension {vectors.shape[1]} != {self.dim}")
+            return
+        with self._lock:
+            # Serve straight from the mapping; pages load on first touch
+            self._vectors = vectors[:count]
+            self._values[:count] = values[:count]
+            self._size = count
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': self._size,
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+_caches: Dict[str, SemanticCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_semantic_cache(name: str, version: str = "") -> Optional[SemanticCache]:
+    """
+    Return the process-wide semantic cache for `name`, or None if it has no threshold.
+
+    `version` (e.g. a system prompt hash) is folded into the persisted file
+    name so entries written under different assistant settings are never mixed.
+    """
+    threshold = SEMANTIC_THRESHOLDS.get(name)
+    if threshold is None:
+        return None
+    key = f"{name}-{version}" if version else name
+    with _caches_lock:
+        if key not in _caches:
+            path = os.path.join(SEMANTIC_CACHE_DIR, key) if SEMANTIC_CACHE_DIR else None
+            _caches[key] = SemanticCache(threshold, path=path)
+        return _caches[key]
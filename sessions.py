@@ -0,0 +1,285 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from client_registry import registry, get_openai_client
+
+# Token budget for the context sent with each session turn (summary + recent turns)
+SESSION_TOKEN_BUDGET = int(os.environ.get("FLOYD_SESSION_TOKEN_BUDGET", "1500"))
+# Share of the budget the compacted summary may use
+SESSION_SUMMARY_SHARE = float(os.environ.get("FLOYD_SESSION_SUMMARY_SHARE", "0.25"))
+# Where session files are kept; on Lambda /tmp belongs to one execution environment, not the function
+SESSION_DIR = os.environ.get("FLOYD_SESSION_DIR", "/tmp/floyd_sessions")
+SESSION_SUMMARY_MODEL = os.environ.get("FLOYD_SESSION_SUMMARY_MODEL", "gpt-4o-mini")
+TOKEN_ENCODING = os.environ.get("FLOYD_TOKEN_ENCODING", "cl100k_base")
+# Sessions kept in memory per process; the least recently used are dropped beyond this
+SESSION_CACHE_SIZE = int(os.environ.get("FLOYD_SESSION_CACHE_SIZE", "1000"))
+# Seconds a session may sit idle in memory before it is dropped (0 disables)
+SESSION_TTL = float(os.environ.get("FLOYD_SESSION_TTL", "1800"))
+
+SUMMARY_PROMPT = """
+You compact the memory of a character in a text adventure game.
+Merge the existing summary and the new conversation turns into one short summary, written in the third person,
+that keeps names, promises, facts the player revealed, items exchanged and the character's attitude to the player.
+Drop small talk. Return only the summary.
+"""
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken.
+
+    If the encoding cannot be loaded (tiktoken missing, or its BPE file not
+    bundled on an offline host) this falls back to roughly four characters
+    per token, which is close enough for budgeting.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception as e:
+                    print(f"tiktoken unavailable, estimating token counts: {e}")
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def message_tokens(message: Dict[str, str], count: Callable[[str], int] = count_tokens) -> int:
+    # Every chat message carries a few tokens of role/separator overhead
+    return count(message['content']) + 4
+
+
+def model_summarizer(model: str = SESSION_SUMMARY_MODEL) -> Callable[[str, List[Dict[str, str]], int], str]:
+    """Summarize with a chat completion on the shared OpenAI client."""
+    def summarize(summary: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+        response = get_openai_client().chat.completions.create(
+            model=model,
+            messages=[
+                {'role': 'system', 'content': SUMMARY_PROMPT},
+                {'role': 'user', 'content': f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"},
+            ],
+            max_tokens=max_tokens,
+            temperature=0,
+        )
+        return (response.choices[0].message.content or "").strip()
+    return summarize
+
+
+class Session:
+    """Conversation memory for one character in one game session."""
+
+    def __init__(self, key: str, summary: str = "", turns: Optional[List[Dict[str, str]]] = None):
+        self.key = key
+        self.summary = summary
+        self.turns: List[Dict[str, str]] = turns or []
+        self.lock = threading.Lock()
+        self.compacting = False
+        self.last_used = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'key': self.key, 'summary': self.summary, 'turns': self.turns}
+
+
+class SessionStore:
+    """
+    Persists sessions as one JSON file each; None keeps them in memory only.
+
+    The files live on local disk, so they are per-instance memory only: on
+    Lambda each execution environment has its own /tmp, a player whose next
+    turn lands on another instance starts a fresh session there, and
+    everything is gone when the instance is recycled. For sessions shared
+    across instances, pass SessionManager a store with the same `load` and
+    `save` methods backed by a shared service such as DynamoDB or Redis.
+    """
+
+    def __init__(self, directory: Optional[str] = SESSION_DIR):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".json")
+
+    def load(self, key: str) -> Session:
+        if self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    data = json.load(f)
+                return Session(key, data.get('summary', ""), data.get('turns', []))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Could not load session {key}: {e}")
+        return Session(key)
+
+    def save(self, session: Session) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(session.key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f)
+        os.replace(tmp_path, path)
+
+
+class SessionManager:
+    """
+    Bounded conversation memory keyed by game session.
+
+    Each turn is sent with the session summary plus as many of the most
+    recent turns as fit the token budget, so the context (and with it
+    latency and cost) stops growing once a session is long enough. Turns
+    that no longer fit are folded into the summary on a background thread;
+    until that finishes they are simply left out of the window, so a turn
+    never waits for compaction.
+
+    At most `max_sessions` sessions stay in memory, and none longer than
+    `ttl` seconds after its last turn; an evicted session is loaded again
+    from the store when its player comes back, provided the store still has
+    it. The default file store only does so when the player returns to the
+    same instance (see SessionStore). Sessions with a compaction in flight
+    are never evicted, so the summary it produces is not lost.
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, token_budget: int = SESSION_TOKEN_BUDGET,
+                 summarize: Optional[Callable[[str, List[Dict[str, str]], int], str]] = None,
+                 count: Callable[[str], int] = count_tokens,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 max_sessions: int = SESSION_CACHE_SIZE, ttl: float = SESSION_TTL):
+        self.store = store or SessionStore()
+        self.token_budget = token_budget
+        self.summary_budget = int(token_budget * SESSION_SUMMARY_SHARE)
+        self.summarize = summarize or model_summarizer()
+        self.count = count
+        self._executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="session-compact")
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.compaction_failures = 0
+        self.evictions = 0
+
+    def session(self, key: str) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self.store.load(key)
+            else:
+                self._sessions.move_to_end(key)
+            session.last_used = now
+            self._evict(now)
+            return session
+
+    def _evict(self, now: float) -> None:
+        """Drop idle and least recently used sessions; call with `_lock` held."""
+        for key in list(self._sessions):
+            session = self._sessions[key]
+            expired = self.ttl > 0 and now - session.last_used > self.ttl
+            if not expired and len(self._sessions) <= self.max_sessions:
+                # Everything after this one was used more recently
+                break
+            if session.compacting:
+                continue
+            del self._sessions[key]
+            self.evictions += 1
+
+    def _window_start(self, session: Session) -> int:
+        """Index of the oldest turn that still fits the budget next to the summary."""
+        remaining = self.token_budget
+        if session.summary:
+            remaining -= message_tokens({'content': session.summary}, self.count)
+        start = len(session.turns)
+        while start > 0:
+            cost = message_tokens(session.turns[start - 1], self.count)
+            if cost > remaining:
+                break
+            remaining -= cost
+            start -= 1
+        # Never open the window on an assistant reply without its prompt
+        if start < len(session.turns) and session.turns[start]['role'] == 'assistant':
+            start += 1
+        return start
+
+    def context(self, key: str) -> List[Dict[str, str]]:
+        """Messages to send ahead of the next prompt: summary first, then recent turns."""
+        session = self.session(key)
+        with session.lock:
+            messages = []
+            if session.summary:
+                messages.append({'role': 'user', 'content': f"(Earlier in this game: {session.summary})"})
+                messages.append({'role': 'assistant', 'content': "Understood."})
+            messages.extend(dict(turn) for turn in session.turns[self._window_start(session):])
+            return messages
+
+    def record(self, key: str, prompt: str, reply: str) -> None:
+        """Append a finished turn and compact older turns in the background if needed."""
+        session = self.session(key)
+        with session.lock:
+            session.turns.append({'role': 'user', 'content': prompt})
+            session.turns.append({'role': 'assistant', 'content': reply})
+            start = self._window_start(session)
+            schedule = start > 0 and not session.compacting
+            if schedule:
+                session.compacting = True
+        self._save(session)
+        if schedule:
+            self._executor.submit(self._compact, session, start)
+
+    def _compact(self, session: Session, count: int) -> None:
+        with session.lock:
+            summary = session.summary
+            old_turns = list(session.turns[:count])
+        try:
+            new_summary = self.summarize(summary, old_turns, self.summary_budget)
+        except Exception as e:
+            print(f"Could not compact session {session.key}: {e}")
+            with session.lock:
+                session.compacting = False
+            with self._lock:
+                self.compaction_failures += 1
+            return
+        with session.lock:
+            session.summary = new_summary
+            # Turns recorded while summarizing were appended after these
+            del session.turns[:count]
+            session.compacting = False
+        with self._lock:
+            self.compactions += 1
+        self._save(session)
+
+    def _save(self, session: Session) -> None:
+        with session.lock:
+            snapshot = Session(session.key, session.summary, list(session.turns))
+        try:
+            self.store.save(snapshot)
+        except OSError as e:
+            print(f"Could not save session {session.key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'compactions': self.compactions,
+                'compaction_failures': self.compaction_failures,
+                'evictions': self.evictions,
+                'token_budget': self.token_budget,
+            }
+
+
+def get_session_manager() -> SessionManager:
+    """Return the process-wide session manager."""
+    return registry.get_or_create('SessionManager', SessionManager)
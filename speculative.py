@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+from client_registry import registry
+
+# Number of route assistants started alongside the router; 0 disables speculation
+SPECULATIVE_RUNS = int(os.environ.get("FLOYD_SPECULATIVE_RUNS", "0"))
+
+
+class SpeculationStats:
+    """Hit rate and wasted spend of speculative route runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.hits = 0
+        self.misses = 0
+        self.runs_started = 0
+        self.runs_wasted = 0
+        self.wasted_round_trips = 0
+        self.wasted_tokens = 0
+        self.route_counts: Dict[str, int] = {}
+
+    def record_route(self, route: str) -> None:
+        with self._lock:
+            self.route_counts[route] = self.route_counts.get(route, 0) + 1
+
+    def record_turn(self, started: int, hit: bool) -> None:
+        with self._lock:
+            self.turns += 1
+            self.runs_started += started
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def record_waste(self, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self.runs_wasted += 1
+            self.wasted_round_trips += response.get('round_trips') or 0
+            self.wasted_tokens += response.get('total_tokens') or 0
+
+    def most_common_routes(self, n: int) -> List[str]:
+        with self._lock:
+            ranked = sorted(self.route_counts.items(), key=lambda item: item[1], reverse=True)
+        return [route for route, _ in ranked[:n]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'turns': self.turns,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / self.turns, 3) if self.turns else 0.0,
+                'runs_started': self.runs_started,
+                'runs_wasted': self.runs_wasted,
+                'wasted_round_trips': self.wasted_round_trips,
+                'wasted_tokens': self.wasted_tokens,
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class SpeculativeRouter:
+    """
+    Starts the likely route assistants while the authoritative router is still running.
+
+    Prompts the router can answer locally (route cache, semantic cache or a
+    confident classifier) start no speculative runs. Otherwise candidate
+    routes come from the local intent classifier's top predictions, or from
+    the most frequently chosen routes when no model is deployed. When the
+    router answers, the matching speculative run is kept and the others are
+    cancelled; if none matched, the chosen route runs as usual.
+    """
+
+    def __init__(self, max_speculative: int = SPECULATIVE_RUNS, stats: SpeculationStats = speculation_stats):
+        self.max_speculative = max_speculative
+        self.stats = stats
+        self._executor = registry.get_or_create(
+            'SpeculativeExecutor',
+            lambda: ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative")
+        )
+
+    def predict_routes(self, router, prompt: str) -> List[str]:
+        """
+        Return up to `max_speculative` candidate routes that have an assistant configured.
+
+        Call only once `router.decide_locally` has come back empty.
+        """
+        if self.max_speculative <= 0:
+            return []
+        from intent_classifier import get_intent_classifier
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            proba = classifier.predict_proba(prompt)
+            ranked = [classifier.labels[i] for i in proba.argsort()[::-1]]
+        else:
+            ranked = self.stats.most_common_routes(len(router.assistant_map))
+        candidates = [route for route in ranked if router.assistant_map.get(route)]
+        return candidates[:self.max_speculative]
+
+    def _discard(self, future: Future) -> None:
+        def on_done(done: Future) -> None:
+            if done.exception() is None:
+                self.stats.record_waste(done.result())
+        future.add_done_callback(on_done)
+
+    def execute(self, router, prompt: str, client_for: Callable[[str], Any],
+                history: Optional[List[Dict[str, str]]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Route the prompt and run the chosen assistant, overlapping the two where possible.
+
+        Args:
+            router: The Floyd router
+            prompt: The player's prompt
+            client_for: Returns the OpenAIAssistantClient for an assistant ID
+            history: Optional session context passed to the route assistant
+
+        Returns:
+            (decision, response) as returned by `Floyd.decide` and `run_once`
+        """
+        run_kwargs = {'history': history} if history else {}
+        local = router.decide_locally(prompt)
+        if local is not None:
+            # Answered without the router run, so there is nothing to overlap with
+            self.stats.record_route(local['route'])
+            response = client_for(router.resolve(local['route'])).run_once(prompt, stream=True, **run_kwargs)
+            return dict(local, speculative_hit=False, speculative_runs=0), response
+
+        candidates = self.predict_routes(router, prompt)
+        speculative: Dict[str, Tuple[Future, threading.Event]] = {}
+        for route in candidates:
+            cancel_event = threading.Event()
+            client = client_for(router.assistant_map[route])
+            # Carry the request's metrics and current span into the worker; one copy per run,
+            # since a context can only be entered by one thread at a time
+            future = self._executor.submit(contextvars.copy_context().run, client.run_once, prompt, stream=True,
+                                           cancel_event=cancel_event, **run_kwargs)
+            speculative[route] = (future, cancel_event)
+
+        try:
+            decision = router.decide(prompt, local=False)
+        except Exception:
+            for future, cancel_event in speculative.values():
+                cancel_event.set()
+                self._discard(future)
+            raise
+
+        route = decision['route']
+        for candidate, (future, cancel_event) in speculative.items():
+            if candidate != route:
+                cancel_event.set()
+                self._discard(future)
+
+        hit = route in speculative
+        self.stats.record_route(route)
+        if candidates:
+            self.stats.record_turn(len(candidates), hit)
+
+        if hit:
+            response = speculative[route][0].result()
+        else:
+            response = client_for(router.resolve(route)).run_once(prompt, stream=True, **run_kwargs)
+        decision = dict(decision, speculative_hit=hit, speculative_runs=len(candidates))
+        return decision, response
+
+    def _discard_task(self, task: asyncio.Task) -> None:
+        task.cancel()
+
+        def on_done(done: asyncio.Task) -> None:
+            if done.cancelled():
+                self.stats.record_waste({})
+            elif done.exception() is None:
+                self.stats.record_waste(done.result())
+        task.add_done_callback(on_done)
+
+    async def execute_async(self, router, prompt: str, client_for: Callable[[str], Any],
+                            history: Optional[List[Dict[str, str]]] = None
+                            ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Async version of `execute` for AsyncFloyd and AsyncOpenAIAssistantClient.
+
+        Speculative runs are tasks on the running loop; losing candidates are
+        cancelled with `Task.cancel`, which also cancels their Assistants run.
+        """
+        run_kwargs = {'history': history} if history else {}
+        local = router.decide_locally(prompt)
+        if local is not None:
+            self.stats.record_route(local['route'])
+            client = client_for(router.resolve(local['route']))
+            response = await client.run_once(prompt, stream=True, **run_kwargs)
+            return dict(local, speculative_hit=False, speculative_runs=0), response
+
+        candidates = self.predict_routes(router, prompt)
+        speculative: Dict[str, asyncio.Task] = {}
+        for route in candidates:
+            client = client_for(router.assistant_map[route])
+            speculative[route] = asyncio.ensure_future(client.run_once(prompt, stream=True, **run_kwargs))
+
+        try:
+            decision = await router.decide(prompt, local=False)
+        except BaseException:
+            for task in speculative.values():
+                self._discard_task(task)
+            raise
+
+        route = decision['route']
+        for candidate, task in speculative.items():
+            if candidate != route:
+                self._discard_task(task)
+
+        hit = route in speculative
+        self.stats.record_route(route)
+        if candidates:
+            self.stats.record_turn(len(candidates), hit)
+
+        if hit:
+            response = await speculative[route]
+        else:
+            response = await client_for(router.resolve(route)).run_once(prompt, stream=True, **run_kwargs)
+        decision = dict(decision, speculative_hit=hit, speculative_runs=len(candidates))
+        return decision, response
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from typing import Optional, Dict, Any, Iterator, Iterable, List
+
+# Server-sent events are sent with these headers, by the Lambda handler and the HTTP server alike
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+
+def iter_chat_deltas(stream) -> Iterator[str]:
+    """
+    Yield the text deltas of a streamed chat completion.
+
+    Closing the generator early (the client went away) closes the HTTP
+    stream too, which stops the model generating tokens nobody will read.
+    """
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+    finally:
+        stream.close()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def wants_stream(event: Dict[str, Any], data: Optional[Dict[str, Any]] = None) -> bool:
+    """True if the request asked for a streamed reply via `"stream": true` or an SSE Accept header."""
+    if isinstance(data, dict) and data.get('stream') is True:
+        return True
+    headers = event.get('headers') or {}
+    accept = next((v for k, v in headers.items() if k.lower() == 'accept'), '') or ''
+    return 'text/event-stream' in accept
+
+
+class StreamStats:
+    """Time to first token and total stream time for streamed replies."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.window = window
+        self.streams = 0
+        self._ttft_ms: List[float] = []
+        self._total_ms: List[float] = []
+
+    def record(self, ttft_ms: Optional[float], total_ms: float) -> None:
+        with self._lock:
+            self.streams += 1
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+                del self._ttft_ms[:-self.window]
+            self._total_ms.append(total_ms)
+            del self._total_ms[:-self.window]
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return round(ordered[min(int(pct * len(ordered)), len(ordered) - 1)], 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'streams': self.streams,
+                'ttft_p50_ms': self._percentile(self._ttft_ms, 0.5),
+                'ttft_p95_ms': self._percentile(self._ttft_ms, 0.95),
+                'total_p50_ms': self._percentile(self._total_ms, 0.5),
+            }
+
+
+stream_stats = StreamStats()
+
+
+class TimedStream:
+    """
+    Wraps a token iterator and measures time to first token.
+
+    `started` defaults to construction time; pass the request start to
+    include routing and setup in the measurement.
+    """
+
+    def __init__(self, tokens: Iterable[str], started: Optional[float] = None,
+                 stats: Optional[StreamStats] = stream_stats):
+        self._tokens = tokens
+        self.started = started if started is not None else time.perf_counter()
+        self.stats = stats
+        self.ttft_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+        self.parts: List[str] = []
+
+    def __iter__(self) -> Iterator[str]:
+        for token in self._tokens:
+            if self.ttft_ms is None:
+                self.ttft_ms = round((time.perf_counter() - self.started) * 1000, 1)
+            self.parts.append(token)
+            yield token
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        if self.stats is not None:
+            self.stats.record(self.ttft_ms, self.total_ms)
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
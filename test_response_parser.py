@@ -4,26 +4,7 @@ Test ResponseParser thoroughly without requiring OpenAI API calls.
 import json
 import sys
 
-
-# Simple standalone implementation for testing
-def parse_response(content: str):
-    """Parse assistant response. Returns (message, parameters)."""
-    try:
-        # Try to parse as JSON
-        data = json.loads(content.strip())
-
-        # Must be a dict with 'message' field
-        if isinstance(data, dict) and 'message' in data:
-            message = data.pop('message')
-            parameters = data if data else None
-            return message, parameters
-
-        # Not the expected format, return as-is
-        return content, None
-
-    except (json.JSONDecodeError, AttributeError):
-        # Not JSON or invalid format, return content as-is
-        return content, None
+from main import ResponseParser, AssistantResponse
 
 
 def test_gosomewhere_json():
@@ -65,7 +46,7 @@ def test_gosomewhere_json():
     for test in test_cases:
         print(f"\n{test['name']}")
         print(f"  Input: {test['input'][:80]}...")
-        message, params = parse_response(test['input'])
+        message, params = ResponseParser.parse(test['input'])
         print(f"  Message: {message}")
         print(f"  Parameters: {params}")
 
@@ -115,7 +96,7 @@ def test_backward_compatibility():
     for test in test_cases:
         print(f"\n{test['name']}")
         print(f"  Input: {test['input']}")
-        message, params = parse_response(test['input'])
+        message, params = ResponseParser.parse(test['input'])
         print(f"  Message: {message}")
         print(f"  Parameters: {params}")
 
@@ -189,7 +170,7 @@ def test_edge_cases():
     for test in test_cases:
         print(f"\n{test['name']}")
         print(f"  Input: {test['input'][:80]}")
-        message, params = parse_response(test['input'])
+        message, params = ResponseParser.parse(test['input'])
         print(f"  Message: {message}")
         print(f"  Parameters: {params}")
 
@@ -212,16 +193,6 @@ def test_full_response_format():
     print("TEST 4: Full Lambda Response Format")
     print("=" * 60)
 
-    # Simulate what AssistantResponse.to_lambda_response() does
-    def create_lambda_response(content, metadata=None):
-        results = {'single_message': content}
-        if metadata:
-            results['metadata'] = metadata
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'results': results})
-        }
-
     # Test with metadata
     print("\n1. Response with metadata:")
     message = "Floyd says he isn't sure how to get there."
@@ -229,7 +200,7 @@ def test_full_response_format():
         'assistant_type': 'GoSomewhere',
         'parameters': {'direction': 'north'}
     }
-    response = create_lambda_response(message, metadata)
+    response = AssistantResponse(message, metadata).to_lambda_response()
     print(json.dumps(response, indent=2))
 
     # Verify structure
@@ -242,7 +213,7 @@ def test_full_response_format():
     # Test without metadata (backward compatible)
     print("\n2. Response without metadata (backward compatible):")
     message2 = "Floyd waves happily!"
-    response2 = create_lambda_response(message2, None)
+    response2 = AssistantResponse(message2, None).to_lambda_response()
     print(json.dumps(response2, indent=2))
 
     # Verify structure
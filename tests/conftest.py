@@ -0,0 +1,31 @@
+import sys
+from types import ModuleType
+from unittest.mock import MagicMock
+
+# Modules that read the environment or hold clients at import time, besides characters.*
+APP_MODULES = ('main', 'rewrite_second_person', 'openAIAssistantClient', 'client_registry', 'run_poller',
+               'sessions', 'intent_classifier', 'routing_cache', 'speculative', 'response_cache',
+               'semantic_cache', 'streaming')
+
+
+def install_fake_openai(monkeypatch, client=None, async_client=None) -> ModuleType:
+    """Replace the openai package with a stub whose OpenAI and AsyncOpenAI return the given mocks."""
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock(return_value=MagicMock() if client is None else client)
+    openai_module.AsyncOpenAI = MagicMock(return_value=MagicMock() if async_client is None else async_client)
+    types_module = ModuleType('openai.types')
+    chat_module = ModuleType('openai.types.chat')
+    chat_module.ChatCompletionSystemMessageParam = dict
+    chat_module.ChatCompletionUserMessageParam = dict
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    monkeypatch.setitem(sys.modules, 'openai.types', types_module)
+    monkeypatch.setitem(sys.modules, 'openai.types.chat', chat_module)
+    return openai_module
+
+
+def purge_modules(*extra: str) -> None:
+    """Forget the app modules (and `extra`) so the next import re-reads the environment."""
+    names = set(APP_MODULES) | set(extra)
+    for name in list(sys.modules):
+        if name in names or name.startswith('characters'):
+            del sys.modules[name]
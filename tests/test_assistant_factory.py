@@ -0,0 +1,43 @@
+import importlib
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_main(monkeypatch, tmp_path, **env):
+    """Import main with mocked openai modules and an isolated response cache."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE_DB', str(tmp_path / 'cache.sqlite3'))
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    return importlib.import_module('main'), client
+
+
+def test_rewrite_assistant_opts_into_response_cache(monkeypatch, tmp_path):
+    main, _ = load_main(monkeypatch, tmp_path)
+    assistant = main.AssistantFactory.create('RewriteSecondPerson')
+    assert isinstance(assistant, main.CachedAssistant)
+    assert not isinstance(main.AssistantFactory.create('blather'), main.CachedAssistant)
+
+
+def test_cached_assistant_skips_repeat_calls(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    choice = MagicMock()
+    choice.message.content = 'no'
+    client.chat.completions.create.return_value = MagicMock(choices=[choice])
+
+    for _ in range(3):
+        assert main.AssistantFactory.create('RewriteSecondPerson').process('kiss floyd') == 'no'
+    client.chat.completions.create.assert_called_once()
+
+
+def test_response_cache_can_be_disabled(monkeypatch, tmp_path):
+    main, _ = load_main(monkeypatch, tmp_path, FLOYD_RESPONSE_CACHE='0')
+    assert isinstance(main.AssistantFactory.create('RewriteSecondPerson'), main.RewriteAssistant)
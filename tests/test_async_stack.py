@@ -0,0 +1,176 @@
+import asyncio
+import importlib
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with mocked sync and async openai clients."""
+    client = MagicMock()
+    async_client = MagicMock()
+    install_fake_openai(monkeypatch, client, async_client=async_client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE_DB', str(tmp_path / 'cache.sqlite3'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    return importlib.import_module('main'), async_client
+
+
+class FakeAsyncStream:
+    def __init__(self, events, hang=False, error=None):
+        self.events = events
+        self.hang = hang
+        self.error = error
+        self.closed = False
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+        if self.error is not None:
+            raise self.error
+        if self.hang:
+            await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+def run_event(name, status, run_id='run1', thread_id='t1'):
+    return SimpleNamespace(event=name, data=SimpleNamespace(id=run_id, thread_id=thread_id, status=status,
+                                                            usage=None))
+
+
+def delta_event(text):
+    block = SimpleNamespace(text=SimpleNamespace(value=text))
+    return SimpleNamespace(
+        event='thread.message.delta',
+        data=SimpleNamespace(delta=SimpleNamespace(content=[block]))
+    )
+
+
+def test_async_run_once_streams_in_one_round_trip(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+    stream = FakeAsyncStream([
+        run_event('thread.run.created', 'queued'),
+        delta_event('Floyd '),
+        delta_event('waves'),
+        run_event('thread.run.completed', 'completed'),
+    ])
+    async_client.beta.threads.create_and_run = AsyncMock(return_value=stream)
+
+    client = main.AsyncOpenAIAssistantClient('aid')
+    result = main.registry.run(client.run_once('wave', stream=True))
+
+    assert result['content'] == 'Floyd waves'
+    assert result['round_trips'] == 1
+    assert result['run_id'] == 'run1'
+    assert stream.closed
+
+
+def test_async_run_once_stream_broken_mid_reply_polls_the_same_run(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+    stream = FakeAsyncStream([
+        run_event('thread.run.created', 'queued'),
+        delta_event('Floyd '),
+    ], error=ConnectionError('connection reset'))
+    async_client.beta.threads.create_and_run = AsyncMock(return_value=stream)
+    async_client.beta.threads.runs.retrieve = AsyncMock(
+        return_value=SimpleNamespace(id='run1', thread_id='t1', status='completed', usage=None)
+    )
+    message = SimpleNamespace(role='assistant', content=[SimpleNamespace(text=SimpleNamespace(value='Floyd waves'))])
+    async_client.beta.threads.messages.list = AsyncMock(return_value=SimpleNamespace(data=[message]))
+    tokens = []
+
+    client = main.AsyncOpenAIAssistantClient('aid')
+    result = main.registry.run(client.run_once('wave', stream=True, on_token=tokens.append))
+
+    assert tokens == ['Floyd ']
+    assert result['content'] == 'Floyd waves'
+    assert result['round_trips'] == 3
+    async_client.beta.threads.create_and_run.assert_awaited_once()
+    async_client.beta.threads.runs.retrieve.assert_awaited_once_with(thread_id='t1', run_id='run1')
+
+
+def test_cancelling_task_cancels_run(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+    stream = FakeAsyncStream([run_event('thread.run.created', 'queued')], hang=True)
+    async_client.beta.threads.create_and_run = AsyncMock(return_value=stream)
+    async_client.beta.threads.runs.cancel = AsyncMock()
+    client = main.AsyncOpenAIAssistantClient('aid')
+
+    async def scenario():
+        task = asyncio.ensure_future(client.run_once('wave', stream=True))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert main.registry.run(scenario())
+    async_client.beta.threads.runs.cancel.assert_awaited_once_with(thread_id='t1', run_id='run1')
+
+
+def test_async_lambda_handler_uses_async_client(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+    choice = MagicMock()
+    choice.message.content = 'Blather says: floor polish!'
+    async_client.chat.completions.create = AsyncMock(return_value=MagicMock(choices=[choice]))
+
+    response = main.async_lambda_handler({'assistant': 'blather', 'prompt': 'hello'}, None)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['results']['single_message'] == 'Blather says: floor polish!'
+    async_client.chat.completions.create.assert_awaited_once()
+
+
+def test_async_speculation_cancels_losing_route(monkeypatch, tmp_path):
+    main, _ = load_main(monkeypatch, tmp_path)
+    speculative = sys.modules['speculative']
+    stats = speculative.SpeculationStats()
+    stats.record_route('GoSomewhere')
+    stats.record_route('PickUp')
+    cancelled = []
+
+    class FakeClient:
+        def __init__(self, content):
+            self.content = content
+
+        async def run_once(self, prompt, stream=False):
+            try:
+                await asyncio.sleep(0.01 if self.content == 'went north' else 10)
+            except asyncio.CancelledError:
+                cancelled.append(self.content)
+                raise
+            return {'content': self.content, 'round_trips': 1}
+
+    clients = {'GoSomewhere': FakeClient('went north'), 'PickUp': FakeClient('picked up')}
+
+    async def decide(prompt, local=True):
+        await asyncio.sleep(0.001)
+        return {'route': 'GoSomewhere', 'round_trips': 1, 'source': 'router'}
+
+    router = SimpleNamespace(assistant_map={name: f'{name}-id' for name in clients},
+                             resolve=lambda r: f'{r}-id', decide=decide, decide_locally=lambda prompt: None)
+
+    async def scenario():
+        result = await speculative.SpeculativeRouter(2, stats).execute_async(
+            router, 'go north', lambda assistant_id: clients[assistant_id[:-3]]
+        )
+        await asyncio.sleep(0)
+        return result
+
+    decision, response = main.registry.run(scenario())
+
+    assert response['content'] == 'went north'
+    assert decision['speculative_hit'] is True
+    assert cancelled == ['picked up']
+    assert stats.to_dict()['runs_wasted'] == 1
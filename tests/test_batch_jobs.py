@@ -0,0 +1,111 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import MagicMock
+
+
+def load_batch_jobs(monkeypatch, tmp_path):
+    """Import batch_jobs with mocked openai modules."""
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock()
+    openai_module.AsyncOpenAI = MagicMock()
+    types_module = ModuleType('openai.types')
+    chat_module = ModuleType('openai.types.chat')
+    chat_module.ChatCompletionSystemMessageParam = dict
+    chat_module.ChatCompletionUserMessageParam = dict
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    monkeypatch.setitem(sys.modules, 'openai.types', types_module)
+    monkeypatch.setitem(sys.modules, 'openai.types.chat', chat_module)
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE_DB', str(tmp_path / 'cache.sqlite3'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in list(sys.modules):
+        if name in ('batch_jobs', 'response_cache', 'rewrite_second_person', 'rewrite_rules', 'client_registry') \
+                or name.startswith('characters'):
+            del sys.modules[name]
+    return importlib.import_module('batch_jobs')
+
+
+def write_requests(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return str(path)
+
+
+def echo(body):
+    prompt = body['messages'][-1]['content']
+    if prompt == 'explode':
+        raise RuntimeError('server error')
+    return f"{body['model']}: {prompt} "
+
+
+def test_lines_use_character_settings_and_split_by_model(monkeypatch, tmp_path):
+    mod = load_batch_jobs(monkeypatch, tmp_path)
+    requests = [
+        {'custom_id': 'a', 'assistant': 'RewriteSecondPerson', 'prompt': 'tell floyd hi'},
+        {'custom_id': 'b', 'assistant': 'blather', 'prompt': 'hello'},
+        {'custom_id': 'c', 'assistant': 'floyd', 'prompt': 'go north'},
+    ]
+
+    groups, rejected = mod.build_batch_lines(requests)
+
+    assert set(groups) == {'gpt-4o', 'gpt-4'}
+    rewrite_line = groups['gpt-4o'][0]
+    assert rewrite_line['url'] == '/v1/chat/completions'
+    assert rewrite_line['body']['temperature'] == 0
+    assert 'max_tokens' not in rewrite_line['body']
+    assert groups['gpt-4'][0]['body']['max_tokens'] == 1000
+    assert 'c' in rejected
+
+
+def test_run_merges_results_in_input_order(monkeypatch, tmp_path):
+    mod = load_batch_jobs(monkeypatch, tmp_path)
+    requests = mod.load_requests(write_requests(tmp_path / 'in.jsonl', [
+        {'assistant': 'blather', 'prompt': 'one'},
+        {'assistant': 'RewriteSecondPerson', 'prompt': 'two'},
+        {'assistant': 'ambassador', 'prompt': 'explode'},
+        {'assistant': 'floyd', 'prompt': 'four'},
+    ]))
+    backend = mod.LocalBatchBackend(echo, polls_until_done=2)
+
+    merged = mod.BatchRunner(backend, poll_interval=0, max_requests=1).run(requests)
+
+    assert [item['custom_id'] for item in merged] == ['line-1', 'line-2', 'line-3', 'line-4']
+    assert merged[0]['content'] == 'gpt-4: one '
+    assert merged[1]['content'] == 'gpt-4o: two '
+    assert 'server error' in merged[2]['error']
+    assert 'not supported' in merged[3]['error']
+
+
+def test_seed_cache_serves_rewrite_results(monkeypatch, tmp_path):
+    mod = load_batch_jobs(monkeypatch, tmp_path)
+    merged = [
+        {'assistant': 'RewriteSecondPerson', 'prompt': 'tell floyd hi', 'content': 'Hi '},
+        {'assistant': 'blather', 'prompt': 'hello', 'content': 'Blather says hi'},
+    ]
+    db_path = str(tmp_path / 'seed.sqlite3')
+
+    assert mod.seed_response_caches(merged, db_path) == {'RewriteSecondPerson': 1}
+
+    import rewrite_second_person
+    cache = sys.modules['response_cache'].ResponseCache(
+        rewrite_second_person.MODEL, rewrite_second_person.SYSTEM_PROMPT,
+        {'temperature': rewrite_second_person.TEMPERATURE}, memory_size=0, db_path=db_path
+    )
+    assert cache.get('tell floyd hi') == 'Hi'
+
+
+def test_cli_run_writes_merged_output(monkeypatch, tmp_path):
+    mod = load_batch_jobs(monkeypatch, tmp_path)
+    backend = mod.LocalBatchBackend(echo)
+    monkeypatch.setattr(mod, 'LocalBatchBackend', lambda respond: backend)
+    client_registry = importlib.import_module('client_registry')
+    monkeypatch.setattr(client_registry, 'get_openai_client', lambda: MagicMock())
+    input_path = write_requests(tmp_path / 'in.jsonl', [{'assistant': 'blather', 'prompt': 'one'}])
+    output_path = tmp_path / 'out.jsonl'
+
+    mod.main(['--poll-interval', '0', 'run', input_path, '-o', str(output_path), '--local'])
+
+    lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert lines == [{'assistant': 'blather', 'prompt': 'one', 'custom_id': 'line-1', 'content': 'gpt-4: one '}]
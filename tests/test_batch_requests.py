@@ -0,0 +1,101 @@
+import asyncio
+import importlib
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_main(monkeypatch, tmp_path, **env):
+    """Import main with a mocked async openai client."""
+    async_client = MagicMock()
+    install_fake_openai(monkeypatch, async_client=async_client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    return importlib.import_module('main'), async_client
+
+
+def completion(text):
+    choice = MagicMock()
+    choice.message.content = text
+    return MagicMock(choices=[choice])
+
+
+def test_batch_results_keep_request_order(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+
+    async def create(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        # Later prompts finish first
+        await asyncio.sleep(0.01 / len(prompt))
+        return completion(f'echo {prompt}')
+
+    async_client.chat.completions.create = AsyncMock(side_effect=create)
+    event = {'body': json.dumps({'requests': [
+        {'assistant': 'blather', 'prompt': 'a'},
+        {'assistant': 'ambassador', 'prompt': 'bbbb'},
+        {'assistant': 'blather', 'prompt': 'cccccccc'},
+    ]})}
+
+    response = main.lambda_handler(event, None)
+
+    assert response['statusCode'] == 200
+    results = json.loads(response['body'])['results']
+    assert [r['results']['single_message'] for r in results] == ['echo a', 'echo bbbb', 'echo cccccccc']
+    assert all(r['statusCode'] == 200 for r in results)
+
+
+def test_failing_item_does_not_fail_batch(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path)
+    async_client.chat.completions.create = AsyncMock(return_value=completion('fine'))
+    event = {'requests': [
+        {'assistant': 'blather', 'prompt': 'hello'},
+        {'assistant': 'blather'},
+        {'assistant': 'nobody', 'prompt': 'hi'},
+        'not an object',
+    ]}
+
+    results = json.loads(main.lambda_handler(event, None)['body'])['results']
+
+    assert results[0] == {'statusCode': 200, 'results': {'single_message': 'fine'}}
+    assert results[1] == {'statusCode': 400, 'error': 'Prompt is required'}
+    assert results[2]['statusCode'] == 400
+    assert results[3]['statusCode'] == 400
+
+
+def test_batch_concurrency_is_bounded(monkeypatch, tmp_path):
+    main, async_client = load_main(monkeypatch, tmp_path, FLOYD_BATCH_CONCURRENCY='2')
+    in_flight = []
+    peak = []
+
+    async def create(**kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.005)
+        in_flight.pop()
+        return completion('ok')
+
+    async_client.chat.completions.create = AsyncMock(side_effect=create)
+    event = {'requests': [{'assistant': 'blather', 'prompt': str(i)} for i in range(6)]}
+
+    results = json.loads(main.lambda_handler(event, None)['body'])['results']
+
+    assert len(results) == 6
+    assert max(peak) == 2
+
+
+def test_batch_size_is_limited(monkeypatch, tmp_path):
+    main, _ = load_main(monkeypatch, tmp_path, FLOYD_BATCH_MAX_ITEMS='2')
+    event = {'requests': [{'assistant': 'blather', 'prompt': 'x'}] * 3}
+
+    response = main.lambda_handler(event, None)
+
+    assert response['statusCode'] == 400
+    assert 'at most 2' in json.loads(response['body'])['error']
@@ -0,0 +1,116 @@
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_capture(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('capture', 'metrics'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('capture')
+
+
+def load_main(monkeypatch, tmp_path, sample_rate='1'):
+    """Import main with a mocked openai client, capturing into tmp_path."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('OPENAI_RUN_MODE', 'poll')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    monkeypatch.setenv('FLOYD_METRICS', '0')
+    monkeypatch.setenv('FLOYD_CAPTURE_SAMPLE_RATE', sample_rate)
+    monkeypatch.setenv('FLOYD_CAPTURE_FILE', str(tmp_path / 'requests.jsonl'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('metrics', 'capture')
+    return importlib.import_module('main'), client
+
+
+def floyd_turn(main, client, prompt):
+    router = MagicMock()
+    router.decide.return_value = {'route': 'GoSomewhere', 'round_trips': 1, 'source': 'router'}
+    router.resolve.return_value = 'gid'
+    main.registry.get_or_create(('Floyd', 'rid'), lambda: router)
+    run = MagicMock(id='run_1', thread_id='thread_1', status='completed')
+    run.usage.total_tokens = 42
+    client.beta.threads.create_and_run.return_value = run
+    client.beta.threads.runs.retrieve.return_value = run
+    message = MagicMock(role='assistant')
+    message.content[0].text.value = '{"message": "Floyd goes north.", "direction": "north"}'
+    client.beta.threads.messages.list.return_value = MagicMock(data=[message])
+    event = {'body': json.dumps({'assistant': 'floyd', 'prompt': prompt, 'session_id': 'player-1'})}
+    return main.lambda_handler(event, None)
+
+
+def test_redacts_personal_data(monkeypatch):
+    capture = load_capture(monkeypatch)
+
+    assert capture.redact('Tell jo.smith+floyd@example.co.uk I said hi') == 'Tell [EMAIL] I said hi'
+    assert capture.redact('Call +1 (555) 123-4567 from 10.0.0.12') == 'Call [PHONE] from [IP]'
+    assert capture.redact('Card 4111 1111 1111 1111, SSN 123-45-6789') == 'Card [CARD], SSN [SSN]'
+    assert capture.redact('Floyd owes Blather 3.5 demerits from 2024') == 'Floyd owes Blather 3.5 demerits from 2024'
+
+
+def test_buffer_writes_in_batches_and_drops_when_full(monkeypatch, tmp_path):
+    capture = load_capture(monkeypatch)
+    path = tmp_path / 'requests.jsonl'
+    buffer = capture.CaptureBuffer(str(path), batch_size=2, flush_interval=60, max_buffered=3)
+
+    buffer.add({'n': 1})
+    assert not path.exists()
+    buffer.add({'n': 2})
+    deadline = time.monotonic() + 5
+    while buffer.to_dict()['written'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [json.loads(line)['n'] for line in path.read_text().splitlines()] == [1, 2]
+
+    full = capture.CaptureBuffer(str(path), batch_size=10, flush_interval=60, max_buffered=1)
+    assert full.add({'n': 3})
+    assert not full.add({'n': 4})
+    full.close()
+    assert full.to_dict() == {'captured': 1, 'dropped': 1, 'written': 1, 'batches': 1, 'buffered': 0,
+                              'write_errors': 0}
+    buffer.close()
+
+
+def test_lambda_handler_captures_a_redacted_record(monkeypatch, tmp_path, capsys):
+    main, client = load_main(monkeypatch, tmp_path)
+
+    response = floyd_turn(main, client, 'Go north and email me at ann@example.com')
+    main.capture.get_buffer().close()
+
+    assert response['statusCode'] == 200
+    [record] = [json.loads(line) for line in (tmp_path / 'requests.jsonl').read_text().splitlines()]
+    assert record['assistant'] == 'floyd'
+    assert record['prompt'] == 'Go north and email me at [EMAIL]'
+    assert record['route'] == 'GoSomewhere'
+    assert record['route_source'] == 'router'
+    assert record['parameters'] == {'direction': 'north'}
+    assert record['status_code'] == 200
+    assert record['tokens'] == 42
+    assert record['api_round_trips'] >= 3
+    assert len(record['session_id']) == 16 and record['session_id'] != 'player-1'
+    assert {'Parse', 'Route', 'RunCreate', 'Total'} <= set(record['timings_ms'])
+    output = capsys.readouterr().out
+    # Metrics are off, and the prompt is no longer logged
+    assert '"_aws"' not in output
+    assert 'ann@example.com' not in output
+
+
+def test_capture_is_off_by_default(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path, sample_rate='0')
+
+    floyd_turn(main, client, 'Go north')
+
+    assert main.capture.capture_stats() is None
+    assert main.metrics.current() is None
+    assert not (tmp_path / 'requests.jsonl').exists()
@@ -0,0 +1,72 @@
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import MagicMock
+
+
+def load_registry(monkeypatch):
+    """Import client_registry with a mocked openai dependency."""
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock(side_effect=lambda **kwargs: MagicMock())
+    openai_module.AsyncOpenAI = MagicMock(side_effect=lambda **kwargs: MagicMock())
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'client_registry' in sys.modules:
+        del sys.modules['client_registry']
+    mod = importlib.import_module('client_registry')
+    return mod, openai_module.OpenAI
+
+
+def test_openai_client_is_shared_per_api_key(monkeypatch):
+    mod, openai_cls = load_registry(monkeypatch)
+    first = mod.get_openai_client()
+    assert mod.get_openai_client() is first
+    assert mod.get_openai_client('other') is not first
+    assert openai_cls.call_count == 2
+    http_client = mod.registry.http_client()
+    for call in openai_cls.call_args_list:
+        assert call.kwargs['http_client'] is http_client
+
+
+def test_get_or_create_builds_once(monkeypatch):
+    mod, _ = load_registry(monkeypatch)
+    factory = MagicMock(return_value=object())
+    first = mod.registry.get_or_create(('Floyd', 'rid'), factory)
+    second = mod.registry.get_or_create(('Floyd', 'rid'), factory)
+    assert first is second
+    factory.assert_called_once_with()
+
+
+def test_connection_stats_count_reuse(monkeypatch):
+    mod, _ = load_registry(monkeypatch)
+    stats = mod.ConnectionStats()
+    for _ in range(3):
+        stats.record_request()
+    stats.trace('connection.connect_tcp.started', {})
+    stats.trace('connection.connect_tcp.complete', {})
+    assert stats.to_dict() == {
+        'requests': 3,
+        'new_connections': 1,
+        'reused_connections': 2,
+        'reuse_ratio': 0.667,
+    }
+
+
+def test_reset_closes_the_async_client_and_loop(monkeypatch):
+    mod, _ = load_registry(monkeypatch)
+    registry = mod.ClientRegistry()
+    http_client = registry.async_http_client()
+    loop = registry.event_loop()
+
+    async def answer():
+        return 42
+
+    assert registry.run(answer()) == 42
+    registry.reset()
+
+    assert http_client.is_closed
+    assert loop.is_closed()
+    assert registry.event_loop() is not loop
+    registry.reset()
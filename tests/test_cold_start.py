@@ -0,0 +1,63 @@
+import importlib
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_cold_start(monkeypatch, **env):
+    """Import cold_start with the given environment."""
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.syspath_prepend(str(REPO_ROOT))
+    if 'cold_start' in sys.modules:
+        del sys.modules['cold_start']
+    return importlib.import_module('cold_start')
+
+
+def test_profiler_records_nested_imports(monkeypatch, tmp_path):
+    mod = load_cold_start(monkeypatch)
+    (tmp_path / 'cold_outer.py').write_text('import time\nimport cold_inner\ntime.sleep(0.01)\n')
+    (tmp_path / 'cold_inner.py').write_text('import time\ntime.sleep(0.02)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ('cold_outer', 'cold_inner'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    profiler = mod.ImportProfiler().install()
+    try:
+        exec('import cold_outer', {})
+    finally:
+        profiler.uninstall()
+
+    report = profiler.report(top=0)
+    records = {r['module']: r for r in report['modules']}
+    assert records['cold_inner']['depth'] == 1
+    assert records['cold_inner']['cumulative_ms'] >= 20
+    assert records['cold_outer']['cumulative_ms'] >= records['cold_inner']['cumulative_ms'] + 10
+    assert records['cold_outer']['self_ms'] < records['cold_outer']['cumulative_ms']
+    assert report['import_ms'] == records['cold_outer']['cumulative_ms']
+
+
+def test_report_once_logs_a_single_report(monkeypatch):
+    mod = load_cold_start(monkeypatch, FLOYD_COLD_START_REPORT='1')
+    profiler = mod.start_from_env()
+    try:
+        assert profiler is not None
+        assert mod.report_once() is not None
+        assert mod.report_once() is None
+    finally:
+        profiler.uninstall()
+
+
+def test_main_defers_character_and_openai_imports():
+    code = (
+        "import sys\n"
+        "import main\n"
+        "heavy = ['openai', 'numpy', 'characters.blather', 'characters.floyd', 'rewrite_second_person',"
+        " 'response_cache', 'semantic_cache']\n"
+        "print('loaded:' + ','.join(name for name in heavy if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=str(REPO_ROOT),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == 'loaded:'
@@ -0,0 +1,214 @@
+import importlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from conftest import purge_modules
+
+FAST = {'latency_ms': 1, 'run_ms': 5, 'chunk_interval_ms': 0}
+
+
+def load_fake_openai(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'fake_openai' in sys.modules:
+        del sys.modules['fake_openai']
+    return importlib.import_module('fake_openai')
+
+
+def load_benchmark(monkeypatch, tmp_path):
+    """Import benchmark with main configured for the fake server and no caches."""
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('benchmark', 'fake_openai')
+    benchmark = importlib.import_module('benchmark')
+    # Everything configure_environment sets, so the test leaves the environment as it found it
+    for route in benchmark.ROUTES:
+        monkeypatch.setenv(f"OPENAI_{route.upper()}_ASSISTANT_ID", benchmark.assistant_id(route))
+    monkeypatch.setenv('OPENAI_BASE_URL', 'http://unused')
+    monkeypatch.setenv('OPENAI_API_KEY', 'fake-key')
+    monkeypatch.setenv('OPENAI_RUN_MODE', 'stream')
+    monkeypatch.setenv('FLOYD_METRICS', '0')
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    monkeypatch.setenv('FLOYD_ROUTE_CACHE_SIZE', '0')
+    monkeypatch.setenv('FLOYD_SEMANTIC_THRESHOLDS', '')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    return benchmark
+
+
+def fast_config(benchmark):
+    config = json.loads(json.dumps(benchmark.BENCHMARK_CONFIG))
+    for behaviour in [config['default'], *config['assistants'].values(), *config['models'].values()]:
+        behaviour.update(FAST)
+    return config
+
+
+@pytest.fixture
+def fake_main(monkeypatch, tmp_path, capsys):
+    """main, with the real openai SDK pointed at a fake server (benchmark's config, sped up)."""
+    benchmark = load_benchmark(monkeypatch, tmp_path)
+    server, url = benchmark.fake_openai.start(0, fast_config(benchmark))
+    benchmark.configure_environment(url)
+    import main
+    capsys.readouterr()
+    yield main, server
+    main.registry.reset()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    servers = []
+
+    def start(config):
+        fake_openai = load_fake_openai(monkeypatch)
+        server, url = fake_openai.start(0, config)
+        servers.append(server)
+        from openai import OpenAI
+        return server, OpenAI(base_url=url, api_key='fake-key', max_retries=0)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_polled_run_posts_the_configured_reply(fake_server):
+    server, client = fake_server({
+        'default': FAST,
+        'assistants': {'asst_router': {'replies': [{'match': 'north', 'reply': 'GoSomewhere'}], 'reply': 'Nonsense'}},
+    })
+
+    run = client.beta.threads.create_and_run(
+        assistant_id='asst_router', thread={'messages': [{'role': 'user', 'content': 'Go north'}]}
+    )
+    while run.status not in ('completed', 'failed'):
+        time.sleep(0.005)
+        run = client.beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+    messages = client.beta.threads.messages.list(thread_id=run.thread_id, run_id=run.id)
+
+    assert run.status == 'completed'
+    assert run.usage.total_tokens > 0
+    assert [m.content[0].text.value for m in messages.data] == ['GoSomewhere']
+    assert server.state.stats()['requests_by_endpoint']['POST /v1/threads/runs'] == 1
+
+
+def test_streams_runs_and_chat_completions(fake_server):
+    server, client = fake_server({'default': {**FAST, 'chunk_chars': 4, 'reply': 'Floyd hops about.'}})
+
+    events = list(client.beta.threads.create_and_run(
+        assistant_id='asst_x', thread={'messages': [{'role': 'user', 'content': 'hi'}]}, stream=True
+    ))
+    deltas = [e.data.delta.content[0].text.value for e in events if e.event == 'thread.message.delta']
+    chunks = client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': 'hi'}], stream=True)
+
+    assert ''.join(deltas) == 'Floyd hops about.'
+    assert len(deltas) == 5
+    assert events[-1].event == 'thread.run.completed'
+    assert ''.join(c.choices[0].delta.content or '' for c in chunks if c.choices) == 'Floyd hops about.'
+
+
+def test_scripted_failures(fake_server):
+    from openai import InternalServerError
+
+    server, client = fake_server({
+        'default': FAST,
+        'failures': [
+            {'path': 'chat/completions', 'status': 500, 'times': 1},
+            {'assistant_id': 'asst_flaky', 'run_status': 'failed'},
+        ],
+    })
+
+    with pytest.raises(InternalServerError):
+        client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': 'hi'}])
+    reply = client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': 'hi'}])
+    events = list(client.beta.threads.create_and_run(
+        assistant_id='asst_flaky', thread={'messages': [{'role': 'user', 'content': 'hi'}]}, stream=True
+    ))
+
+    assert reply.choices[0].message.content == 'Floyd shrugs.'
+    assert events[-1].event == 'thread.run.failed'
+    assert server.state.stats()['failures_injected'] == 2
+
+
+def test_benchmark_reports_each_assistant_type(monkeypatch, tmp_path):
+    benchmark = load_benchmark(monkeypatch, tmp_path)
+    workload = tmp_path / 'events.json'
+    workload.write_text(json.dumps([
+        {'assistant': 'floyd', 'prompt': 'Go north'},
+        {'assistant': 'floyd', 'prompt': 'Pick up the sword'},
+        {'assistant': 'blather', 'prompt': 'Hello'},
+    ]))
+    config = fast_config(benchmark)
+
+    report = benchmark.run_benchmark([str(workload)], turns=4, concurrency=2, warmup=0, config=config)
+
+    assert set(report) == {'floyd', 'blather'}
+    assert report['floyd']['errors'] == 0
+    # One streamed router run and one streamed routed run per turn
+    assert report['floyd']['round_trips_per_turn'] == 2.0
+    assert report['blather']['round_trips_per_turn'] == 1.0
+    assert 0 < report['blather']['p50_ms'] <= report['blather']['p99_ms']
+    lines = benchmark.format_report(report)
+    assert lines[1].split()[0] == 'floyd'
+
+
+def test_async_lambda_handler_over_http(fake_main):
+    main, server = fake_main
+    event = {'assistant': 'floyd', 'prompt': 'Go north'}
+
+    response = main.async_lambda_handler(dict(event), None)
+
+    assert response['statusCode'] == 200, response['body']
+    results = json.loads(response['body'])['results']
+    assert results['metadata']['assistant_type'] == 'GoSomewhere'
+    assert results['metadata']['parameters'] == {'direction': 'north'}
+    stats = main.registry.connection_stats()
+    # The async transport's trace hook counted the connection it opened
+    assert stats['requests'] == server.state.stats()['requests']
+    assert stats['new_connections'] >= 1
+
+
+def test_batch_over_http(fake_main):
+    main, server = fake_main
+    event = {'body': json.dumps({'requests': [
+        {'assistant': 'floyd', 'prompt': 'Pick up the sword'},
+        {'assistant': 'blather', 'prompt': 'Hello'},
+        {'assistant': 'nobody', 'prompt': 'Hello'},
+    ]})}
+
+    response = main.lambda_handler(event, None)
+
+    assert response['statusCode'] == 200
+    floyd, blather, unknown = json.loads(response['body'])['results']
+    assert floyd['statusCode'] == 200, floyd
+    assert floyd['results']['metadata']['assistant_type'] == 'PickUp'
+    assert blather['statusCode'] == 200, blather
+    assert blather['results']['single_message'].startswith('Blather bellows')
+    assert unknown['statusCode'] == 400
+    assert server.state.stats()['requests_by_endpoint']['POST /v1/chat/completions'] == 1
+
+
+def test_concurrent_batches_share_the_event_loop(fake_main):
+    main, server = fake_main
+    events = [{'body': json.dumps({'requests': [
+        {'assistant': 'floyd', 'prompt': prompt},
+        {'assistant': 'blather', 'prompt': 'Hello'},
+    ]})} for prompt in ('Pick up the sword', 'Go north')]
+
+    # Both request threads hand their batch to the one registry loop at the same time
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        responses = list(pool.map(lambda event: main.lambda_handler(event, None), events))
+
+    routes = []
+    for response in responses:
+        assert response['statusCode'] == 200, response
+        floyd, blather = json.loads(response['body'])['results']
+        assert blather['statusCode'] == 200, blather
+        routes.append(floyd['results']['metadata']['assistant_type'])
+    assert routes == ['PickUp', 'GoSomewhere']
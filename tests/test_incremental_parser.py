@@ -0,0 +1,132 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_parser(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'incremental_parser' in sys.modules:
+        del sys.modules['incremental_parser']
+    return importlib.import_module('incremental_parser')
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with mocked openai modules."""
+    install_fake_openai(monkeypatch)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('incremental_parser')
+    return importlib.import_module('main')
+
+
+def feed_in_chunks(parser, content, size):
+    return [parser.feed(content[i:i + size]) for i in range(0, len(content), size)]
+
+
+REPLIES = [
+    '{"message": "Floyd heads north.", "direction": "north"}',
+    '  {"object": "sword", "message": "Floyd picks up the \\"sword\\".\\n"}',
+    '{"message": "Caf\\u00e9 \\ud83d\\ude00", "extra": {"nested": ["}", 1]}, "count": 2, "ok": true}',
+    '{"direction": "west"}',
+    '[1, 2]',
+    'Floyd says hello! {not json}',
+    '',
+]
+
+
+@pytest.mark.parametrize('content', REPLIES)
+@pytest.mark.parametrize('size', [1, 3, 7, 1000])
+def test_matches_response_parser_for_any_chunking(monkeypatch, tmp_path, content, size):
+    main = load_main(monkeypatch, tmp_path)
+    parser = main.IncrementalResponseParser()
+
+    streamed = "".join(feed_in_chunks(parser, content, size))
+
+    message, parameters = parser.close()
+    assert (message, parameters) == main.ResponseParser.parse(content)
+    assert message.startswith(streamed)
+
+
+def test_message_streams_before_reply_completes(monkeypatch):
+    mod = load_parser(monkeypatch)
+    parser = mod.IncrementalResponseParser()
+
+    assert parser.feed('{"direction": "no') == ''
+    assert parser.feed('rth", "message": "Floyd ') == 'Floyd '
+    assert parser.parameters == {'direction': 'north'}
+    assert parser.feed('goes\\') == 'goes'
+    assert parser.feed('n north') == '\n north'
+    assert parser.feed('."}') == '.'
+    assert parser.close() == ('Floyd goes\n north.', {'direction': 'north'})
+
+
+def test_parameters_are_captured_as_they_complete(monkeypatch):
+    mod = load_parser(monkeypatch)
+    parser = mod.IncrementalResponseParser()
+
+    parser.feed('{"message": "ok", "object": "lamp"')
+    assert parser.parameters == {}
+    parser.feed(', "count": 3')
+    assert parser.parameters == {'object': 'lamp'}
+    parser.feed('}')
+    assert parser.parameters == {'object': 'lamp', 'count': 3}
+
+
+def test_surrogate_pairs_are_not_split(monkeypatch):
+    mod = load_parser(monkeypatch)
+    parser = mod.IncrementalResponseParser()
+
+    assert parser.feed('{"message": "hi \\ud83d') == 'hi '
+    assert parser.feed('\\ude00"}') == '\U0001F600'
+
+
+def test_truncated_reply_keeps_streamed_message(monkeypatch):
+    mod = load_parser(monkeypatch)
+    parser = mod.IncrementalResponseParser()
+
+    parser.feed('{"direction": "up", "message": "Floyd climbs the lad')
+
+    assert parser.close() == ('Floyd climbs the lad', {'direction': 'up'})
+
+
+def test_plain_text_passes_through(monkeypatch):
+    mod = load_parser(monkeypatch)
+    parser = mod.IncrementalResponseParser()
+
+    assert parser.feed('  ') == ''
+    assert parser.feed('Hi {there}') == '  Hi {there}'
+    assert parser.feed('!') == '!'
+    assert parser.close() == ('  Hi {there}!', None)
+
+
+def test_floyd_streams_only_the_message(monkeypatch, tmp_path):
+    main = load_main(monkeypatch, tmp_path)
+    router = MagicMock()
+    router.decide.return_value = {'route': 'GoSomewhere', 'round_trips': 0, 'source': 'classifier'}
+    router.resolve.return_value = 'gid'
+    main.registry.get_or_create(('Floyd', 'rid'), lambda: router)
+    client = MagicMock(run_mode='stream')
+    reply = '{"message": "Floyd wanders north.", "direction": "north"}'
+    client.stream_once.return_value = iter(reply[i:i + 4] for i in range(0, len(reply), 4))
+    monkeypatch.setattr(main.FloydAssistant, '_client_for', staticmethod(lambda assistant_id: client))
+
+    response = main.lambda_handler({'assistant': 'floyd', 'prompt': 'go north', 'stream': True}, None)
+
+    events = [block.split('\n') for block in response['body'].strip().split('\n\n')]
+    tokens = [json.loads(data[len('data: '):])['text'] for name, data in events if name == 'event: token']
+    assert ''.join(tokens) == 'Floyd wanders north.'
+    assert all('{' not in token for token in tokens)
+    done = json.loads(events[-1][1][len('data: '):])
+    assert done['results']['single_message'] == 'Floyd wanders north.'
+    assert done['results']['metadata']['parameters'] == {'direction': 'north'}
+    assert done['results']['metadata']['api_round_trips'] == 1
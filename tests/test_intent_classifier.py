@@ -0,0 +1,116 @@
+import importlib
+import json
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import install_fake_openai, purge_modules
+
+TRAINING = [
+    ("go north", "GoSomewhere"),
+    ("floyd, go south", "GoSomewhere"),
+    ("head east down the corridor", "GoSomewhere"),
+    ("walk west", "GoSomewhere"),
+    ("floyd go to the engine room", "GoSomewhere"),
+    ("pick up the key", "PickUp"),
+    ("floyd, pick up the sword", "PickUp"),
+    ("grab the lamp", "PickUp"),
+    ("take the card", "PickUp"),
+    ("floyd get the magnet", "PickUp"),
+    ("what is your name?", "AskQuestion"),
+    ("floyd, where are we?", "AskQuestion"),
+    ("how old are you", "AskQuestion"),
+    ("what do you think of blather?", "AskQuestion"),
+    ("why is the ship empty?", "AskQuestion"),
+]
+
+
+def load_modules(monkeypatch, tmp_path):
+    """Import intent_classifier and floyd with a mocked openai dependency."""
+    install_fake_openai(monkeypatch)
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('OPENAI_GOSOMEWHERE_ASSISTANT_ID', 'go-id')
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    classifier_mod = importlib.import_module('intent_classifier')
+    floyd_mod = importlib.import_module('characters.floyd')
+    return classifier_mod, floyd_mod
+
+
+def trained(classifier_mod, threshold=0.5):
+    texts, labels = zip(*TRAINING)
+    return classifier_mod.IntentClassifier.train(list(texts), list(labels), n_features=2 ** 12,
+                                                 threshold=threshold)
+
+
+def test_featurize_is_stable_and_normalised(monkeypatch, tmp_path):
+    mod, _ = load_modules(monkeypatch, tmp_path)
+    indices, values = mod.featurize('Go North!', 1024)
+    again, _ = mod.featurize('go north', 1024)
+    assert sorted(indices.tolist()) == sorted(again.tolist())
+    assert abs(float((values ** 2).sum()) - 1.0) < 1e-5
+
+
+def test_train_predict_and_round_trip(monkeypatch, tmp_path):
+    mod, _ = load_modules(monkeypatch, tmp_path)
+    classifier = trained(mod)
+    assert classifier.predict('floyd, go north')[0] == 'GoSomewhere'
+    assert classifier.predict('pick up the lamp')[0] == 'PickUp'
+
+    path = tmp_path / 'model.npz'
+    classifier.save(str(path))
+    loaded = mod.IntentClassifier.load(str(path))
+    assert loaded.labels == classifier.labels
+    assert loaded.threshold == classifier.threshold
+    assert loaded.predict('what is that?') == classifier.predict('what is that?')
+
+
+def test_deployed_model_keeps_its_trained_threshold(monkeypatch, tmp_path):
+    ic, _ = load_modules(monkeypatch, tmp_path)
+    path = tmp_path / 'model.npz'
+    trained(ic, threshold=0.6).save(str(path))
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(path))
+    monkeypatch.delenv('FLOYD_INTENT_THRESHOLD', raising=False)
+
+    assert importlib.reload(ic).get_intent_classifier().threshold == pytest.approx(0.6)
+
+    monkeypatch.setenv('FLOYD_INTENT_THRESHOLD', '0.75')
+    assert importlib.reload(ic).get_intent_classifier().threshold == 0.75
+
+
+def test_cli_trains_from_decision_log(monkeypatch, tmp_path, capsys):
+    mod, _ = load_modules(monkeypatch, tmp_path)
+    log = tmp_path / 'decisions.jsonl'
+    log.write_text('\n'.join(json.dumps({'prompt': p, 'route': r}) for p, r in TRAINING))
+    output = tmp_path / 'model.npz'
+    mod.main(['train', str(log), '-o', str(output), '--features', '4096'])
+    assert output.exists()
+    assert '"accuracy": 1.0' in capsys.readouterr().out
+
+
+def test_floyd_uses_confident_classifier(monkeypatch, tmp_path):
+    classifier_mod, floyd_mod = load_modules(monkeypatch, tmp_path)
+    classifier_mod.set_intent_classifier(trained(classifier_mod, threshold=0.0))
+    router = floyd_mod.Floyd('rid')
+    monkeypatch.setattr(router, 'run_once', MagicMock())
+
+    decision = router.decide('floyd, go north')
+
+    assert decision == {'route': 'GoSomewhere', 'round_trips': 0, 'source': 'classifier'}
+    router.run_once.assert_not_called()
+    assert classifier_mod.routing_stats.to_dict() == {'classifier': 1}
+
+
+def test_floyd_falls_back_to_router(monkeypatch, tmp_path):
+    classifier_mod, floyd_mod = load_modules(monkeypatch, tmp_path)
+    classifier_mod.set_intent_classifier(trained(classifier_mod, threshold=1.1))
+    router = floyd_mod.Floyd('rid')
+    monkeypatch.setattr(router, 'run_once', MagicMock(return_value={'content': 'AskQuestion', 'round_trips': 1}))
+
+    decision = router.decide('floyd, go north')
+
+    assert decision['source'] == 'router'
+    assert decision['route'] == 'AskQuestion'
+    assert classifier_mod.routing_stats.to_dict() == {'router': 1}
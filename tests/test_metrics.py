@@ -0,0 +1,127 @@
+import asyncio
+import importlib
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_metrics(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'metrics' in sys.modules:
+        del sys.modules['metrics']
+    return importlib.import_module('metrics')
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with a mocked openai client."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('OPENAI_RUN_MODE', 'poll')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('metrics')
+    return importlib.import_module('main'), client
+
+
+def emf_lines(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_emits_one_emf_document_per_request(monkeypatch, capsys):
+    metrics = load_metrics(monkeypatch)
+
+    with metrics.request_metrics(AssistantType='blather'):
+        with metrics.stage('Completion'):
+            pass
+        with metrics.stage('Completion'):
+            pass
+        metrics.count('Polls', 3)
+        metrics.set_dimension('Route', 'GoSomewhere')
+        metrics.set_property('SessionId', 'g1')
+    with metrics.request_metrics(AssistantType='blather'):
+        pass
+
+    first, second = emf_lines(capsys.readouterr().out)
+    directive = first['_aws']['CloudWatchMetrics'][0]
+    assert directive['Namespace'] == 'Floyd'
+    assert ['AssistantType', 'Route'] in directive['Dimensions']
+    names = {m['Name']: m['Unit'] for m in directive['Metrics']}
+    assert names == {'CompletionLatency': 'Milliseconds', 'TotalLatency': 'Milliseconds', 'Polls': 'Count'}
+    assert first['AssistantType'] == 'blather'
+    assert first['Route'] == 'GoSomewhere'
+    assert first['Polls'] == 3
+    assert first['SessionId'] == 'g1'
+    assert first['StartType'] == 'cold'
+    assert second['StartType'] == 'warm'
+    assert second['Route'] == 'none'
+
+
+def test_helpers_are_noops_outside_a_request(monkeypatch, capsys):
+    metrics = load_metrics(monkeypatch)
+
+    with metrics.stage('Completion'):
+        metrics.count('Polls')
+        metrics.set_dimension('Route', 'x')
+
+    assert metrics.current() is None
+    assert capsys.readouterr().out == ''
+
+
+def test_concurrent_requests_keep_separate_metrics(monkeypatch, capsys):
+    metrics = load_metrics(monkeypatch)
+
+    async def request(name, polls):
+        with metrics.request_metrics(AssistantType=name):
+            await asyncio.sleep(0.01)
+            metrics.count('Polls', polls)
+
+    async def run():
+        await asyncio.gather(request('a', 1), request('b', 5))
+
+    asyncio.run(run())
+
+    polls = {doc['AssistantType']: doc['Polls'] for doc in emf_lines(capsys.readouterr().out)}
+    assert polls == {'a': 1, 'b': 5}
+
+
+def test_polled_floyd_turn_reports_every_stage(monkeypatch, tmp_path, capsys):
+    main, client = load_main(monkeypatch, tmp_path)
+    router = MagicMock()
+    router.decide.return_value = {'route': 'GoSomewhere', 'round_trips': 0, 'source': 'classifier'}
+    router.resolve.return_value = 'gid'
+    main.registry.get_or_create(('Floyd', 'rid'), lambda: router)
+    run = MagicMock(id='run_1', thread_id='thread_1', status='completed')
+    client.beta.threads.create_and_run.return_value = run
+    client.beta.threads.runs.retrieve.return_value = run
+    message = MagicMock(role='assistant')
+    message.content[0].text.value = '{"message": "Floyd goes north.", "direction": "north"}'
+    client.beta.threads.messages.list.return_value = MagicMock(data=[message])
+
+    response = main.lambda_handler({'assistant': 'floyd', 'prompt': 'go north'}, None)
+
+    assert response['statusCode'] == 200
+    [doc] = emf_lines(capsys.readouterr().out)
+    assert doc['AssistantType'] == 'floyd'
+    assert doc['Route'] == 'GoSomewhere'
+    assert doc['RouteSource'] == 'classifier'
+    for name in ('Parse', 'Create', 'Route', 'Process', 'RunCreate', 'RunPoll', 'MessageList', 'Total'):
+        assert f'{name}Latency' in doc
+    assert doc['Polls'] >= 1
+    assert doc['ApiRoundTrips'] == 2 + doc['Polls']
+
+
+def test_errors_are_counted(monkeypatch, tmp_path, capsys):
+    main, client = load_main(monkeypatch, tmp_path)
+
+    main.lambda_handler({'assistant': 'nobody', 'prompt': 'hi'}, None)
+
+    [doc] = emf_lines(capsys.readouterr().out)
+    assert doc['Errors'] == 1
+    assert doc['StatusCode'] == 400
@@ -0,0 +1,89 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import purge_modules
+
+
+def load_microbench(monkeypatch, tmp_path):
+    """Import microbench and main with the real openai SDK; no API calls are made."""
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    # Everything configure_environment sets, so the test leaves the environment as it found it
+    monkeypatch.setenv('OPENAI_API_KEY', 'microbench-key')
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'asst_router')
+    monkeypatch.setenv('FLOYD_METRICS', '0')
+    monkeypatch.setenv('FLOYD_CAPTURE_SAMPLE_RATE', '0')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    purge_modules('microbench', 'capture', 'metrics')
+    return importlib.import_module('microbench')
+
+
+def test_stored_baseline_covers_every_case(monkeypatch, tmp_path):
+    microbench = load_microbench(monkeypatch, tmp_path)
+
+    results = microbench.run_suite(min_time=0.001, repeat=1, allocation_calls=2)
+    baseline = microbench.load_baseline()
+
+    assert baseline is not None
+    assert set(results['cases']) == set(baseline['cases'])
+    for name, result in results['cases'].items():
+        assert result['ns_per_call'] > 0 and result['relative'] > 0, name
+    # A batch of long prompts is the heaviest thing parsed per request
+    assert results['cases']['RequestParser.parse_batch/max']['peak_bytes'] > \
+        results['cases']['RequestParser.parse/long']['peak_bytes']
+
+
+def test_allocations_match_the_stored_baseline(monkeypatch, tmp_path):
+    microbench = load_microbench(monkeypatch, tmp_path)
+    baseline = microbench.load_baseline()
+    if baseline['python'].rsplit('.', 1)[0] != microbench.platform.python_version().rsplit('.', 1)[0]:
+        pytest.skip('Baseline allocations were recorded on another Python version')
+
+    results = microbench.run_suite(min_time=0.001, repeat=1)
+    # Timings from a run this short mean nothing; allocations are repeatable
+    for result in results['cases'].values():
+        result['relative'] = 0.0
+
+    assert microbench.compare(results, baseline) == []
+
+
+def test_regressions_fail_loudly(monkeypatch, tmp_path, capsys):
+    microbench = load_microbench(monkeypatch, tmp_path)
+    path = tmp_path / 'baseline.json'
+    microbench.main(['--only', 'ResponseParser.parse/*', '--min-time', '0.01', '--update', '--baseline', str(path)])
+    main = sys.modules['main']
+    parse = main.ResponseParser.parse
+
+    def wasteful(content):
+        # A regression that copies the reply a few times over on the way
+        copies = [content + " " for _ in range(8)]
+        return parse(copies[0][:len(content)])
+
+    monkeypatch.setattr(main.ResponseParser, 'parse', staticmethod(wasteful))
+    with pytest.raises(SystemExit) as failure:
+        microbench.main(['--only', 'ResponseParser.parse/long_text', '--min-time', '0.01', '--check',
+                         '--baseline', str(path)])
+
+    assert failure.value.code == 1
+    errors = capsys.readouterr().err
+    assert 'ResponseParser.parse/long_text: peak_bytes' in errors
+
+
+def test_compare_uses_relative_time_and_skips_allocations_across_pythons(monkeypatch, tmp_path):
+    microbench = load_microbench(monkeypatch, tmp_path)
+    baseline = {'python': '3.11.7', 'cases': {
+        'a': {'relative': 1.0, 'peak_bytes': 1000, 'retained_bytes': 0},
+        'b': {'relative': 1.0, 'peak_bytes': 1000, 'retained_bytes': 0},
+    }}
+    results = {'python': '3.11.9', 'cases': {
+        'a': {'relative': 2.5, 'peak_bytes': 1100, 'retained_bytes': 0},
+        'b': {'relative': 1.2, 'peak_bytes': 5000, 'retained_bytes': 600},
+        'new': {'relative': 9.0, 'peak_bytes': 9000, 'retained_bytes': 0},
+    }}
+
+    regressions = microbench.compare(results, baseline)
+    assert [line.split(':')[0] for line in regressions] == ['a', 'b', 'b']
+    assert microbench.compare({**results, 'python': '3.12.1'}, baseline) == [regressions[0]]
@@ -0,0 +1,285 @@
+import importlib
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_client(monkeypatch):
+    """Import openAIAssistantClient with a mocked openai dependency."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    mod = importlib.import_module('openAIAssistantClient')
+    return mod, client
+
+
+class FakeStream:
+    def __init__(self, events, error=None):
+        self.events = events
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.events
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+def run_event(name, status, run_id='run1', thread_id=None):
+    return SimpleNamespace(event=name, data=SimpleNamespace(id=run_id, status=status, thread_id=thread_id))
+
+
+def delta_event(text):
+    block = SimpleNamespace(text=SimpleNamespace(value=text))
+    return SimpleNamespace(
+        event='thread.message.delta',
+        data=SimpleNamespace(delta=SimpleNamespace(content=[block]))
+    )
+
+
+def test_stream_assistant_collects_tokens(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    stream = FakeStream([
+        run_event('thread.run.created', 'queued'),
+        delta_event('Go'),
+        delta_event('Somewhere'),
+        run_event('thread.run.completed', 'completed'),
+    ])
+    client.beta.threads.runs.create.return_value = stream
+    tokens = []
+
+    instance = mod.OpenAIAssistantClient('aid')
+    result = instance.stream_assistant('tid', on_token=tokens.append)
+
+    assert result == {'role': 'assistant', 'content': 'GoSomewhere'}
+    assert tokens == ['Go', 'Somewhere']
+    assert stream.closed
+    client.beta.threads.runs.create.assert_called_once_with(
+        thread_id='tid', assistant_id='aid', instructions=None, stream=True
+    )
+    client.beta.threads.runs.retrieve.assert_not_called()
+
+
+def test_chat_stream_falls_back_to_polling(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    instance = mod.OpenAIAssistantClient('aid')
+    monkeypatch.setattr(instance, 'create_thread', MagicMock(return_value='tid'))
+    monkeypatch.setattr(instance, 'add_message', MagicMock())
+    monkeypatch.setattr(instance, 'stream_assistant', MagicMock(side_effect=RuntimeError('no stream')))
+    monkeypatch.setattr(instance, 'run_assistant', MagicMock(return_value={'role': 'assistant', 'content': 'resp'}))
+
+    resp = instance.chat('hello', stream=True)
+
+    instance.stream_assistant.assert_called_once()
+    instance.run_assistant.assert_called_once_with('tid', None)
+    assert resp['content'] == 'resp'
+
+
+def test_chat_stream_broken_mid_run_polls_the_same_run(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    stream = FakeStream([
+        run_event('thread.run.created', 'queued'),
+        delta_event('Floyd '),
+    ], error=ConnectionError('connection reset'))
+    client.beta.threads.runs.create.return_value = stream
+    client.beta.threads.runs.retrieve.return_value = SimpleNamespace(id='run1', status='completed')
+    assistant_msg = SimpleNamespace(
+        role='assistant',
+        content=[SimpleNamespace(text=SimpleNamespace(value='Floyd waves'))]
+    )
+    client.beta.threads.messages.list.return_value = SimpleNamespace(data=[assistant_msg])
+    tokens = []
+
+    instance = mod.OpenAIAssistantClient('aid')
+    resp = instance.chat('wave', thread_id='tid', stream=True, on_token=tokens.append)
+
+    assert resp['content'] == 'Floyd waves'
+    assert tokens == ['Floyd ']
+    assert stream.closed
+    # No second, billed run: the broken one is looked up and its reply fetched
+    client.beta.threads.runs.create.assert_called_once()
+    client.beta.threads.runs.retrieve.assert_called_once_with(thread_id='tid', run_id='run1')
+
+
+def test_chat_poll_mode_skips_stream(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.run_mode = 'poll'
+    monkeypatch.setattr(instance, 'create_thread', MagicMock(return_value='tid'))
+    monkeypatch.setattr(instance, 'add_message', MagicMock())
+    monkeypatch.setattr(instance, 'stream_assistant', MagicMock())
+    monkeypatch.setattr(instance, 'run_assistant', MagicMock(return_value={'role': 'assistant', 'content': 'resp'}))
+
+    instance.chat('hello', stream=True)
+
+    instance.stream_assistant.assert_not_called()
+    instance.run_assistant.assert_called_once_with('tid', None)
+
+
+def test_stream_chat_yields_tokens(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    client.beta.threads.create.return_value = SimpleNamespace(id='tid')
+    client.beta.threads.runs.create.return_value = FakeStream([
+        delta_event('Hello'),
+        delta_event(' there'),
+        run_event('thread.run.completed', 'completed'),
+    ])
+    instance = mod.OpenAIAssistantClient('aid')
+    assert list(instance.stream_chat('hi')) == ['Hello', ' there']
+
+
+def test_run_once_stream_is_single_round_trip(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    client.beta.threads.create_and_run.return_value = FakeStream([
+        run_event('thread.run.created', 'queued'),
+        delta_event('PickUp'),
+        run_event('thread.run.completed', 'completed'),
+    ])
+    instance = mod.OpenAIAssistantClient('aid')
+    result = instance.run_once('pick up the key', stream=True)
+
+    assert result['content'] == 'PickUp'
+    assert result['run_id'] == 'run1'
+    assert result['round_trips'] == 1
+    client.beta.threads.create.assert_not_called()
+    client.beta.threads.messages.create.assert_not_called()
+    client.beta.threads.messages.list.assert_not_called()
+
+
+def test_run_once_poll_lists_only_run_messages(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    monkeypatch.setattr(mod.time, 'sleep', lambda x: None)
+    client.beta.threads.create_and_run.return_value = SimpleNamespace(
+        id='run1', thread_id='tid', status='queued'
+    )
+    client.beta.threads.runs.retrieve.side_effect = [
+        SimpleNamespace(id='run1', thread_id='tid', status='in_progress'),
+        SimpleNamespace(id='run1', thread_id='tid', status='completed'),
+    ]
+    assistant_msg = SimpleNamespace(
+        role='assistant',
+        content=[SimpleNamespace(text=SimpleNamespace(value='hi'))]
+    )
+    client.beta.threads.messages.list.return_value = SimpleNamespace(data=[assistant_msg])
+
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.poller = None
+    result = instance.run_once('hello')
+
+    assert result['content'] == 'hi'
+    assert result['round_trips'] == 4
+    client.beta.threads.create_and_run.assert_called_once_with(
+        assistant_id='aid',
+        thread={'messages': [{'role': 'user', 'content': 'hello'}]},
+        instructions=None
+    )
+    client.beta.threads.messages.list.assert_called_once_with(
+        thread_id='tid', run_id='run1', order='desc', limit=1
+    )
+
+
+def test_run_once_stream_broken_after_first_delta_polls_the_same_run(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    monkeypatch.setattr(mod.time, 'sleep', lambda x: None)
+    client.beta.threads.create_and_run.return_value = FakeStream([
+        run_event('thread.run.created', 'queued', thread_id='tid'),
+        delta_event('Pick'),
+    ], error=ConnectionError('connection reset'))
+    client.beta.threads.runs.retrieve.side_effect = [
+        SimpleNamespace(id='run1', thread_id='tid', status='in_progress'),
+        SimpleNamespace(id='run1', thread_id='tid', status='completed'),
+    ]
+    assistant_msg = SimpleNamespace(
+        role='assistant',
+        content=[SimpleNamespace(text=SimpleNamespace(value='PickUp'))]
+    )
+    client.beta.threads.messages.list.return_value = SimpleNamespace(data=[assistant_msg])
+    tokens = []
+
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.poller = None
+    result = instance.run_once('pick up the key', stream=True, on_token=tokens.append)
+
+    assert tokens == ['Pick']
+    assert result['content'] == 'PickUp'
+    assert result['run_id'] == 'run1' and result['status'] == 'completed'
+    # Stream, lookup, one poll, message list
+    assert result['round_trips'] == 4
+    client.beta.threads.create_and_run.assert_called_once()
+    client.beta.threads.messages.list.assert_called_once_with(
+        thread_id='tid', run_id='run1', order='desc', limit=1
+    )
+
+
+def test_run_once_falls_back_to_polling_when_the_stream_never_starts(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    run = SimpleNamespace(id='run2', thread_id='tid', status='completed')
+    client.beta.threads.create_and_run.side_effect = [RuntimeError('streaming unsupported'), run]
+    client.beta.threads.runs.retrieve.return_value = run
+    assistant_msg = SimpleNamespace(
+        role='assistant',
+        content=[SimpleNamespace(text=SimpleNamespace(value='hi'))]
+    )
+    client.beta.threads.messages.list.return_value = SimpleNamespace(data=[assistant_msg])
+
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.poller = None
+    result = instance.run_once('hello', stream=True)
+
+    assert result['content'] == 'hi' and result['run_id'] == 'run2'
+    assert client.beta.threads.create_and_run.call_count == 2
+
+
+def test_run_once_poll_cancels_as_soon_as_the_event_is_set(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    monkeypatch.setattr(mod.time, 'sleep', lambda x: None)
+    cancel_event = threading.Event()
+    client.beta.threads.create_and_run.return_value = SimpleNamespace(
+        id='run1', thread_id='tid', status='queued'
+    )
+
+    def still_running(thread_id, run_id):
+        # The speculation loses while the run is being polled
+        cancel_event.set()
+        return SimpleNamespace(id='run1', thread_id='tid', status='in_progress')
+
+    client.beta.threads.runs.retrieve.side_effect = still_running
+
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.poller = None
+    result = instance.run_once('hello', cancel_event=cancel_event)
+
+    assert result['status'] == 'cancelled'
+    assert client.beta.threads.runs.retrieve.call_count == 1
+    client.beta.threads.runs.cancel.assert_called_once_with(thread_id='tid', run_id='run1')
+    client.beta.threads.messages.list.assert_not_called()
+
+
+def test_shared_poller_wait_is_abandoned_when_cancelled(monkeypatch):
+    mod, client = load_client(monkeypatch)
+    cancel_event = threading.Event()
+    client.beta.threads.create_and_run.return_value = SimpleNamespace(
+        id='run1', thread_id='tid', status='queued'
+    )
+    pending = Future()
+
+    def submit(*args, **kwargs):
+        cancel_event.set()
+        return pending
+
+    instance = mod.OpenAIAssistantClient('aid')
+    instance.poller = SimpleNamespace(submit=submit)
+    result = instance.run_once('hello', cancel_event=cancel_event)
+
+    assert result['status'] == 'cancelled'
+    assert pending.cancelled()
+    client.beta.threads.runs.cancel.assert_called_once_with(thread_id='tid', run_id='run1')
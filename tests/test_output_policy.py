@@ -0,0 +1,128 @@
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import MagicMock
+
+import pytest
+
+
+def load_policy(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'output_policy' in sys.modules:
+        del sys.modules['output_policy']
+    return importlib.import_module('output_policy')
+
+
+def load_blather(monkeypatch, character='blather'):
+    """Import a character module (characters.blather by default) with a mocked openai client."""
+    client = MagicMock()
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock(return_value=client)
+    openai_module.AsyncOpenAI = MagicMock()
+    types_module = ModuleType('openai.types')
+    chat_module = ModuleType('openai.types.chat')
+    chat_module.ChatCompletionSystemMessageParam = dict
+    chat_module.ChatCompletionUserMessageParam = dict
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    monkeypatch.setitem(sys.modules, 'openai.types', types_module)
+    monkeypatch.setitem(sys.modules, 'openai.types.chat', chat_module)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in list(sys.modules):
+        if name.startswith('characters') or name in ('client_registry', 'output_policy', 'streaming'):
+            del sys.modules[name]
+    return importlib.import_module(f'characters.{character}'), client
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+REPLY = ('Blather snaps, "How dare you, Ensign Seventh Class! That is 3.5 demerits... at least. '
+         'Mr. Smith would agree! Silence?! And another thing." He glares.')
+EXPECTED = ('Blather snaps, "How dare you, Ensign Seventh Class! That is 3.5 demerits... at least. '
+            'Mr. Smith would agree! Silence?!"')
+
+
+@pytest.mark.parametrize('size', [1, 4, 1000])
+def test_stream_is_cut_at_the_sentence_limit(monkeypatch, size):
+    mod = load_policy(monkeypatch)
+    policy = mod.OutputPolicy(max_sentences=4, attribution=r'\bBlather\b')
+    stats = mod.PolicyStats()
+
+    assert ''.join(mod.enforce(chunks(REPLY, size), policy, stats)) == EXPECTED
+    assert stats.to_dict()['truncated'] == 1
+    assert stats.to_dict()['attribution_missing'] == 0
+
+
+def test_stops_reading_once_the_policy_is_met(monkeypatch):
+    mod = load_policy(monkeypatch)
+    pulled = []
+    closed = []
+
+    def tokens():
+        try:
+            for token in ['One. ', 'Two. ', 'Three. ', 'Four.']:
+                pulled.append(token)
+                yield token
+        finally:
+            closed.append(True)
+
+    text = ''.join(mod.enforce(tokens(), mod.OutputPolicy(max_sentences=2), None))
+
+    assert text == 'One. Two.'
+    assert pulled == ['One. ', 'Two. ']
+    assert closed == [True]
+
+
+def test_reply_within_policy_is_unchanged(monkeypatch):
+    mod = load_policy(monkeypatch)
+    stats = mod.PolicyStats()
+    policy = mod.OutputPolicy(max_sentences=4, attribution=r'\bBlather\b')
+
+    assert mod.trim('One. Two. Three. Four.', policy, stats) == 'One. Two. Three. Four.'
+    assert mod.trim('Just a fragment', policy, stats) == 'Just a fragment'
+    assert stats.to_dict() == {'checked': 2, 'truncated': 0, 'truncated_rate': 0.0, 'attribution_missing': 2}
+
+
+def test_character_limit_cuts_at_sentence_boundary(monkeypatch):
+    mod = load_policy(monkeypatch)
+    policy = mod.OutputPolicy(max_characters=30)
+    reply = 'One two three. Four five six seven. Eight.'
+
+    assert mod.trim(reply, policy, None) == 'One two three.'
+    assert ''.join(mod.enforce(chunks(reply, 2), policy, None)) == 'One two three.'
+    assert mod.trim('A sentence much longer than thirty characters', policy, None) == 'A sentence much longer than'
+
+
+def test_character_limit_releases_whole_sentences(monkeypatch):
+    mod = load_policy(monkeypatch)
+    enforcer = mod.PolicyEnforcer(mod.OutputPolicy(max_characters=100))
+
+    assert enforcer.feed('Blather glares') == ''
+    assert enforcer.feed('.') == ''
+    assert enforcer.feed(' He sniffs') == 'Blather glares.'
+    assert enforcer.finish() == ' He sniffs'
+
+
+def test_blather_stream_applies_policy(monkeypatch):
+    blather, client = load_blather(monkeypatch)
+    stream = MagicMock()
+    parts = chunks('Blather says, "One. Two. Three. Four. Five. Six."', 5)
+    stream.__iter__.return_value = [MagicMock(choices=[MagicMock(delta=MagicMock(content=p))]) for p in parts]
+    client.chat.completions.create.return_value = stream
+
+    text = ''.join(blather.Blather().blather_stream('hi'))
+
+    assert text == 'Blather says, "One. Two. Three. Four."'
+    stream.close.assert_called_once()
+
+
+def test_ambassador_reply_is_never_cut(monkeypatch):
+    ambassador, client = load_blather(monkeypatch, 'ambassador')
+    reply = 'The Ambassador reflects, "' + ' '.join(f'Sentence {i}.' for i in range(8)) + '"'
+    client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content=reply))])
+
+    assert ambassador.Ambassador().respond('hi') == reply
@@ -0,0 +1,160 @@
+import csv
+import importlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+
+def load_replay(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('replay', 'benchmark', 'fake_openai'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('replay')
+
+
+def write_log(tmp_path):
+    path = tmp_path / 'requests.jsonl'
+    records = [
+        {'ts': 100.0, 'assistant': 'floyd', 'prompt': 'Go north', 'route': 'GoSomewhere'},
+        {'ts': 100.5, 'assistant': 'floyd', 'prompt': 'Pick up the sword', 'session_id': '3f9a0c'},
+        {'ts': 101.5, 'assistant': 'blather', 'prompt': 'Hello'},
+        {'ts': 102.0, 'assistant': 'floyd', 'prompt': ''},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n")
+    return path
+
+
+def stub_handler(event, context):
+    """Answers Floyd prompts with a route in the metadata, like main.lambda_handler."""
+    time.sleep(0.005)
+    if event['assistant'] != 'floyd':
+        return {'statusCode': 200, 'body': json.dumps({'results': {'message': 'Report to the brig!'}})}
+    route = 'GoSomewhere' if 'north' in event['prompt'] else 'PickUp'
+    body = {'results': {'message': 'Floyd obliges.', 'metadata': {'assistant_type': route}}}
+    return {'statusCode': 200, 'body': json.dumps(body)}
+
+
+def test_loads_capture_records_and_keeps_their_pacing(monkeypatch, tmp_path):
+    replay = load_replay(monkeypatch)
+
+    entries = replay.load_log(str(write_log(tmp_path)))
+
+    assert [e['event'] for e in entries] == [
+        {'assistant': 'floyd', 'prompt': 'Go north'},
+        {'assistant': 'floyd', 'prompt': 'Pick up the sword', 'session_id': '3f9a0c'},
+        {'assistant': 'blather', 'prompt': 'Hello'},
+    ]
+    assert replay.recorded_offsets(entries) == [0.0, 0.5, 1.5]
+    assert replay.recorded_offsets(entries, time_scale=2) == [0.0, 0.25, 0.75]
+    # Repeating the log wraps back to an earlier timestamp without going backwards
+    assert replay.recorded_offsets(entries + entries, time_scale=2) == [0.0, 0.25, 0.75, 0.75, 1.0, 1.5]
+
+
+def test_poisson_arrivals_are_seeded(monkeypatch):
+    replay = load_replay(monkeypatch)
+
+    offsets = replay.poisson_offsets(2000, 50.0, random.Random(7))
+
+    assert offsets == replay.poisson_offsets(2000, 50.0, random.Random(7))
+    assert offsets[0] == 0.0 and offsets == sorted(offsets)
+    assert 45 < (len(offsets) - 1) / offsets[-1] < 55
+
+
+def test_reports_by_assistant_and_route_and_exports_a_curve(monkeypatch, tmp_path):
+    replay = load_replay(monkeypatch)
+    entries = replay.load_log(str(write_log(tmp_path))) * 4
+    runner = replay.ReplayRunner(replay.InProcessTarget(stub_handler))
+
+    levels = replay.plan_levels(entries, [1, 4], [], False, [1.0], random.Random(1))
+    reports, rows = replay.run_levels(runner, entries, levels, label='baseline')
+
+    assert [(r['mode'], r['level']) for r in reports] == [('closed', 1), ('closed', 4)]
+    report = reports[1]
+    assert report['overall']['turns'] == 12 and report['overall']['errors'] == 0
+    assert {name: s['turns'] for name, s in report['assistants'].items()} == {'floyd': 8, 'blather': 4}
+    assert {name: s['turns'] for name, s in report['routes'].items()} == {'GoSomewhere': 4, 'PickUp': 4}
+    assert replay.format_report('closed 4', report)[-1].split()[0] == 'floyd/PickUp'
+
+    path = tmp_path / 'curve.csv'
+    replay.export_curve(rows, str(path))
+    with open(path, newline='') as f:
+        exported = list(csv.DictReader(f))
+    assert list(exported[0]) == replay.CURVE_FIELDS
+    assert [(r['label'], r['level'], r['requests']) for r in exported] == [('baseline', '1', '12'),
+                                                                          ('baseline', '4', '12')]
+
+
+def test_open_loop_counts_queueing_and_failures(monkeypatch, tmp_path):
+    replay = load_replay(monkeypatch)
+    entries = replay.load_log(str(write_log(tmp_path)))
+    gate = threading.Lock()
+
+    def saturated(event, context):
+        if event['assistant'] == 'blather':
+            raise RuntimeError('Blather is indisposed')
+        with gate:
+            time.sleep(0.05)
+        return stub_handler(event, context)
+
+    runner = replay.ReplayRunner(replay.InProcessTarget(saturated))
+    levels = replay.plan_levels(entries, [], [], True, [10.0], random.Random(1))
+    [report], [row] = replay.run_levels(runner, entries, levels)
+
+    assert levels[0][2] == pytest.approx([0.0, 0.05, 0.15])
+    assert row['mode'] == 'recorded' and row['offered_rps'] == 13.33
+    assert report['assistants']['blather']['errors'] == 1
+    # The second Floyd request arrived while the first held the gate, and waited for it
+    assert report['routes']['PickUp']['p50_ms'] >= 50
+
+
+def test_quiet_runs_discard_handler_output(monkeypatch, tmp_path, capsys):
+    replay = load_replay(monkeypatch)
+    seen = []
+
+    def chatty(event, context):
+        print('x' * 10000)
+        seen.append(event)
+        return stub_handler(event, context)
+
+    monkeypatch.setattr(replay, '_in_process_handler', lambda fake, config_path: chatty)
+    replay.main([str(write_log(tmp_path)), '--requests', '6', '--concurrency', '2'])
+
+    assert 'x' * 100 not in capsys.readouterr().out
+    assert [e.get('session_id') for e in seen].count('3f9a0c') == 2
+
+
+def test_http_target(monkeypatch):
+    replay = load_replay(monkeypatch)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            event = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            if event['prompt'] == 'boom':
+                self.send_error(502)
+                return
+            body = stub_handler(event, None)['body'].encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        target = replay.HttpTarget(f"http://127.0.0.1:{server.server_port}/", timeout=5)
+        assert target.send({'assistant': 'floyd', 'prompt': 'Go north'}) == (200, 'GoSomewhere')
+        assert target.send({'assistant': 'floyd', 'prompt': 'boom'}) == (502, None)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,53 @@
+import importlib
+import sys
+from pathlib import Path
+
+
+def load_cache(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'response_cache' in sys.modules:
+        del sys.modules['response_cache']
+    return importlib.import_module('response_cache')
+
+
+def test_memory_then_disk_tier(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch)
+    db = str(tmp_path / 'cache.sqlite3')
+    cache = mod.ResponseCache('gpt-4o', 'prompt', {'temperature': 0}, db_path=db)
+    assert cache.get('kiss floyd') is None
+    cache.put('kiss floyd', 'no')
+    assert cache.get('kiss floyd') == 'no'
+
+    cold = mod.ResponseCache('gpt-4o', 'prompt', {'temperature': 0}, db_path=db)
+    assert cold.get('kiss floyd') == 'no'
+    assert cold.get('kiss floyd') == 'no'
+    assert (cold.disk_hits, cold.memory_hits, cold.misses) == (1, 1, 0)
+
+
+def test_values_are_compressed_on_disk(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch)
+    db = str(tmp_path / 'cache.sqlite3')
+    cache = mod.ResponseCache('gpt-4o', 'prompt', db_path=db)
+    value = 'I love you. ' * 200
+    cache.put('tell floyd I love him', value)
+    blob = mod._store_for(db).get(cache.key('tell floyd I love him'))
+    assert blob[:1] == mod._ZSTD
+    assert len(blob) < len(value)
+
+
+def test_prompt_or_model_change_misses(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch)
+    db = str(tmp_path / 'cache.sqlite3')
+    mod.ResponseCache('gpt-4o', 'prompt v1', db_path=db).put('hi', 'hello')
+    assert mod.ResponseCache('gpt-4o', 'prompt v2', db_path=db).get('hi') is None
+    assert mod.ResponseCache('gpt-4.1', 'prompt v1', db_path=db).get('hi') is None
+    assert mod.ResponseCache('gpt-4o', 'prompt v1', db_path=db).get('hi') == 'hello'
+
+
+def test_seed_bulk_loads(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch)
+    db = str(tmp_path / 'cache.sqlite3')
+    cache = mod.ResponseCache('gpt-4o', 'prompt', db_path=db)
+    assert cache.seed([('a', '1'), ('b', '2')]) == 2
+    assert mod.ResponseCache('gpt-4o', 'prompt', db_path=db).get('b') == '2'
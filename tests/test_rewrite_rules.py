@@ -0,0 +1,97 @@
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+
+def load_modules(monkeypatch):
+    client = MagicMock()
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock(return_value=client)
+    openai_module.AsyncOpenAI = MagicMock()
+    types_module = ModuleType('openai.types')
+    chat_module = ModuleType('openai.types.chat')
+    chat_module.ChatCompletionSystemMessageParam = dict
+    chat_module.ChatCompletionUserMessageParam = dict
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    monkeypatch.setitem(sys.modules, 'openai.types', types_module)
+    monkeypatch.setitem(sys.modules, 'openai.types.chat', chat_module)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('client_registry', 'rewrite_rules', 'rewrite_second_person'):
+        if name in sys.modules:
+            del sys.modules[name]
+    rules = importlib.import_module('rewrite_rules')
+    rewriter = importlib.import_module('rewrite_second_person')
+    return rules, rewriter, client
+
+
+@pytest.mark.parametrize('prompt, expected', [
+    ('kiss Floyd', 'no'),
+    ('Kick Floyd', 'no'),
+    ('Open the door', 'no'),
+    ('Run away', 'no'),
+    ('I’m bored', 'no'),
+    ('I feel sad', 'no'),
+    ('Floyd, I love you', 'I love you'),
+    ('Floyd, stop talking', 'Stop talking'),
+    ('Say to Floyd ‘You suck’', 'You suck'),
+    ('say "hello there" to floyd', 'hello there'),
+    ('Tell Floyd I love him', None),
+    ('Ask Floyd to open the door', None),
+    ('yell at floyd to go slowly and be careful', None),
+    ('open the door, floyd', None),
+])
+def test_rules(monkeypatch, prompt, expected):
+    rules, _, _ = load_modules(monkeypatch)
+    assert rules.apply(prompt) == expected
+
+
+def model_returns(client, content):
+    client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+def test_on_mode_skips_model(monkeypatch):
+    rules, rewriter, client = load_modules(monkeypatch)
+    assert rewriter.RewriteSecondPerson(rules_mode='on').rewrite('kiss Floyd') == 'no'
+    client.chat.completions.create.assert_not_called()
+    assert rules.rule_stats.to_dict()['served'] == 1
+
+
+def test_shadow_mode_compares_with_model(monkeypatch, capsys):
+    rules, rewriter, client = load_modules(monkeypatch)
+    model_returns(client, 'I love you.')
+    instance = rewriter.RewriteSecondPerson(rules_mode='shadow')
+    assert instance.rewrite('Floyd, I love you') == 'I love you.'
+    model_returns(client, 'Kiss me')
+    assert instance.rewrite('kiss Floyd') == 'Kiss me'
+    stats = rules.rule_stats.to_dict()
+    assert (stats['compared'], stats['agreed']) == (2, 1)
+    logged = capsys.readouterr().out
+    assert 'Rewrite rules disagree for prompt' in logged
+    assert 'kiss' not in logged.lower() and 'Kiss me' not in logged
+
+
+def test_async_rewrite_shares_the_model_call(monkeypatch):
+    rules, rewriter, client = load_modules(monkeypatch)
+    async_client = sys.modules['openai'].AsyncOpenAI.return_value
+    async_client.chat.completions.create = AsyncMock()
+    model_returns(async_client, ' Kiss me ')
+    instance = rewriter.RewriteSecondPerson(rules_mode='shadow')
+
+    assert asyncio.run(instance.rewrite_async('kiss Floyd')) == 'Kiss me'
+    assert async_client.chat.completions.create.await_args.kwargs['model'] == rewriter.MODEL
+    assert rules.rule_stats.to_dict()['compared'] == 1
+
+
+def test_ambiguous_input_goes_to_model(monkeypatch):
+    rules, rewriter, client = load_modules(monkeypatch)
+    model_returns(client, 'I love you')
+    assert rewriter.RewriteSecondPerson(rules_mode='on').rewrite('Tell Floyd I love him') == 'I love you'
+    client.chat.completions.create.assert_called_once()
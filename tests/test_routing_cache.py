@@ -0,0 +1,55 @@
+import importlib
+import sys
+from pathlib import Path
+
+
+def load_cache(monkeypatch):
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'routing_cache' in sys.modules:
+        del sys.modules['routing_cache']
+    return importlib.import_module('routing_cache')
+
+
+ASSISTANT_MAP = {'GoSomewhere': 'gid', 'PickUp': 'pid'}
+
+
+def test_normalize_prompt_folds_variants(monkeypatch):
+    mod = load_cache(monkeypatch)
+    expected = 'go north'
+    for prompt in ('go north', 'Go  North!', 'Floyd, go north.', 'go north, Floyd', 'FLOYD go north?'):
+        assert mod.normalize_prompt(prompt) == expected
+    assert mod.normalize_prompt("Floyd, pick up the key") == 'pick up the key'
+
+
+def test_hits_misses_and_lru_eviction(monkeypatch):
+    mod = load_cache(monkeypatch)
+    cache = mod.RoutingCache(max_size=2, ttl=60)
+    assert cache.get('go north', ASSISTANT_MAP) is None
+    cache.put('go north', 'GoSomewhere', ASSISTANT_MAP)
+    cache.put('take key', 'PickUp', ASSISTANT_MAP)
+    assert cache.get('Floyd, go north!', ASSISTANT_MAP) == 'GoSomewhere'
+    cache.put('grab lamp', 'PickUp', ASSISTANT_MAP)
+    assert cache.get('take key', ASSISTANT_MAP) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (1, 2, 1, 2)
+
+
+def test_ttl_expiry(monkeypatch):
+    mod = load_cache(monkeypatch)
+    now = [100.0]
+    monkeypatch.setattr(mod.time, 'monotonic', lambda: now[0])
+    cache = mod.RoutingCache(max_size=10, ttl=5)
+    cache.put('go north', 'GoSomewhere', ASSISTANT_MAP)
+    now[0] += 6
+    assert cache.get('go north', ASSISTANT_MAP) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_assistant_map_change_invalidates(monkeypatch):
+    mod = load_cache(monkeypatch)
+    cache = mod.RoutingCache(max_size=10, ttl=60)
+    cache.put('go north', 'GoSomewhere', ASSISTANT_MAP)
+    changed = dict(ASSISTANT_MAP, GoSomewhere='new-gid')
+    assert cache.get('go north', changed) is None
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,72 @@
+import importlib
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock
+
+
+def load_poller(monkeypatch):
+    """Import run_poller with a mocked openai dependency."""
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock()
+    openai_module.AsyncOpenAI = MagicMock()
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('client_registry', 'run_poller'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('run_poller')
+
+
+def scripted_client(statuses_by_run):
+    """Client whose runs.retrieve walks through a status list per run ID."""
+    lock = threading.Lock()
+    remaining = {run_id: list(statuses) for run_id, statuses in statuses_by_run.items()}
+
+    def retrieve(thread_id, run_id):
+        with lock:
+            statuses = remaining[run_id]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status=status)
+
+    client = MagicMock()
+    client.beta.threads.runs.retrieve.side_effect = retrieve
+    return client
+
+
+def test_poller_resolves_many_runs(monkeypatch):
+    mod = load_poller(monkeypatch)
+    poller = mod.RunPoller(min_interval=0.001, max_interval=0.005, workers=2)
+    statuses = {f'run{i}': ['queued'] * (i % 4) + ['completed'] for i in range(50)}
+    client = scripted_client(statuses)
+
+    futures = {run_id: poller.submit(client, 'tid', run_id, 'aid') for run_id in statuses}
+    for run_id, future in futures.items():
+        run, polls = future.result(timeout=5)
+        assert run.status == 'completed'
+        assert polls == len(statuses[run_id])
+    assert poller.in_flight == 0
+    assert poller.expected_duration('aid') is not None
+
+
+def test_poller_propagates_errors(monkeypatch):
+    mod = load_poller(monkeypatch)
+    poller = mod.RunPoller(min_interval=0.001)
+    client = MagicMock()
+    client.beta.threads.runs.retrieve.side_effect = RuntimeError('boom')
+    future = poller.submit(client, 'tid', 'run1')
+    try:
+        future.result(timeout=5)
+        assert False, 'expected RuntimeError'
+    except RuntimeError as e:
+        assert str(e) == 'boom'
+
+
+def test_backoff_is_bounded(monkeypatch):
+    mod = load_poller(monkeypatch)
+    poller = mod.RunPoller(min_interval=0.1, max_interval=0.4, backoff=2.0, jitter=0.0)
+    tracked = mod._TrackedRun(MagicMock(), 'tid', 'run1', 'aid')
+    delays = [poller._next_delay(tracked) for _ in range(5)]
+    assert delays == [0.1, 0.2, 0.4, 0.4, 0.4]
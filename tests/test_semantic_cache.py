@@ -0,0 +1,110 @@
+import importlib
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+def load_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('intent_classifier', 'semantic_cache'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('semantic_cache')
+
+
+def test_near_duplicate_hits_above_threshold(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch, tmp_path)
+    cache = mod.SemanticCache(threshold=0.8, capacity=8, dim=256)
+    cache.put('go north to the castle', 'GoSomewhere')
+    assert cache.get('Go north to the castle!') == 'GoSomewhere'
+    assert cache.get('what is your favourite colour') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_pluggable_embedding_and_lru_eviction(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch, tmp_path)
+    table = {'a': [1, 0, 0], 'b': [0, 1, 0], 'c': [0, 0, 1], 'a2': [0.99, 0.1, 0]}
+    cache = mod.SemanticCache(threshold=0.9, capacity=2, dim=3, embed=lambda t: np.array(table[t]))
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a2') == 'A'
+    cache.put('c', 'C')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.evictions == 1
+
+
+def test_save_and_memory_mapped_load(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch, tmp_path)
+    path = str(tmp_path / 'route')
+    cache = mod.SemanticCache(threshold=0.8, capacity=2, dim=128)
+    cache.put('pick up the key', 'PickUp')
+    cache.put('go north', 'GoSomewhere')
+    cache.save(path)
+
+    restored = mod.SemanticCache(threshold=0.8, capacity=2, dim=128, path=path)
+    assert isinstance(restored._vectors, np.memmap)
+    assert len(restored) == 2
+    assert restored.get('pick up the key') == 'PickUp'
+
+
+def test_partly_full_cache_is_mapped_until_the_first_put(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch, tmp_path)
+    path = str(tmp_path / 'route')
+    cache = mod.SemanticCache(threshold=0.8, capacity=8, dim=128)
+    cache.put('pick up the key', 'PickUp')
+    cache.save(path)
+
+    restored = mod.SemanticCache(threshold=0.8, capacity=8, dim=128, path=path)
+    assert isinstance(restored._vectors, np.memmap) and restored._vectors.shape == (1, 128)
+    assert restored.get('pick up the key') == 'PickUp'
+
+    restored.put('go north', 'GoSomewhere')
+    assert restored._vectors.shape == (8, 128)
+    assert restored.get('pick up the key') == 'PickUp'
+    assert restored.get('go north') == 'GoSomewhere'
+
+
+def test_periodic_save_runs_off_the_request_thread(monkeypatch, tmp_path):
+    mod = load_cache(monkeypatch, tmp_path)
+    monkeypatch.setattr(mod, 'SEMANTIC_SAVE_EVERY', 2)
+    path = str(tmp_path / 'route')
+    cache = mod.SemanticCache(threshold=0.8, capacity=8, dim=128, path=path)
+    saved = threading.Event()
+    save = cache.save
+
+    def save_and_note(target):
+        assert threading.current_thread() is not threading.main_thread()
+        save(target)
+        saved.set()
+
+    cache.save = save_and_note
+    cache.put('pick up the key', 'PickUp')
+    cache.put('go north', 'GoSomewhere')
+
+    assert saved.wait(5)
+    assert len(mod.SemanticCache(threshold=0.8, capacity=8, dim=128, path=path)) == 2
+
+
+def test_thresholds_disable_unlisted_caches(monkeypatch, tmp_path):
+    monkeypatch.setenv('FLOYD_SEMANTIC_THRESHOLDS', 'route=0.9')
+    mod = load_cache(monkeypatch, tmp_path)
+    assert mod.parse_thresholds('route=0.9, blather=0.97') == {'route': 0.9, 'blather': 0.97}
+    assert mod.get_semantic_cache('route') is not None
+    assert mod.get_semantic_cache('RewriteSecondPerson') is None
+
+
+def test_every_cache_is_off_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv('FLOYD_SEMANTIC_THRESHOLDS', raising=False)
+    mod = load_cache(monkeypatch, tmp_path)
+    assert mod.get_semantic_cache('route') is None
+
+    # Why: the hashing embedding ranks a different route above a real paraphrase
+    embed = mod.hashing_embedding()
+    paraphrase = float(embed('go north') @ embed('head north'))
+    other_route = float(embed('take the key') @ embed('drop the key'))
+    assert paraphrase < other_route
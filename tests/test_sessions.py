@@ -0,0 +1,197 @@
+import importlib
+import json
+import sys
+import threading
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_sessions(monkeypatch):
+    """Import sessions with a mocked openai dependency."""
+    install_fake_openai(monkeypatch)
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('client_registry', 'sessions'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('sessions')
+
+
+class InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class DeferredExecutor(Executor):
+    """Holds submitted work until `run_all`, like a busy background thread."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.pending.append((fn, args, kwargs))
+        return Future()
+
+    def run_all(self):
+        pending, self.pending = self.pending, []
+        for fn, args, kwargs in pending:
+            fn(*args, **kwargs)
+
+
+def words(text):
+    return len(text.split())
+
+
+def summarize(summary, turns, max_tokens):
+    said = ' '.join(t['content'] for t in turns if t['role'] == 'user')
+    return f"{summary} {said}".strip()
+
+
+def make_manager(mod, tmp_path, budget=30, executor=None, **kwargs):
+    return mod.SessionManager(mod.SessionStore(str(tmp_path)), token_budget=budget,
+                              summarize=summarize, count=words, executor=executor or InlineExecutor(), **kwargs)
+
+
+def test_context_window_stays_within_budget(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    manager = make_manager(mod, tmp_path, budget=30, executor=DeferredExecutor())
+
+    for i in range(20):
+        manager.record('game:floyd', f'prompt number {i}', f'reply number {i}')
+
+    context = manager.context('game:floyd')
+    assert sum(words(m['content']) + 4 for m in context) <= 30
+    assert context[0]['role'] == 'user'
+    assert context[-1]['content'] == 'reply number 19'
+
+
+def test_compaction_folds_old_turns_into_summary(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    manager = make_manager(mod, tmp_path, budget=30)
+
+    for i in range(6):
+        manager.record('game:blather', f'hello {i}', f'answer {i}')
+
+    session = manager.session('game:blather')
+    assert session.summary.startswith('hello 0')
+    assert len(session.turns) < 12
+    context = manager.context('game:blather')
+    assert 'Earlier in this game' in context[0]['content']
+    assert manager.stats()['compactions'] >= 1
+
+
+def test_turns_recorded_during_compaction_are_kept(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    executor = DeferredExecutor()
+    manager = make_manager(mod, tmp_path, budget=20, executor=executor)
+
+    for i in range(4):
+        manager.record('s:floyd', f'p{i}', f'r{i}')
+    assert len(executor.pending) == 1
+    manager.record('s:floyd', 'late', 'reply')
+    assert len(executor.pending) == 1
+
+    executor.run_all()
+
+    session = manager.session('s:floyd')
+    assert session.turns[-2:] == [{'role': 'user', 'content': 'late'}, {'role': 'assistant', 'content': 'reply'}]
+    assert not session.compacting
+
+
+def test_sessions_persist_across_managers(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    make_manager(mod, tmp_path, budget=1000).record('g1:ambassador', 'hi', 'greetings')
+
+    reloaded = make_manager(mod, tmp_path, budget=1000)
+
+    assert reloaded.context('g1:ambassador') == [
+        {'role': 'user', 'content': 'hi'},
+        {'role': 'assistant', 'content': 'greetings'},
+    ]
+    saved = json.loads((tmp_path / 'g1_ambassador.json').read_text())
+    assert saved['turns'][0]['content'] == 'hi'
+
+
+def test_least_recently_used_sessions_are_evicted_and_reloaded(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    manager = make_manager(mod, tmp_path, budget=1000, max_sessions=2)
+
+    manager.record('g1:floyd', 'hi', 'hello')
+    manager.record('g2:floyd', 'hi', 'hello')
+    manager.context('g1:floyd')
+    manager.record('g3:floyd', 'hi', 'hello')
+
+    assert list(manager._sessions) == ['g1:floyd', 'g3:floyd']
+    assert manager.stats()['evictions'] == 1
+    assert manager.context('g2:floyd')[-1] == {'role': 'assistant', 'content': 'hello'}
+
+
+def test_idle_sessions_expire_unless_compacting(monkeypatch, tmp_path):
+    mod = load_sessions(monkeypatch)
+    now = [1000.0]
+    monkeypatch.setattr(mod.time, 'monotonic', lambda: now[0])
+    executor = DeferredExecutor()
+    manager = make_manager(mod, tmp_path, budget=20, executor=executor, ttl=60)
+
+    for i in range(4):
+        manager.record('g1:floyd', f'p{i}', f'r{i}')
+    manager.record('g2:floyd', 'hi', 'hello')
+    compacting = manager.session('g1:floyd')
+    now[0] += 120
+    manager.session('g3:floyd')
+
+    assert list(manager._sessions) == ['g1:floyd', 'g3:floyd']
+
+    executor.run_all()
+    now[0] += 120
+    manager.session('g3:floyd')
+
+    assert list(manager._sessions) == ['g3:floyd']
+    # The summary the in-flight compaction produced survives the eviction
+    assert manager.session('g1:floyd').summary == compacting.summary != ''
+
+
+def test_count_tokens_falls_back_without_encoding(monkeypatch):
+    mod = load_sessions(monkeypatch)
+    tiktoken = ModuleType('tiktoken')
+    tiktoken.get_encoding = MagicMock(side_effect=OSError('offline'))
+    monkeypatch.setitem(sys.modules, 'tiktoken', tiktoken)
+
+    assert mod.count_tokens('abcdefgh') == 2
+    assert mod.count_tokens('') == 0
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with mocked openai modules and sessions stored under tmp_path."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    monkeypatch.setenv('FLOYD_SESSION_DIR', str(tmp_path / 'sessions'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules()
+    return importlib.import_module('main'), client
+
+
+def test_session_history_reaches_character(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    replies = iter(['Blather says: name?', 'Blather says: Hello, Ensign!'])
+
+    def create(model, messages, **kwargs):
+        choice = MagicMock()
+        choice.message.content = next(replies)
+        return MagicMock(choices=[choice])
+
+    client.chat.completions.create.side_effect = create
+    main.lambda_handler({'assistant': 'blather', 'prompt': 'hi', 'session_id': 'game1'}, None)
+    main.lambda_handler({'assistant': 'blather', 'prompt': 'I am Ensign', 'session_id': 'game1'}, None)
+
+    messages = client.chat.completions.create.call_args.kwargs['messages']
+    assert [m['content'] for m in messages[1:]] == ['hi', 'Blather says: name?', 'I am Ensign']
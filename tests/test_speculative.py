@@ -0,0 +1,172 @@
+import importlib
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock
+
+
+def load_speculative(monkeypatch, tmp_path):
+    """Import speculative with a mocked openai dependency and no intent model."""
+    openai_module = ModuleType('openai')
+    openai_module.OpenAI = MagicMock()
+    openai_module.AsyncOpenAI = MagicMock()
+    monkeypatch.setitem(sys.modules, 'openai', openai_module)
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    for name in ('client_registry', 'intent_classifier', 'speculative', 'metrics', 'tracing'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('speculative')
+
+
+class FakeClient:
+    """Route client whose run blocks until cancelled or released."""
+
+    def __init__(self, content):
+        self.content = content
+        self.release = threading.Event()
+        self.cancelled = False
+
+    def run_once(self, prompt, stream=False, cancel_event=None):
+        while not self.release.is_set():
+            if cancel_event is not None and cancel_event.wait(0.001):
+                self.cancelled = True
+                return {'content': '', 'round_trips': 2, 'total_tokens': 5, 'status': 'cancelled'}
+        return {'content': self.content, 'round_trips': 1, 'total_tokens': 40}
+
+
+def make_router(route, clients, local_route=None):
+    router = SimpleNamespace(
+        assistant_map={name: f'{name}-id' for name in clients},
+        resolve=lambda r: f'{r}-id',
+        decisions=[],
+    )
+
+    def decide_locally(prompt):
+        if local_route is None:
+            return None
+        return {'route': local_route, 'round_trips': 0, 'source': 'cache'}
+
+    def decide(prompt, local=True):
+        router.decisions.append(local)
+        clients[route].release.set()
+        return {'route': route, 'round_trips': 1, 'source': 'router'}
+
+    router.decide_locally = decide_locally
+    router.decide = decide
+    return router
+
+
+def test_speculative_hit_keeps_matching_run(monkeypatch, tmp_path):
+    mod = load_speculative(monkeypatch, tmp_path)
+    stats = mod.SpeculationStats()
+    stats.record_route('GoSomewhere')
+    stats.record_route('PickUp')
+    clients = {'GoSomewhere': FakeClient('went north'), 'PickUp': FakeClient('picked up')}
+    router = make_router('GoSomewhere', clients)
+
+    decision, response = mod.SpeculativeRouter(2, stats).execute(
+        router, 'go north', lambda assistant_id: clients[assistant_id[:-3]]
+    )
+
+    assert response['content'] == 'went north'
+    assert decision['speculative_hit'] is True
+    assert decision['speculative_runs'] == 2
+    for _ in range(500):
+        if stats.runs_wasted:
+            break
+        threading.Event().wait(0.002)
+    assert clients['PickUp'].cancelled
+    result = stats.to_dict()
+    assert result['hits'] == 1
+    assert result['runs_wasted'] == 1
+    assert result['wasted_tokens'] == 5
+
+
+def test_speculative_miss_runs_chosen_route(monkeypatch, tmp_path):
+    mod = load_speculative(monkeypatch, tmp_path)
+    stats = mod.SpeculationStats()
+    stats.record_route('PickUp')
+    clients = {'PickUp': FakeClient('picked up'), 'AskQuestion': FakeClient('answered')}
+    clients['AskQuestion'].release.set()
+    router = make_router('AskQuestion', clients)
+    router.assistant_map = {'PickUp': 'PickUp-id', 'AskQuestion': 'AskQuestion-id'}
+
+    decision, response = mod.SpeculativeRouter(1, stats).execute(
+        router, 'what is that?', lambda assistant_id: clients[assistant_id[:-3]]
+    )
+
+    assert response['content'] == 'answered'
+    assert decision['speculative_hit'] is False
+    assert stats.to_dict()['misses'] == 1
+
+
+def test_speculative_hit_reports_to_the_request(monkeypatch, tmp_path):
+    monkeypatch.setenv('FLOYD_METRICS', '1')
+    monkeypatch.setenv('FLOYD_TRACE_EXPORTER', 'file')
+    monkeypatch.setenv('FLOYD_TRACE_FILE', str(tmp_path / 'traces.jsonl'))
+    mod = load_speculative(monkeypatch, tmp_path)
+    metrics = importlib.import_module('metrics')
+    tracing = importlib.import_module('tracing')
+    stats = mod.SpeculationStats()
+    stats.record_route('GoSomewhere')
+    seen_spans = []
+
+    class MeteredClient(FakeClient):
+        def run_once(self, prompt, stream=False, cancel_event=None):
+            seen_spans.append(tracing.current_span())
+            metrics.count_tokens(40)
+            return super().run_once(prompt, stream, cancel_event)
+
+    clients = {'GoSomewhere': MeteredClient('went north')}
+    router = make_router('GoSomewhere', clients)
+
+    with metrics.request_metrics() as request, tracing.start_trace('lambda_handler') as root:
+        decision, _ = mod.SpeculativeRouter(1, stats).execute(
+            router, 'go north', lambda assistant_id: clients[assistant_id[:-3]]
+        )
+        assert decision['speculative_hit'] is True
+        assert metrics.current() is request
+        assert request.counts['Tokens'] == 40
+    assert seen_spans == [root]
+
+
+def test_locally_routed_prompt_starts_no_speculative_runs(monkeypatch, tmp_path):
+    mod = load_speculative(monkeypatch, tmp_path)
+    stats = mod.SpeculationStats()
+    stats.record_route('PickUp')
+    stats.record_route('GoSomewhere')
+    clients = {'GoSomewhere': FakeClient('went north'), 'PickUp': FakeClient('picked up')}
+    clients['GoSomewhere'].release.set()
+    router = make_router('PickUp', clients, local_route='GoSomewhere')
+    started = []
+
+    def client_for(assistant_id):
+        started.append(assistant_id)
+        return clients[assistant_id[:-3]]
+
+    decision, response = mod.SpeculativeRouter(2, stats).execute(router, 'go north', client_for)
+
+    assert response['content'] == 'went north'
+    assert decision['source'] == 'cache' and decision['speculative_runs'] == 0
+    assert started == ['GoSomewhere-id']
+    assert router.decisions == []
+    assert stats.to_dict()['runs_started'] == 0
+
+
+def test_router_skips_the_local_checks_already_made(monkeypatch, tmp_path):
+    mod = load_speculative(monkeypatch, tmp_path)
+    clients = {'GoSomewhere': FakeClient('went north')}
+    router = make_router('GoSomewhere', clients)
+
+    mod.SpeculativeRouter(1).execute(router, 'go north', lambda assistant_id: clients[assistant_id[:-3]])
+
+    assert router.decisions == [False]
+
+
+def test_disabled_speculation_predicts_nothing(monkeypatch, tmp_path):
+    mod = load_speculative(monkeypatch, tmp_path)
+    router = SimpleNamespace(assistant_map={'PickUp': 'pid'})
+    assert mod.SpeculativeRouter(0).predict_routes(router, 'take key') == []
@@ -0,0 +1,168 @@
+import asyncio
+import http.client
+import importlib
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with a mocked openai client and sessions stored under tmp_path."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    monkeypatch.setenv('FLOYD_SESSION_DIR', str(tmp_path / 'sessions'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('http_server')
+    return importlib.import_module('main'), client
+
+
+class FakeStream:
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = part
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        name, data = block.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_stream_flag_returns_token_events_then_final_response(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    stream = FakeStream(['Blather ', 'says: ', None, 'Mop!'])
+    client.chat.completions.create.return_value = stream
+
+    response = main.lambda_handler({'body': json.dumps({'assistant': 'blather', 'prompt': 'hi', 'stream': True})}, None)
+
+    assert response['statusCode'] == 200
+    assert response['headers']['Content-Type'] == 'text/event-stream'
+    events = parse_events(response['body'])
+    assert [data['text'] for name, data in events if name == 'token'] == ['Blather ', 'says: ', 'Mop!']
+    name, done = events[-1]
+    assert name == 'done'
+    assert done['results']['single_message'] == 'Blather says: Mop!'
+    assert done['results']['metadata']['ttft_ms'] >= 0
+    assert client.chat.completions.create.call_args.kwargs['stream'] is True
+    assert stream.closed
+    assert main.stream_stats.to_dict()['streams'] == 1
+
+
+def test_accept_header_streams_and_records_session(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    client.chat.completions.create.return_value = FakeStream(['Greetings, ', 'Ensign.'])
+    event = {
+        'headers': {'accept': 'text/event-stream'},
+        'body': json.dumps({'assistant': 'ambassador', 'prompt': 'hello', 'session_id': 'g1'}),
+    }
+
+    main.lambda_handler(event, None)
+
+    assert main.get_session_manager().context('g1:ambassador') == [
+        {'role': 'user', 'content': 'hello'},
+        {'role': 'assistant', 'content': 'Greetings, Ensign.'},
+    ]
+
+
+def test_stream_errors_are_reported_as_events(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+
+    response = main.lambda_handler({'assistant': 'nobody', 'prompt': 'hi', 'stream': True}, None)
+
+    [(name, data)] = parse_events(response['body'])
+    assert name == 'error'
+    assert data['statusCode'] == 400
+
+
+def test_closing_stream_early_closes_model_stream(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    stream = FakeStream(['one ', 'two ', 'three'])
+    client.chat.completions.create.return_value = stream
+
+    events = main.get_service().stream_request({'assistant': 'blather', 'prompt': 'hi'})
+    assert 'one ' in next(events)
+    events.close()
+
+    assert stream.closed
+
+
+def test_http_server_sends_events_as_chunks(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    client.chat.completions.create.return_value = FakeStream(['Hi ', 'there.'])
+    http_server = importlib.import_module('http_server')
+    server = http_server.serve(port=0, host='127.0.0.1')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        connection.request('POST', '/', body=json.dumps({'assistant': 'blather', 'prompt': 'hi', 'stream': True}))
+        response = connection.getresponse()
+
+        assert response.getheader('Transfer-Encoding') == 'chunked'
+        events = parse_events(response.read().decode('utf-8'))
+        assert events[-1][1]['results']['single_message'] == 'Hi there.'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_http_server_answers_concurrent_batches(monkeypatch, tmp_path):
+    main, _ = load_main(monkeypatch, tmp_path)
+
+    async def complete(**kwargs):
+        await asyncio.sleep(0.01)
+        reply = MagicMock()
+        reply.choices[0].message.content = 'Blather bellows, "Halt!"'
+        return reply
+
+    async_client = sys.modules['openai'].AsyncOpenAI.return_value
+    async_client.chat.completions.create = AsyncMock(side_effect=complete)
+    http_server = importlib.import_module('http_server')
+    # Hold each request until both are in flight, so they reach the event loop together
+    barrier = threading.Barrier(2, timeout=5)
+    handler = main.lambda_handler
+
+    def lambda_handler(event, context):
+        barrier.wait()
+        return handler(event, context)
+
+    monkeypatch.setattr(main, 'lambda_handler', lambda_handler)
+    server = http_server.serve(port=0, host='127.0.0.1')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(prompt):
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        body = {'requests': [{'assistant': 'blather', 'prompt': prompt}]}
+        connection.request('POST', '/', body=json.dumps(body))
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            responses = list(pool.map(post, ['hi', 'hello']))
+    finally:
+        server.shutdown()
+        server.server_close()
+        main.registry.reset()
+
+    for status, body in responses:
+        assert status == 200
+        assert body['results'][0]['results']['single_message'] == 'Blather bellows, "Halt!"'
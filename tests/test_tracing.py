@@ -0,0 +1,197 @@
+import importlib
+import json
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from conftest import install_fake_openai, purge_modules
+
+PARENT = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+
+
+def load_tracing(monkeypatch, exporter='file', path=None):
+    monkeypatch.setenv('FLOYD_TRACE_EXPORTER', exporter)
+    if path is not None:
+        monkeypatch.setenv('FLOYD_TRACE_FILE', str(path))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    if 'tracing' in sys.modules:
+        del sys.modules['tracing']
+    return importlib.import_module('tracing')
+
+
+def load_main(monkeypatch, tmp_path):
+    """Import main with a mocked openai client and tracing to a file."""
+    client = MagicMock()
+    install_fake_openai(monkeypatch, client)
+    monkeypatch.setenv('OPENAI_ROUTER_ASSISTANT_ID', 'rid')
+    monkeypatch.setenv('OPENAI_RUN_MODE', 'poll')
+    monkeypatch.setenv('FLOYD_INTENT_MODEL', str(tmp_path / 'missing.npz'))
+    monkeypatch.setenv('FLOYD_RESPONSE_CACHE', '0')
+    monkeypatch.setenv('FLOYD_TRACE_EXPORTER', 'file')
+    monkeypatch.setenv('FLOYD_TRACE_FILE', str(tmp_path / 'traces.jsonl'))
+    repo_root = Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo_root))
+    purge_modules('metrics', 'tracing')
+    return importlib.import_module('main'), client
+
+
+def attributes(span):
+    return {a['key']: next(iter(a['value'].values())) for a in span['attributes']}
+
+
+def test_parse_traceparent(monkeypatch):
+    tracing = load_tracing(monkeypatch)
+
+    assert tracing.parse_traceparent(PARENT) == ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True)
+    assert tracing.parse_traceparent(PARENT[:-1] + '0')[2] is False
+    assert tracing.parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01') is None
+    assert tracing.parse_traceparent('garbage') is None
+    assert tracing.parse_traceparent(None) is None
+    assert tracing.traceparent_from_event({'headers': {'TraceParent': PARENT}}) == PARENT
+
+
+def test_spans_are_noops_when_tracing_is_off(monkeypatch):
+    tracing = load_tracing(monkeypatch, exporter='')
+
+    with tracing.start_trace('lambda_handler', {'headers': {'traceparent': PARENT}}) as root:
+        with tracing.span('child') as child:
+            child.set_attribute('floyd.route', 'GoSomewhere')
+
+    assert root is tracing.NOOP_SPAN
+    assert child is tracing.NOOP_SPAN
+    assert tracing.get_exporter() is None
+
+
+def test_unsampled_parent_is_not_recorded(monkeypatch, tmp_path):
+    tracing = load_tracing(monkeypatch, path=tmp_path / 'traces.jsonl')
+
+    with tracing.start_trace('lambda_handler', {'traceparent': PARENT[:-1] + '0'}) as root:
+        pass
+
+    assert not root.recording
+    assert not (tmp_path / 'traces.jsonl').exists()
+
+
+def test_spans_nest_and_export_when_the_root_ends(monkeypatch):
+    tracing = load_tracing(monkeypatch)
+    exported = []
+    tracing.set_exporter(MagicMock(export=exported.extend))
+
+    with tracing.start_trace('lambda_handler') as root:
+        with tracing.span('Floyd.route', {'floyd.route': 'PickUp'}):
+            pass
+        try:
+            with tracing.span('OpenAIAssistantClient.RunCreate'):
+                raise RuntimeError('boom')
+        except RuntimeError:
+            pass
+        assert exported == []
+
+    assert tracing.current_span() is tracing.NOOP_SPAN
+    route, failed, top = [s.to_otlp() for s in exported]
+    assert top['spanId'] == root.span_id and 'parentSpanId' not in top
+    assert route['parentSpanId'] == failed['parentSpanId'] == root.span_id
+    assert attributes(route) == {'floyd.route': 'PickUp'}
+    assert failed['status'] == {'code': 2, 'message': 'RuntimeError: boom'}
+
+
+def test_lambda_handler_continues_the_callers_trace(monkeypatch, tmp_path):
+    main, client = load_main(monkeypatch, tmp_path)
+    router = MagicMock()
+    router.decide.return_value = {'route': 'GoSomewhere', 'round_trips': 0, 'source': 'classifier'}
+    router.resolve.return_value = 'gid'
+    main.registry.get_or_create(('Floyd', 'rid'), lambda: router)
+    run = MagicMock(id='run_1', thread_id='thread_1', status='completed')
+    run.usage.total_tokens = 42
+    client.beta.threads.create_and_run.return_value = run
+    client.beta.threads.runs.retrieve.return_value = run
+    message = MagicMock(role='assistant')
+    message.content[0].text.value = '{"message": "Floyd goes north.", "direction": "north"}'
+    client.beta.threads.messages.list.return_value = MagicMock(data=[message])
+    event = {'headers': {'traceparent': PARENT}, 'body': json.dumps({'assistant': 'floyd', 'prompt': 'go north'})}
+
+    response = main.lambda_handler(event, None)
+
+    assert response['statusCode'] == 200
+    spans = {s['name']: s for s in main.tracing.load_spans(str(tmp_path / 'traces.jsonl'))}
+    trace_id = PARENT.split('-')[1]
+    assert {s['traceId'] for s in spans.values()} == {trace_id}
+    root = spans['lambda_handler']
+    assert root['parentSpanId'] == PARENT.split('-')[2]
+    assert response['headers']['traceparent'] == f"00-{trace_id}-{root['spanId']}-01"
+    process = spans['AssistantService.process_request']
+    assert process['parentSpanId'] == root['spanId']
+    assert attributes(process)['floyd.route'] == 'GoSomewhere'
+    assert attributes(process)['floyd.assistant_type'] == 'floyd'
+    poll = attributes(spans['OpenAIAssistantClient.RunPoll'])
+    assert poll['openai.run_id'] == 'run_1'
+    assert poll['gen_ai.usage.total_tokens'] == '42'
+    assert int(poll['openai.poll_count']) >= 1
+    assert 'OpenAIAssistantClient.RunCreate' in spans
+
+
+def test_collector_stand_in_receives_otlp_exports(monkeypatch, tmp_path):
+    tracing = load_tracing(monkeypatch)
+    out = tmp_path / 'collected.jsonl'
+    server = tracing.serve_collector(0, str(out))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        tracing.set_exporter(tracing.OtlpHttpExporter(f"http://127.0.0.1:{server.server_address[1]}/v1/traces"))
+        with tracing.start_trace('lambda_handler'):
+            with tracing.span('Blather.completion', {'gen_ai.request.model': 'gpt-4'}):
+                pass
+        tracing.flush(5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    spans = tracing.load_spans(str(out))
+    lines = tracing.format_trace(spans)
+    assert [line.split()[2] for line in lines] == ['lambda_handler', 'Blather.completion']
+    assert 'gen_ai.request.model=gpt-4' in lines[1]
+
+
+def test_otlp_export_never_blocks_the_request_thread(monkeypatch):
+    tracing = load_tracing(monkeypatch, exporter='otlp')
+    posting = threading.Event()
+    release = threading.Event()
+    posted = []
+
+    class StalledExporter(tracing.OtlpHttpExporter):
+        def _post(self, spans):
+            posting.set()
+            release.wait(5)
+            posted.extend(s.name for s in spans)
+
+    exporter = StalledExporter(max_queued=1)
+    tracing.set_exporter(exporter)
+    with tracing.start_trace('first'):
+        pass
+    assert posting.wait(5)
+    for name in ('second', 'third'):
+        with tracing.start_trace(name):
+            pass
+
+    assert not exporter.flush(0.05)
+    release.set()
+    tracing.flush(5)
+    # The first trace was already posting; only one more fits in the queue behind it
+    assert posted == ['first', 'second']
+    assert exporter.dropped == 1
+
+
+def test_otlp_export_can_stay_in_line(monkeypatch):
+    monkeypatch.setenv('FLOYD_TRACE_OTLP_BACKGROUND', '0')
+    tracing = load_tracing(monkeypatch, exporter='otlp')
+    exporter = tracing.OtlpHttpExporter()
+    exporter._post = MagicMock()
+    tracing.set_exporter(exporter)
+
+    with tracing.start_trace('lambda_handler'):
+        pass
+
+    exporter._post.assert_called_once()
+    assert exporter._thread is None
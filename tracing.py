@@ -0,0 +1,436 @@
+import argparse
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+# '' (off), 'file' or 'otlp'; nothing is recorded unless an exporter is configured
+TRACE_EXPORTER = os.environ.get("FLOYD_TRACE_EXPORTER", "").lower()
+# Share of new traces to record; traces started upstream follow the caller's sampled flag
+TRACE_SAMPLE_RATE = float(os.environ.get("FLOYD_TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FILE = os.environ.get("FLOYD_TRACE_FILE", "/tmp/floyd_traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.environ.get("FLOYD_TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.environ.get("FLOYD_TRACE_SERVICE_NAME", "floyd")
+# Set FLOYD_TRACE_OTLP_BACKGROUND=0 to post each trace from the request thread as it ends
+TRACE_OTLP_BACKGROUND = os.environ.get("FLOYD_TRACE_OTLP_BACKGROUND", "1") not in {"0", "false", "no"}
+# Spans waiting for the collector beyond this are dropped rather than held in memory
+TRACE_OTLP_MAX_QUEUED = int(os.environ.get("FLOYD_TRACE_OTLP_MAX_QUEUED", "2000"))
+# Seconds the end of an invocation waits for queued spans before Lambda freezes the process
+TRACE_FLUSH_TIMEOUT = float(os.environ.get("FLOYD_TRACE_FLUSH_TIMEOUT", "0.2"))
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("floyd_current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parse a W3C traceparent header into (trace ID, parent span ID, sampled)."""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def traceparent_from_event(event: Any) -> Optional[str]:
+    """Find a traceparent in an API Gateway event's headers or a direct invocation's payload."""
+    if not isinstance(event, dict):
+        return None
+    headers = event.get('headers') or {}
+    for name, value in headers.items():
+        if name.lower() == 'traceparent':
+            return value
+    return event.get('traceparent')
+
+
+class _NoopSpan:
+    """Stands in for a span when the trace is not sampled; every method does nothing."""
+
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation in a trace. Use as a context manager; see `span()`."""
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], root: Optional["Span"],
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.root = root or self
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+        # Finished spans of the whole trace, kept on the root until it ends
+        self._finished: List["Span"] = [] if root is None else root._finished
+        self._lock = threading.Lock() if root is None else root._lock
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, message: str) -> None:
+        """Mark the span failed for an error that was handled rather than raised."""
+        self.error = message
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Ended from another context, e.g. a streamed response finished elsewhere
+            pass
+        with self._lock:
+            self._finished.append(self)
+        if self.root is self:
+            with self._lock:
+                spans, self._finished[:] = list(self._finished), []
+            export(spans)
+        return False
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def start_trace(name: str, event: Any = None, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Open the root span of an invocation.
+
+    A valid traceparent in the event continues the caller's trace and follows
+    its sampling decision; otherwise a new trace is sampled at
+    FLOYD_TRACE_SAMPLE_RATE. Returns a no-op span when tracing is off or the
+    trace is not sampled, so the children opened under it cost next to
+    nothing.
+    """
+    if not TRACE_EXPORTER:
+        return NOOP_SPAN
+    parent = parse_traceparent(traceparent_from_event(event))
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return NOOP_SPAN
+    return Span(name, trace_id, parent_id, None, SPAN_KIND_SERVER, attributes)
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL):
+    """Open a child of the current span, or a no-op span outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, parent.root, kind, attributes)
+
+
+def current_span():
+    """The innermost open span, or the no-op span."""
+    return _current.get() or NOOP_SPAN
+
+
+def record_usage(span, response: Any) -> None:
+    """Copy a chat completion's token usage onto its span."""
+    usage = getattr(response, "usage", None)
+    if usage is None or not span.recording:
+        return
+    span.set_attributes({
+        'gen_ai.usage.input_tokens': getattr(usage, "prompt_tokens", None),
+        'gen_ai.usage.output_tokens': getattr(usage, "completion_tokens", None),
+        'gen_ai.usage.total_tokens': getattr(usage, "total_tokens", None),
+    })
+
+
+class FileExporter:
+    """Appends each finished span to a JSON Lines file, in OTLP/JSON span format."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_otlp()) + "\n" for s in spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+class OtlpHttpExporter:
+    """
+    Posts finished traces to an OTLP/HTTP collector as JSON.
+
+    In the background (the default) `export` only queues the spans and a
+    daemon thread posts them, so a slow or unreachable collector never holds
+    up a turn. Spans beyond `max_queued` are dropped and counted. `flush`
+    waits for the queue to drain.
+    """
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, timeout: float = 2.0,
+                 background: bool = TRACE_OTLP_BACKGROUND, max_queued: int = TRACE_OTLP_MAX_QUEUED):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.background = background
+        self.max_queued = max(max_queued, 1)
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def export(self, spans: List[Span]) -> None:
+        if not self.background:
+            self._post(spans)
+            return
+        with self._lock:
+            room = max(self.max_queued - len(self._queue), 0)
+            self.dropped += max(len(spans) - room, 0)
+            self._queue.extend(spans[:room])
+            self._idle.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds for queued spans to be posted; True if none are left."""
+        return self._idle.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while True:
+                with self._lock:
+                    spans, self._queue = self._queue, []
+                    if not spans:
+                        self._idle.set()
+                        break
+                try:
+                    self._post(spans)
+                except Exception as e:
+                    print(f"Could not export {len(spans)} spans: {e}")
+
+    def _post(self, spans: List[Span]) -> None:
+        import urllib.request
+
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': TRACE_SERVICE_NAME}}]},
+                'scopeSpans': [{'scope': {'name': 'floyd'}, 'spans': [s.to_otlp() for s in spans]}],
+            }]
+        }
+        request = urllib.request.Request(self.endpoint, data=json.dumps(payload).encode("utf-8"),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Return the configured exporter, or None when tracing is off."""
+    global _exporter
+    if _exporter is None and TRACE_EXPORTER:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = OtlpHttpExporter() if TRACE_EXPORTER == "otlp" else FileExporter()
+    return _exporter
+
+
+def set_exporter(exporter) -> None:
+    """Replace the exporter, e.g. with an in-memory one in tests."""
+    global _exporter
+    _exporter = exporter
+
+
+def export(spans: List[Span]) -> None:
+    exporter = get_exporter()
+    if exporter is None:
+        return
+    try:
+        exporter.export(spans)
+    except Exception as e:
+        # Tracing must never fail a turn
+        print(f"Could not export {len(spans)} spans: {e}")
+
+
+def flush(timeout: float = TRACE_FLUSH_TIMEOUT) -> None:
+    """Give spans still queued for export up to `timeout` seconds to go out."""
+    wait = getattr(_exporter, "flush", None)
+    if wait is not None and timeout > 0:
+        wait(timeout)
+
+
+def serve_collector(port: int = 4318, output_path: str = TRACE_FILE, host: str = "127.0.0.1"):
+    """
+    Create a local stand-in for an OTLP collector.
+
+    It accepts OTLP/JSON trace exports and appends their spans to
+    `output_path`, in the same format as the file exporter. Call
+    `serve_forever()` on the result to run it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                spans = [s for rs in payload.get('resourceSpans', [])
+                         for ss in rs.get('scopeSpans', []) for s in ss.get('spans', [])]
+            except (ValueError, AttributeError):
+                self.send_response(400)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            with open(output_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(s) + "\n" for s in spans))
+            body = b"{}"
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), CollectorHandler)
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> List[str]:
+    """Render one trace's spans as an indented tree with durations and attributes."""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {s['spanId'] for s in spans}
+    for s in sorted(spans, key=lambda s: int(s['startTimeUnixNano'])):
+        parent = s.get('parentSpanId')
+        children.setdefault(parent if parent in ids else None, []).append(s)
+
+    lines = []
+
+    def walk(s, depth):
+        ms = (int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])) / 1e6
+        attributes = " ".join(f"{a['key']}={next(iter(a['value'].values()))}" for a in s.get('attributes', []))
+        error = " ERROR" if s.get('status', {}).get('code') == 2 else ""
+        lines.append(f"{ms:9.1f} ms  {'  ' * depth}{s['name']}{error}  {attributes}".rstrip())
+        for child in children.get(s['spanId'], []):
+            walk(child, depth + 1)
+
+    for root in children.get(None, []):
+        walk(root, 0)
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect Floyd traces or run a local OTLP collector stand-in.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="Print recorded traces as span trees")
+    show.add_argument("path", nargs="?", default=TRACE_FILE)
+    show.add_argument("--trace", help="Only this trace ID")
+    collect = sub.add_parser("collect", help="Receive OTLP/JSON exports and append spans to a file")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", default=TRACE_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        server = serve_collector(args.port, args.out)
+        print(f"Collecting traces on port {args.port} into {args.out}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for s in load_spans(args.path):
+        if not args.trace or s['traceId'] == args.trace:
+            traces.setdefault(s['traceId'], []).append(s)
+    for trace_id, spans in traces.items():
+        print(f"trace {trace_id}")
+        for line in format_trace(spans):
+            print(line)
+        print()
+
+
+if __name__ == "__main__":
+    main()